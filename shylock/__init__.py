@@ -1,8 +1,61 @@
+from importlib import import_module
+
 from shylock.aio.lock import Lock as AsyncLock
-from shylock.backends.aioarangodb import ShylockAioArangoDBBackend
-from shylock.backends.motorasyncio import ShylockMotorAsyncIOBackend
-from shylock.backends.pymongo import ShylockPymongoBackend
-from shylock.backends.pythonarango import ShylockPythonArangoBackend
+from shylock.aio.lock import MultiLock as AsyncMultiLock
+from shylock.aio.lock import QuorumLock as AsyncQuorumLock
+from shylock.aio.lock import RWLock as AsyncRWLock
+from shylock.aio.lock import Semaphore as AsyncSemaphore
+from shylock.aio.lock import StripedLock as AsyncStripedLock
+from shylock.backends.negativecache import NegativeCache
+from shylock.backends.ratelimit import AdaptiveRateLimiter
 from shylock.exceptions import *
-from shylock.lock import Lock
+from shylock.lock import (
+    Lock,
+    MultiLock,
+    QuorumLock,
+    RWLock,
+    Semaphore,
+    StripedLock,
+)
 from shylock.manager import configure
+from shylock.metrics import (
+    ContentionTracker,
+    MetricsCollector,
+    PrometheusCollector,
+    configure_contention_tracker,
+    configure_metrics,
+)
+from shylock.wait import (
+    DecorrelatedJitterWait,
+    ExponentialWait,
+    FixedWait,
+    WaitStrategy,
+)
+
+# The backends import their drivers, so they're only imported when first used
+_BACKENDS = {
+    "ShylockAioArangoDBBackend": "shylock.backends.aioarangodb",
+    "ShylockAsyncMemoryBackend": "shylock.backends.memoryasyncio",
+    "ShylockAsyncRedisBackend": "shylock.backends.redisasyncio",
+    "ShylockAsyncSQLiteBackend": "shylock.backends.sqliteasyncio",
+    "ShylockMemoryBackend": "shylock.backends.memory",
+    "ShylockMotorAsyncIOBackend": "shylock.backends.motorasyncio",
+    "ShylockPymongoBackend": "shylock.backends.pymongo",
+    "ShylockPythonArangoBackend": "shylock.backends.pythonarango",
+    "ShylockRedisBackend": "shylock.backends.redis",
+    "ShylockSQLiteBackend": "shylock.backends.sqlite",
+}
+
+
+def __getattr__(name: str):
+    module = _BACKENDS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    backend = getattr(import_module(module), name)
+    globals()[name] = backend
+    return backend
+
+
+def __dir__():
+    return sorted([*globals(), *_BACKENDS])
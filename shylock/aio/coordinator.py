@@ -0,0 +1,124 @@
+import asyncio
+from typing import Dict, Optional, Set
+from weakref import WeakKeyDictionary
+
+from shylock.backends import ShylockAsyncBackend
+
+_COORDINATORS: "WeakKeyDictionary[ShylockAsyncBackend, LocalCoordinator]" = (
+    WeakKeyDictionary()
+)
+
+
+class LocalCoordinator:
+    """
+    Queues the coroutines of this process waiting for the same lock, so only the first one in line polls the backend.
+    While others are in line, the lock is handed over to the next one as it is, without releasing it in the backend.
+    """
+
+    def __init__(self, backend: ShylockAsyncBackend):
+        self._backend = backend
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._users: Dict[str, int] = {}
+        # Locks still held in the backend for the next coroutine in line
+        self._handovers: Set[str] = set()
+        self._releases: Set[asyncio.Future] = set()
+
+    async def acquire(
+        self, name: str, block: bool = True, timeout: Optional[float] = None
+    ) -> bool:
+        """
+        Wait for our turn to use the backend for the given lock
+        :param name: Name of the lock
+        :param block: Wait for our turn
+        :param timeout: Maximum seconds to wait, None to wait forever
+        :return: If it's our turn - always True if block is True and there is no timeout
+        """
+        lock = self._locks.get(name)
+        if lock is None:
+            lock = self._locks[name] = asyncio.Lock()
+            self._users[name] = 0
+
+        if not block and lock.locked():
+            return False
+
+        self._users[name] += 1
+        if timeout is None:
+            try:
+                await lock.acquire()
+            except BaseException:
+                self._forget(name)
+                raise
+            return True
+
+        # Not using asyncio.wait_for, it can lose the lock if it times out at the same time
+        task = asyncio.ensure_future(lock.acquire())
+        try:
+            await asyncio.wait({task}, timeout=timeout)
+            if not task.done():
+                task.cancel()
+                await asyncio.wait({task})
+        except BaseException:
+            task.cancel()
+            if task.done() and not task.cancelled():
+                lock.release()
+            self._forget(name)
+            raise
+
+        if task.cancelled():
+            self._forget(name)
+            return False
+
+        return True
+
+    def waiting(self, name: str) -> bool:
+        """
+        Check if other coroutines are in line after the one whose turn it is
+        :param name: Name of the lock
+        :return: If the lock can be handed over instead of released
+        """
+        return self._users.get(name, 0) > 1
+
+    def release(self, name: str, handover: bool = False):
+        """
+        Let the next coroutine in line have its turn
+        :param name: Name of the lock
+        :param handover: The lock is still held in the backend, for the next coroutine to take over
+        """
+        if handover:
+            self._handovers.add(name)
+        self._locks[name].release()
+        self._forget(name)
+
+    def handed_over(self, name: str) -> bool:
+        """
+        Take over the lock from the previous coroutine in line, if it left it held in the backend
+        :param name: Name of the lock
+        :return: If the lock is still held in the backend
+        """
+        if name not in self._handovers:
+            return False
+        self._handovers.remove(name)
+        return True
+
+    def _forget(self, name: str):
+        self._users[name] -= 1
+        if self._users[name] == 0:
+            del self._locks[name]
+            del self._users[name]
+            if name in self._handovers:
+                # Everyone waiting for the handover gave up, nobody else will release it
+                self._handovers.remove(name)
+                release = asyncio.ensure_future(self._backend.release(name))
+                self._releases.add(release)
+                release.add_done_callback(self._releases.discard)
+
+
+def get_coordinator(backend: ShylockAsyncBackend) -> LocalCoordinator:
+    """
+    Get the coordinator shared by all locks using the given backend
+    :param backend: The backend the locks use
+    """
+    coordinator = _COORDINATORS.get(backend)
+    if coordinator is None:
+        coordinator = _COORDINATORS[backend] = LocalCoordinator(backend)
+    return coordinator
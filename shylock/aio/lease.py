@@ -0,0 +1,68 @@
+import asyncio
+import inspect
+from typing import Callable, Optional
+
+from shylock.backends import ShylockAsyncBackend
+
+
+class LeaseKeeper:
+    """
+    Background task renewing the lease of a held lock until stopped
+    """
+
+    def __init__(
+        self,
+        backend: ShylockAsyncBackend,
+        name: str,
+        lease: float,
+        on_lost: Callable[[Optional[Exception]], None],
+    ):
+        """
+        :param backend: The backend the lock was acquired with
+        :param name: Name of the lock
+        :param lease: Seconds the lock is held for after each renewal
+        :param on_lost: Called with the error, if any, when the lease could not be renewed, can be a coroutine function
+        """
+        self._backend = backend
+        self._lock_name = name
+        self._lease = lease
+        self._on_lost = on_lost
+        self._task: Optional[asyncio.Future] = None
+
+    def start(self):
+        """
+        Start renewing the lease in the background
+        """
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        """
+        Stop renewing the lease
+        """
+        if self._task is None or self._task is asyncio.current_task():
+            return
+
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    async def _run(self):
+        # Renew often enough to survive a couple of slow or failed renewals
+        interval = self._lease / 3
+        while True:
+            await asyncio.sleep(interval)
+
+            error = None
+            try:
+                renewed = await self._backend.renew(self._lock_name, self._lease)
+            except Exception as e:
+                renewed = False
+                error = e
+
+            if not renewed:
+                res = self._on_lost(error)
+                if inspect.isawaitable(res):
+                    await res
+                return
@@ -1,6 +1,52 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Union,
+)
+from uuid import uuid4
+from weakref import WeakKeyDictionary
+
 import shylock.manager
+from shylock.aio.coordinator import LocalCoordinator, get_coordinator
+from shylock.aio.lease import LeaseKeeper
 from shylock.backends import ShylockAsyncBackend
 from shylock.exceptions import ShylockException
+from shylock.quorum import DEFAULT_QUORUM_TTL, majority, valid_until
+from shylock.stripes import DEFAULT_STRIPES, stripe_names
+from shylock.wait import DecorrelatedJitterWait, WaitStrategy
+
+logger = logging.getLogger(__name__)
+
+# Reentrant locks held via each backend, by name: the holding task and how many times it has acquired the lock
+_HOLDS: "WeakKeyDictionary[ShylockAsyncBackend, Dict[str, List[Any]]]" = (
+    WeakKeyDictionary()
+)
+
+
+def _get_backend(backend: Optional[ShylockAsyncBackend]) -> ShylockAsyncBackend:
+    backend = shylock.manager.BACKEND if backend is None else backend
+    if backend is None:
+        raise ShylockException(
+            f"No Shylock backend set, configure one with shylock.configure, "
+            f"or pass instace of shylock.ShylockBackend as argument to Lock()"
+        )
+
+    if not issubclass(backend.__class__, ShylockAsyncBackend):
+        raise ShylockException(
+            "shylock.aio.Lock requires a ShylockAsyncBackend, did you mean to use shylock.Lock?"
+        )
+
+    return backend
 
 
 class Lock:
@@ -17,21 +63,46 @@ class Lock:
     >>> print("Released")
     """
 
-    def __init__(self, name: str, backend: ShylockAsyncBackend = None):
+    def __init__(
+        self,
+        name: str,
+        backend: ShylockAsyncBackend = None,
+        wait: Optional[WaitStrategy] = None,
+        coalesce: bool = False,
+        lease: Optional[float] = None,
+        on_lease_lost: Optional[Callable[["Lock", Optional[Exception]], Any]] = None,
+        fair: bool = False,
+        reentrant: bool = False,
+        sticky: Optional[float] = None,
+    ):
+        """
+        :param name: Name of the lock
+        :param backend: Backend to use instead of the configured default
+        :param wait: Strategy for waiting between attempts instead of the backend's default
+        :param coalesce: Queue up with other coalescing locks of this process locally, so only one of them polls the backend
+        :param lease: Hold the lock for this many seconds at a time and keep renewing it in a background task until released
+        :param on_lease_lost: Called with the lock and the error, if any, when renewing the lease fails, can be a coroutine function
+        :param fair: Queue up with the other fair waiters in the backend, and get the lock in the order of arrival
+        :param reentrant: Let the task holding the lock acquire it again via any reentrant Lock, only the outermost acquire and release reach the backend
+        :param sticky: Keep the lock held in the backend for this many seconds after releasing it, so acquiring it again in this process doesn't reach the backend unless another process is waiting for it
+        """
         self.name = name
-        self._backend = shylock.manager.BACKEND if backend is None else backend
-
-        if not issubclass(self._backend.__class__, ShylockAsyncBackend):
-            raise ShylockException(
-                "shylock.aio.Lock requires a ShylockAsyncBackend, did you mean to use shylock.Lock?"
-            )
-
+        self.lease_lost = False
+        self._wait = wait
+        self._lease = lease
+        self._on_lease_lost = on_lease_lost
+        self._fair = fair
+        self._reentrant = reentrant
+        self._sticky = sticky
+        self._lease_keeper: Optional[LeaseKeeper] = None
+        self._coordinator: Optional[LocalCoordinator] = None
+        self._backend = _get_backend(backend)
         self._locked = False
-        if self._backend is None:
-            raise ShylockException(
-                f"No Shylock backend set, configure one with shylock.configure, "
-                f"or pass instace of shylock.ShylockBackend as argument to Lock()"
-            )
+        # Times the lock is currently acquired via this instance, when reentrant
+        self._depth = 0
+
+        if coalesce:
+            self._coordinator = get_coordinator(self._backend)
 
     async def __aenter__(self):
         await self.acquire()
@@ -39,16 +110,69 @@ class Lock:
     async def __aexit__(self, exc_type, exc_val, exc_tb):
         await self.release()
 
-    async def acquire(self, block: bool = True) -> bool:
+    async def acquire(
+        self, block: bool = True, timeout: Optional[float] = None
+    ) -> bool:
         """
         Try to acquire the lock - optionally block until available
         :param block: Wait until lock is available
-        :return: If lock was successfully acquired - always True if blocking
+        :param timeout: Maximum seconds to wait when blocking, None to wait forever
+        :return: If lock was successfully acquired - always True if blocking without a timeout
         """
-        res = await self._backend.acquire(self.name, block)
+        if self._reentrant:
+            hold = _HOLDS.get(self._backend, {}).get(self.name)
+            if hold is not None and hold[0] is asyncio.current_task():
+                hold[1] += 1
+                self._depth += 1
+                self._locked = True
+                return True
+
+        handed_over = False
+        if self._coordinator is not None:
+            start = time.monotonic()
+            if not await self._coordinator.acquire(self.name, block, timeout):
+                return False
+            handed_over = self._coordinator.handed_over(self.name)
+            if timeout is not None:
+                timeout = max(0.0, timeout - (time.monotonic() - start))
+
+        try:
+            res = False
+            if handed_over:
+                # Still held in the backend, unless it expired while the previous coroutine had it
+                res = await self._backend.renew(self.name, ttl=self._lease)
+            if not res:
+                handed_over = False
+                res = await self._backend.acquire(
+                    self.name,
+                    block,
+                    wait=self._wait,
+                    ttl=self._lease,
+                    timeout=timeout,
+                    fair=self._fair,
+                    sticky=self._sticky,
+                )
+        except BaseException:
+            if self._coordinator is not None:
+                # Still held in the backend if renewing failed, pass it on or have it released there
+                self._coordinator.release(self.name, handover=handed_over)
+            raise
+
+        if not res and self._coordinator is not None:
+            self._coordinator.release(self.name)
 
         if res:
             self._locked = True
+            self.lease_lost = False
+            if self._reentrant:
+                self._depth += 1
+                holds = _HOLDS.setdefault(self._backend, {})
+                holds[self.name] = [asyncio.current_task(), 1]
+            if self._lease is not None:
+                self._lease_keeper = LeaseKeeper(
+                    self._backend, self.name, self._lease, self._lease_lost
+                )
+                self._lease_keeper.start()
 
         return res
 
@@ -67,5 +191,517 @@ class Lock:
             raise ShylockException(
                 f"Trying to unlock {self.name} without locking it first."
             )
-        await self._backend.release(self.name)
+        if self._reentrant:
+            self._depth -= 1
+            self._locked = self._depth > 0
+            holds = _HOLDS[self._backend]
+            holds[self.name][1] -= 1
+            if holds[self.name][1] > 0:
+                # Still held by an outer acquire
+                return
+            del holds[self.name]
+
+        if self._lease_keeper is not None:
+            await self._lease_keeper.stop()
+            self._lease_keeper = None
+
+        # Fair locks go back to the backend's queue, to keep their place behind the waiters of other processes
+        if (
+            self._coordinator is not None
+            and not self._fair
+            and self._coordinator.waiting(self.name)
+        ):
+            self._coordinator.release(self.name, handover=True)
+            self._locked = False
+            return
+
+        try:
+            await self._backend.release(self.name, sticky=self._sticky is not None)
+        finally:
+            if self._coordinator is not None:
+                self._coordinator.release(self.name)
         self._locked = False
+
+    def _lease_lost(self, error: Optional[Exception]):
+        self.lease_lost = True
+        if self._on_lease_lost is not None:
+            return self._on_lease_lost(self, error)
+
+
+class MultiLock:
+    """
+    Acquires several locks at once. They're always taken in the same order, so overlapping sets of locks can't deadlock.
+
+    >>> async with MultiLock(["account-1", "account-2"]):
+    >>>     print("Locked both")
+    """
+
+    def __init__(
+        self,
+        names: Iterable[str],
+        backend: ShylockAsyncBackend = None,
+        wait: Optional[WaitStrategy] = None,
+    ):
+        """
+        :param names: Names of the locks
+        :param backend: Backend to use instead of the configured default
+        :param wait: Strategy for waiting between attempts instead of the backend's default
+        """
+        self.names = sorted(set(names))
+        self._wait = wait
+        self._backend = _get_backend(backend)
+        self._locked = False
+
+    async def __aenter__(self):
+        await self.acquire()
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.release()
+
+    async def acquire(
+        self, block: bool = True, timeout: Optional[float] = None
+    ) -> bool:
+        """
+        Try to acquire all the locks - optionally block until all are available
+        :param block: Wait until the locks are available
+        :param timeout: Maximum seconds to wait when blocking, None to wait forever
+        :return: If the locks were successfully acquired - always True if blocking without a timeout
+        """
+        res = await self._backend.acquire_many(
+            self.names, block, wait=self._wait, timeout=timeout
+        )
+
+        if res:
+            self._locked = True
+
+        return res
+
+    async def locked(self) -> bool:
+        """
+        Does the lock believe it's currently locked - does not check actual backend
+        :return: Locked state
+        """
+        return self._locked
+
+    async def release(self):
+        """
+        Release all the locks
+        """
+        if not self._locked:
+            raise ShylockException(
+                f"Trying to unlock {', '.join(self.names)} without locking them first."
+            )
+        await self._backend.release_many(self.names)
+        self._locked = False
+
+
+class StripedLock(MultiLock):
+    """
+    Maps any number of keys onto a fixed set of locks, so there are at most stripes lock documents for the name.
+    Keys sharing a stripe block each other. Several keys are locked at once, like with MultiLock.
+
+    >>> async with StripedLock("user", f"user-{user_id}"):
+    >>>     print("Locked the stripe of the user")
+    """
+
+    def __init__(
+        self,
+        name: str,
+        keys: Union[str, Iterable[str]],
+        stripes: int = DEFAULT_STRIPES,
+        backend: ShylockAsyncBackend = None,
+        wait: Optional[WaitStrategy] = None,
+    ):
+        """
+        :param name: Name of the striped lock, should be used with the same number of stripes everywhere
+        :param keys: Key or keys of the entities to lock
+        :param stripes: Number of stripes, more means less false contention but more lock documents
+        :param backend: Backend to use instead of the configured default
+        :param wait: Strategy for waiting between attempts instead of the backend's default
+        """
+        if stripes < 1:
+            raise ShylockException(f"Striped lock {name} needs at least 1 stripe.")
+
+        keys = [keys] if isinstance(keys, str) else keys
+        super().__init__(stripe_names(name, keys, stripes), backend, wait)
+        if not self.names:
+            raise ShylockException(f"Striped lock {name} needs at least 1 key.")
+
+        self.name = name
+        self.stripes = stripes
+
+    async def acquire(
+        self, block: bool = True, timeout: Optional[float] = None
+    ) -> bool:
+        """
+        Try to acquire the stripes of the keys - optionally block until all are available
+        :param block: Wait until the locks are available
+        :param timeout: Maximum seconds to wait when blocking, None to wait forever
+        :return: If the locks were successfully acquired - always True if blocking without a timeout
+        """
+        if len(self.names) > 1:
+            return await super().acquire(block, timeout)
+
+        # A single lock can be waited for more efficiently than several
+        res = await self._backend.acquire(
+            self.names[0], block, wait=self._wait, timeout=timeout
+        )
+
+        if res:
+            self._locked = True
+
+        return res
+
+
+class RWLock:
+    """
+    Reader-writer lock, held either by any number of readers or by a single writer.
+    A writer waiting for the lock keeps new readers out, so writers don't starve.
+
+    >>> lock = RWLock("my-lock")
+    >>> async with lock.read():
+    >>>     print("Reading")
+    >>> async with lock.write():
+    >>>     print("Writing")
+    """
+
+    def __init__(
+        self,
+        name: str,
+        backend: ShylockAsyncBackend = None,
+        wait: Optional[WaitStrategy] = None,
+    ):
+        """
+        :param name: Name of the lock
+        :param backend: Backend to use instead of the configured default
+        :param wait: Strategy for waiting between attempts instead of the backend's default
+        """
+        self.name = name
+        self._wait = wait
+        self._backend = _get_backend(backend)
+        self._owner: Optional[str] = None
+        self._writing = False
+
+    @asynccontextmanager
+    async def read(self) -> AsyncIterator[None]:
+        """
+        Hold the lock for reading for the duration of the context
+        """
+        await self.acquire_read()
+        try:
+            yield
+        finally:
+            await self.release()
+
+    @asynccontextmanager
+    async def write(self) -> AsyncIterator[None]:
+        """
+        Hold the lock for writing for the duration of the context
+        """
+        await self.acquire_write()
+        try:
+            yield
+        finally:
+            await self.release()
+
+    async def acquire_read(
+        self, block: bool = True, timeout: Optional[float] = None
+    ) -> bool:
+        """
+        Try to acquire the lock for reading - optionally block until there are no writers
+        :param block: Wait until lock is available
+        :param timeout: Maximum seconds to wait when blocking, None to wait forever
+        :return: If lock was successfully acquired - always True if blocking without a timeout
+        """
+        owner = uuid4().hex
+        res = await self._backend.acquire_read(
+            self.name, owner, block, wait=self._wait, timeout=timeout
+        )
+
+        if res:
+            self._owner = owner
+            self._writing = False
+
+        return res
+
+    async def acquire_write(
+        self, block: bool = True, timeout: Optional[float] = None
+    ) -> bool:
+        """
+        Try to acquire the lock for writing - optionally block until there are no readers or writers
+        :param block: Wait until lock is available
+        :param timeout: Maximum seconds to wait when blocking, None to wait forever
+        :return: If lock was successfully acquired - always True if blocking without a timeout
+        """
+        owner = uuid4().hex
+        res = await self._backend.acquire_write(
+            self.name, owner, block, wait=self._wait, timeout=timeout
+        )
+
+        if res:
+            self._owner = owner
+            self._writing = True
+
+        return res
+
+    async def locked(self) -> bool:
+        """
+        Does the lock believe it's currently locked, for reading or writing - does not check actual backend
+        :return: Locked state
+        """
+        return self._owner is not None
+
+    async def release(self):
+        """
+        Release the lock
+        """
+        if self._owner is None:
+            raise ShylockException(
+                f"Trying to unlock {self.name} without locking it first."
+            )
+        if self._writing:
+            await self._backend.release_write(self.name, self._owner)
+        else:
+            await self._backend.release_read(self.name, self._owner)
+        self._owner = None
+
+
+class Semaphore:
+    """
+    Counting semaphore, held by at most limit holders at once. Each holder has its own slot, which expires if it crashes.
+
+    >>> async with Semaphore("downstream-api", 10):
+    >>>     print("One of at most 10")
+    """
+
+    def __init__(
+        self,
+        name: str,
+        limit: int,
+        backend: ShylockAsyncBackend = None,
+        wait: Optional[WaitStrategy] = None,
+    ):
+        """
+        :param name: Name of the semaphore
+        :param limit: Maximum number of holders at once, should be the same everywhere the semaphore is used
+        :param backend: Backend to use instead of the configured default
+        :param wait: Strategy for waiting between attempts instead of the backend's default
+        """
+        if limit < 1:
+            raise ShylockException(f"Semaphore {name} needs a limit of at least 1.")
+
+        self.name = name
+        self.limit = limit
+        self._wait = wait
+        self._backend = _get_backend(backend)
+        self._owner: Optional[str] = None
+
+    async def __aenter__(self):
+        await self.acquire()
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.release()
+
+    async def acquire(
+        self, block: bool = True, timeout: Optional[float] = None
+    ) -> bool:
+        """
+        Try to acquire a slot - optionally block until one is available
+        :param block: Wait until a slot is available
+        :param timeout: Maximum seconds to wait when blocking, None to wait forever
+        :return: If a slot was successfully acquired - always True if blocking without a timeout
+        """
+        owner = uuid4().hex
+        res = await self._backend.acquire_semaphore(
+            self.name, owner, self.limit, block, wait=self._wait, timeout=timeout
+        )
+
+        if res:
+            self._owner = owner
+
+        return res
+
+    async def locked(self) -> bool:
+        """
+        Does the semaphore believe it's currently holding a slot - does not check actual backend
+        :return: Locked state
+        """
+        return self._owner is not None
+
+    async def release(self):
+        """
+        Release the slot
+        """
+        if self._owner is None:
+            raise ShylockException(
+                f"Trying to release {self.name} without acquiring it first."
+            )
+        await self._backend.release_semaphore(self.name, self._owner)
+        self._owner = None
+
+
+class QuorumLock:
+    """
+    Holds the lock on a majority of independent backends, so it survives losing a minority of them, like Redlock.
+    The backends are asked concurrently, and an attempt is over once the majority is decided either way or the validity
+    window has passed. Backends that answer later count as refusals, and get their locks rolled back. The lock is not
+    renewed, so the critical section should finish before valid_until.
+
+    >>> backends = [await ShylockAsyncRedisBackend.create(Redis(host=host)) for host in ("redis-1", "redis-2", "redis-3")]
+    >>> async with QuorumLock("my-lock", backends, ttl=30):
+    >>>     print("Locked on a majority of the backends")
+    """
+
+    def __init__(
+        self,
+        name: str,
+        backends: Sequence[ShylockAsyncBackend],
+        ttl: float = DEFAULT_QUORUM_TTL,
+        wait: Optional[WaitStrategy] = None,
+    ):
+        """
+        :param name: Name of the lock
+        :param backends: Independent backends, an odd number of them tolerates the most failures
+        :param ttl: Seconds until the lock expires on the backends
+        :param wait: Strategy for waiting between attempts, defaults to randomized backoff so waiters that failed at the same time don't keep splitting the backends between them
+        """
+        if not backends:
+            raise ShylockException(f"Quorum lock {name} needs at least 1 backend.")
+
+        self.name = name
+        self.ttl = ttl
+        # Monotonic time until which the lock is safe to use
+        self.valid_until: Optional[float] = None
+        self._backends = [_get_backend(backend) for backend in backends]
+        self._wait = DecorrelatedJitterWait() if wait is None else wait
+        self._granted: List[ShylockAsyncBackend] = []
+
+    async def __aenter__(self):
+        await self.acquire()
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.release()
+
+    async def acquire(
+        self, block: bool = True, timeout: Optional[float] = None
+    ) -> bool:
+        """
+        Try to acquire the lock on a majority of the backends - optionally block until available
+        :param block: Wait until lock is available
+        :param timeout: Maximum seconds to wait when blocking, None to wait forever
+        :return: If lock was successfully acquired - always True if blocking without a timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        delays = self._wait.delays()
+        while True:
+            if await self._try_acquire():
+                return True
+            if not block:
+                return False
+
+            delay = next(delays)
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                delay = min(delay, remaining)
+            await asyncio.sleep(delay)
+
+    async def locked(self) -> bool:
+        """
+        Does the lock believe it's currently locked - does not check actual backends
+        :return: Locked state
+        """
+        return bool(self._granted)
+
+    async def release(self):
+        """
+        Release the lock on the backends that granted it
+        """
+        if not self._granted:
+            raise ShylockException(
+                f"Trying to unlock {self.name} without locking it first."
+            )
+        await self._release(self._granted)
+        self._granted = []
+        self.valid_until = None
+
+    async def _try_acquire(self) -> bool:
+        start = time.monotonic()
+        until = valid_until(start, self.ttl)
+        needed = majority(len(self._backends))
+        tasks = {
+            asyncio.ensure_future(
+                backend.acquire(self.name, False, ttl=self.ttl)
+            ): backend
+            for backend in self._backends
+        }
+
+        granted: List[ShylockAsyncBackend] = []
+        # Backends that might still grant the lock
+        possible = len(tasks)
+        pending = set(tasks)
+        try:
+            # Until decided either way, or out of time
+            while pending and len(granted) < needed <= possible:
+                remaining = until - time.monotonic()
+                if remaining <= 0:
+                    break
+                done, pending = await asyncio.wait(
+                    pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED
+                )
+                error = None
+                for task in done:
+                    backend = tasks[task]
+                    e = task.exception()
+                    if e is None and task.result():
+                        granted.append(backend)
+                        continue
+                    possible -= 1
+                    if e is not None and not self._unavailable(backend, e):
+                        error = e
+                # Only once the grants of the same batch are known, to roll them back
+                if error is not None:
+                    raise error
+        except BaseException:
+            await self._release(granted)
+            raise
+        finally:
+            for task in pending:
+                # Too late to count, a cancelled acquire releases whatever it got
+                task.cancel()
+
+        if len(granted) >= needed and time.monotonic() < until:
+            self._granted = granted
+            self.valid_until = until
+            return True
+
+        await self._release(granted)
+        return False
+
+    def _unavailable(self, backend: ShylockAsyncBackend, e: BaseException) -> bool:
+        """
+        Check if an attempt at acquiring the lock failed because of the backend, which counts as a refusal
+        :param backend: The backend
+        :param e: The error from the attempt
+        :return: If the error came from the backend, it's then logged
+        """
+        if not isinstance(e, backend._errors):
+            return False
+        # Its lock expires if it was granted after all
+        logger.warning(
+            "Failed to acquire quorum lock %s on %r", self.name, backend, exc_info=e
+        )
+        return True
+
+    async def _release(self, backends: List[ShylockAsyncBackend]):
+        await asyncio.gather(*(self._release_on(backend) for backend in backends))
+
+    async def _release_on(self, backend: ShylockAsyncBackend):
+        try:
+            await backend.release(self.name)
+        except backend._errors as e:
+            # Expires after the TTL
+            logger.warning(
+                "Failed to release quorum lock %s on %r", self.name, backend, exc_info=e
+            )
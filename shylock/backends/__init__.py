@@ -1,22 +1,1554 @@
+import asyncio
+import threading
+import time
+from typing import (
+    Awaitable,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Type,
+    Union,
+)
+from uuid import uuid4
+
+from shylock import metrics
+from shylock.backends.negativecache import NegativeCache
+from shylock.wait import FixedWait, WaitStrategy
+
+POLL_DELAY = 1 / 16  # Some balance between high polling and high delay
+WRITE_INTENT_TTL = 5  # Seconds a waiting writer keeps new readers out without retrying
+QUEUE_TICKET_TTL = (
+    10  # Seconds a fair waiter keeps its place in line without checking its turn
+)
+QUEUE_CHECK_MAX_DELAY = (
+    1  # Most seconds between the checks of a fair waiter that's not first in line
+)
+STICKY_MAX_REUSE = 60  # Seconds a sticky lock is reused for before acquiring it again, well within DOCUMENT_TTL
+
+
+class QueueTicket:
+    """
+    A fair waiter's place in the queue of a shared database, as last written and checked via this backend instance
+    """
+
+    def __init__(self):
+        # Written right away to join the queue
+        self.refresh_at = 0.0
+        self.check_at = 0.0
+        self.delay = POLL_DELAY
+
+    def check_due(self) -> bool:
+        """
+        :return: If it's time to check the position in the queue again
+        """
+        return time.monotonic() >= self.check_at
+
+    def write_due(self) -> bool:
+        """
+        Check if the ticket needs to be written, to join the queue or to keep the place before it expires
+        :return: If the ticket needs to be written, it's then considered written
+        """
+        now = time.monotonic()
+        if now < self.refresh_at:
+            return False
+        self.refresh_at = now + QUEUE_TICKET_TTL / 2
+        return True
+
+    def dropped(self):
+        """
+        The ticket was found missing from the queue, write it again on the next check
+        """
+        self.refresh_at = 0.0
+
+    def checked(self, first: bool):
+        """
+        The position in the queue was checked, back off while not first in line
+        :param first: If this waiter is the first one in line
+        """
+        if first:
+            self.check_at = 0.0
+            self.delay = POLL_DELAY
+        else:
+            self.check_at = time.monotonic() + self.delay
+            self.delay = min(self.delay * 2, QUEUE_CHECK_MAX_DELAY)
+
+
+class StickyHold:
+    """
+    A lock acquired as sticky, kept held via the backend between the releases and acquires of this process
+    """
+
+    def __init__(self, owner: str, idle: float, ttl: Optional[float]):
+        """
+        :param owner: Token the lock was acquired with
+        :param idle: Seconds to keep the lock held after a release, and between the checks for it being wanted
+        :param ttl: Seconds until the lock expires, None for the backend's default
+        """
+        self.owner = owner
+        self.idle = idle
+        self.check_at = time.monotonic() + idle
+        self.reuse_until = 0.0
+        self.renewed(ttl)
+        # Releases the lock once idle for too long, None while in use
+        self.timer: Optional[Union[threading.Timer, asyncio.TimerHandle]] = None
+        # Set when released in this process or no longer kept held, for the waiting tasks of the async backends
+        self.released: Optional[asyncio.Event] = None
+
+    def renewed(self, ttl: Optional[float]):
+        """
+        The expiration of the lock was extended
+        :param ttl: Seconds from now until the lock expires, None for the backend's default
+        """
+        reuse = STICKY_MAX_REUSE if ttl is None else min(ttl / 2, STICKY_MAX_REUSE)
+        self.reuse_until = time.monotonic() + reuse
+
+
 class ShylockAsyncBackend:
+    _wait: WaitStrategy = FixedWait(POLL_DELAY)
+    _negative_cache: Optional[NegativeCache] = None
+    # If the backend can tell the holder of a sticky lock that it's wanted
+    _supports_sticky: bool = False
+    # Raised when the backend can't be reached or fails a request, quorum locks count them as refusals
+    _errors: Tuple[Type[Exception], ...] = (OSError,)
+
     @staticmethod
     def _check():
         raise NotImplementedError()
 
-    async def acquire(self, name: str, block: bool = True):
+    def __init__(self):
+        # Tokens identifying the locks held via this backend instance
+        self._owners: Dict[str, str] = {}
+        # When the locks were acquired, by name and owner, only kept while measuring
+        self._acquired_at: Dict[Tuple[str, str], float] = {}
+        # Locks acquired as sticky, held or kept held after a release
+        self._sticky: Dict[str, StickyHold] = {}
+        self._idle_releases: Set[asyncio.Task] = set()
+        # Places of the fair waiters in the queues, by name and owner
+        self._tickets: Dict[Tuple[str, str], QueueTicket] = {}
+
+    async def acquire(
+        self,
+        name: str,
+        block: bool = True,
+        wait: Optional[WaitStrategy] = None,
+        ttl: Optional[float] = None,
+        timeout: Optional[float] = None,
+        fair: bool = False,
+        sticky: Optional[float] = None,
+    ) -> bool:
+        """
+        Try to acquire a lock, potentially wait until it's available
+        :param name: Name of the lock
+        :param block: Wait for lock
+        :param wait: Wait strategy to use instead of the backend's default
+        :param ttl: Seconds until the lock expires unless renewed, defaults to the backend's DOCUMENT_TTL
+        :param timeout: Maximum seconds to wait for the lock when blocking, None to wait forever
+        :param fair: Queue up with the other fair waiters, and get the lock in the order of arrival
+        :param sticky: Keep the lock held for this many seconds after a sticky release, for the next acquire in this process, and let the sticky holder know when waiting for it
+        :return: If lock was successfully acquired - always True if block is True and there is no timeout
+        """
+        if name in self._sticky:
+            start = time.monotonic()
+            deadline = None if timeout is None else start + timeout
+            reused = await self._reuse_sticky(name, block, deadline, start)
+            if reused is not None:
+                return reused
+            if deadline is not None:
+                timeout = max(0.0, deadline - time.monotonic())
+
+        cache = self._negative_cache
+        if cache is not None and not block and not fair and cache.held(name):
+            return False
+
+        owner = uuid4().hex
+        try_acquire = self._try_acquire_fair if fair else self._try_acquire
+        sticky = sticky if self._supports_sticky else None
+        acquired = False
+        try:
+            acquired = await self._acquire_loop(
+                lambda: self._try_acquire_sticky(try_acquire, name, owner, ttl, sticky),
+                lambda: self._release(name, owner),
+                # Fair waiters poll, which also keeps their place in line
+                None if fair else name,
+                block,
+                wait,
+                timeout,
+                "lock",
+                [name],
+                owner,
+            )
+        finally:
+            if fair:
+                self._tickets.pop((name, owner), None)
+                try:
+                    # Don't keep the waiters behind us waiting for the ticket to expire
+                    await asyncio.shield(self._leave_queue(name, owner))
+                except BaseException:
+                    if acquired:
+                        # Nobody else knows it's held
+                        await asyncio.shield(self._release(name, owner))
+                    raise
+
+        if cache is not None:
+            if acquired:
+                cache.discard(name)
+            elif not block and not fair:
+                cache.add(name, await self._cached_expiry(name))
+        if acquired:
+            self._owners[name] = owner
+            if sticky is not None:
+                hold = StickyHold(owner, sticky, ttl)
+                hold.released = asyncio.Event()
+                self._sticky[name] = hold
+        return acquired
+
+    async def acquire_many(
+        self,
+        names: Iterable[str],
+        block: bool = True,
+        wait: Optional[WaitStrategy] = None,
+        ttl: Optional[float] = None,
+        timeout: Optional[float] = None,
+    ) -> bool:
+        """
+        Try to acquire all the given locks at once, potentially wait until they're all available
+        :param names: Names of the locks
+        :param block: Wait for the locks
+        :param wait: Wait strategy to use instead of the backend's default
+        :param ttl: Seconds until the locks expire unless renewed, defaults to the backend's DOCUMENT_TTL
+        :param timeout: Maximum seconds to wait for the locks when blocking, None to wait forever
+        :return: If the locks were successfully acquired - always True if block is True and there is no timeout
+        """
+        # Always in the same order, so two overlapping sets can't deadlock each other
+        names = sorted(set(names))
+        owner = uuid4().hex
+        acquired = await self._acquire_loop(
+            lambda: self._try_acquire_many(names, owner, ttl),
+            lambda: self._release_many({name: owner for name in names}),
+            None,
+            block,
+            wait,
+            timeout,
+            "lock",
+            names,
+            owner,
+        )
+        if acquired:
+            for name in names:
+                self._owners[name] = owner
+                if self._negative_cache is not None:
+                    self._negative_cache.discard(name)
+        return acquired
+
+    async def release(self, name: str, sticky: bool = False):
+        """
+        Release a given lock
+        :param name: Name of the lock
+        :param sticky: Keep the lock held for a while if it was acquired as sticky, for the next acquire in this process
+        """
+        owner = self._owners.pop(name, None)
+        self._measure_released("lock", name, owner)
+        if self._negative_cache is not None:
+            self._negative_cache.discard(name)
+        try:
+            kept = await self._keep_sticky(name, owner, sticky)
+        except BaseException:
+            # Checking if it's wanted failed, release it or nothing ever will
+            await asyncio.shield(self._release_held(name, owner))
+            raise
+        if not kept:
+            await self._release_held(name, owner)
+
+    async def release_many(self, names: Iterable[str]):
+        """
+        Release all the given locks at once
+        :param names: Names of the locks
+        """
+        owners = {name: self._owners.pop(name, None) for name in names}
+        for name, owner in owners.items():
+            self._measure_released("lock", name, owner)
+            if self._negative_cache is not None:
+                self._negative_cache.discard(name)
+        await self._release_many(owners)
+
+    async def renew(self, name: str, ttl: Optional[float] = None) -> bool:
+        """
+        Extend the expiration of a lock held via this backend
+        :param name: Name of the lock
+        :param ttl: Seconds from now until the lock expires, defaults to the backend's DOCUMENT_TTL
+        :return: If the lock was still ours to renew
+        """
+        owner = self._owners.get(name)
+        if owner is None:
+            return False
+        renewed = await self._renew(name, owner, ttl)
+        hold = self._sticky.get(name)
+        if renewed and hold is not None and hold.owner == owner:
+            hold.renewed(ttl)
+        return renewed
+
+    async def acquire_read(
+        self,
+        name: str,
+        owner: str,
+        block: bool = True,
+        wait: Optional[WaitStrategy] = None,
+        ttl: Optional[float] = None,
+        timeout: Optional[float] = None,
+    ) -> bool:
+        """
+        Try to acquire a reader-writer lock for reading, potentially wait until there are no writers
+        :param name: Name of the lock
+        :param owner: Token identifying this reader, the lock is released with the same token
+        :param block: Wait for lock
+        :param wait: Wait strategy to use instead of the backend's default
+        :param ttl: Seconds until the lock expires, defaults to the backend's DOCUMENT_TTL
+        :param timeout: Maximum seconds to wait for the lock when blocking, None to wait forever
+        :return: If lock was successfully acquired - always True if block is True and there is no timeout
+        """
+        return await self._acquire_loop(
+            lambda: self._try_acquire_read(name, owner, ttl),
+            lambda: self._release_read(name, owner),
+            None,
+            block,
+            wait,
+            timeout,
+            "read",
+            [name],
+            owner,
+        )
+
+    async def acquire_write(
+        self,
+        name: str,
+        owner: str,
+        block: bool = True,
+        wait: Optional[WaitStrategy] = None,
+        ttl: Optional[float] = None,
+        timeout: Optional[float] = None,
+    ) -> bool:
+        """
+        Try to acquire a reader-writer lock for writing, potentially wait until there are no readers or writers.
+        While waiting no new readers can acquire the lock, so writers don't starve.
+        :param name: Name of the lock
+        :param owner: Token identifying this writer, the lock is released with the same token
+        :param block: Wait for lock
+        :param wait: Wait strategy to use instead of the backend's default
+        :param ttl: Seconds until the lock expires, defaults to the backend's DOCUMENT_TTL
+        :param timeout: Maximum seconds to wait for the lock when blocking, None to wait forever
+        :return: If lock was successfully acquired - always True if block is True and there is no timeout
+        """
+        acquired = await self._acquire_loop(
+            lambda: self._try_acquire_write(name, owner, ttl, block),
+            lambda: self._release_write(name, owner),
+            None,
+            block,
+            wait,
+            timeout,
+            "write",
+            [name],
+            owner,
+        )
+        if not acquired and block:
+            # Let the readers in again
+            await self._release_write(name, owner)
+        return acquired
+
+    async def release_read(self, name: str, owner: str):
+        """
+        Release a reader-writer lock acquired for reading
+        :param name: Name of the lock
+        :param owner: Token the lock was acquired with
+        """
+        self._measure_released("read", name, owner)
+        await self._release_read(name, owner)
+
+    async def release_write(self, name: str, owner: str):
+        """
+        Release a reader-writer lock acquired for writing
+        :param name: Name of the lock
+        :param owner: Token the lock was acquired with
+        """
+        self._measure_released("write", name, owner)
+        await self._release_write(name, owner)
+
+    async def acquire_semaphore(
+        self,
+        name: str,
+        owner: str,
+        limit: int,
+        block: bool = True,
+        wait: Optional[WaitStrategy] = None,
+        ttl: Optional[float] = None,
+        timeout: Optional[float] = None,
+    ) -> bool:
+        """
+        Try to acquire a slot of a counting semaphore, potentially wait until one is available
+        :param name: Name of the semaphore
+        :param owner: Token identifying this holder, the slot is released with the same token
+        :param limit: Maximum number of holders at once
+        :param block: Wait for a slot
+        :param wait: Wait strategy to use instead of the backend's default
+        :param ttl: Seconds until the slot expires, defaults to the backend's DOCUMENT_TTL
+        :param timeout: Maximum seconds to wait for a slot when blocking, None to wait forever
+        :return: If a slot was successfully acquired - always True if block is True and there is no timeout
+        """
+        return await self._acquire_loop(
+            lambda: self._try_acquire_semaphore(name, owner, limit, ttl),
+            lambda: self._release_semaphore(name, owner),
+            None,
+            block,
+            wait,
+            timeout,
+            "semaphore",
+            [name],
+            owner,
+        )
+
+    async def release_semaphore(self, name: str, owner: str):
+        """
+        Release a slot of a counting semaphore
+        :param name: Name of the semaphore
+        :param owner: Token the slot was acquired with
+        """
+        self._measure_released("semaphore", name, owner)
+        await self._release_semaphore(name, owner)
+
+    async def _try_acquire_sticky(
+        self,
+        try_acquire: Callable[[str, str, Optional[float]], Awaitable[bool]],
+        name: str,
+        owner: str,
+        ttl: Optional[float],
+        sticky: Optional[float],
+    ) -> bool:
+        """
+        Make a single attempt at acquiring the lock, and let the holder know it's wanted if it's sticky
+        :param try_acquire: Makes the attempt
+        :param name: Name of the lock
+        :param owner: Token identifying this holder of the lock
+        :param ttl: Seconds until the lock expires, None for the backend's default
+        :param sticky: Seconds to keep the lock held after a sticky release, None if not sticky
+        :return: If lock was successfully acquired
+        """
+        if await try_acquire(name, owner, ttl):
+            return True
+        if sticky is not None:
+            await self._mark_wanted(name)
+        return False
+
+    async def _reuse_sticky(
+        self, name: str, block: bool, deadline: Optional[float], start: float
+    ) -> Optional[bool]:
+        """
+        Take a lock kept held after a sticky release back into use, unless someone else wants it. While it's in use in
+        this process wait for it to be released, then take it over without reaching the backend.
+        :param name: Name of the lock
+        :param block: Wait while the lock is in use in this process
+        :param deadline: time.monotonic() to stop waiting at, None to wait forever
+        :param start: When the acquire started, for the metrics
+        :return: If the lock was reused, None if it's no longer kept held and has to be acquired via the backend
+        """
+        while True:
+            hold = self._sticky.get(name)
+            if hold is None:
+                return None
+            if hold.timer is not None:
+                break
+
+            # In use, or being released
+            remaining = None
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+            if not block or (remaining is not None and remaining <= 0):
+                return False
+            try:
+                await asyncio.wait_for(hold.released.wait(), remaining)
+            except asyncio.TimeoutError:
+                return False
+
+        hold.timer.cancel()
+        hold.timer = None
+        hold.released = asyncio.Event()
+
+        now = time.monotonic()
+        if now < hold.reuse_until:
+            if now < hold.check_at:
+                wanted = False
+            else:
+                try:
+                    wanted = await self._is_wanted(name, hold.owner)
+                except BaseException:
+                    # Not in use nor timed anymore, release it or nothing ever will
+                    await asyncio.shield(self._release_held(name, hold.owner))
+                    raise
+                hold.check_at = time.monotonic() + hold.idle
+            if not wanted:
+                self._owners[name] = hold.owner
+                self._measure_acquired("lock", [name], hold.owner, start, 0, True)
+                return True
+
+        await self._release_held(name, hold.owner)
+        return None
+
+    async def _keep_sticky(self, name: str, owner: Optional[str], sticky: bool) -> bool:
+        """
+        Keep the lock held for a while after releasing it, if it was acquired as sticky and nobody else wants it
+        :param name: Name of the lock
+        :param owner: Token the lock was acquired with
+        :param sticky: If the release is sticky
+        :return: If the lock was kept held, otherwise it has to be released and then dropped with _drop_sticky
+        """
+        hold = self._sticky.get(name)
+        if hold is None or hold.owner != owner:
+            return False
+
+        now = time.monotonic()
+        keep = sticky and now < hold.reuse_until
+        if keep and now >= hold.check_at:
+            # Don't keep another process waiting for the whole idle time
+            keep = not await self._is_wanted(name, owner)
+            hold.check_at = time.monotonic() + hold.idle
+        if not keep:
+            return False
+
+        loop = asyncio.get_running_loop()
+        hold.timer = loop.call_later(hold.idle, self._release_idle, name, hold)
+        hold.released.set()
+        return True
+
+    def _drop_sticky(self, name: str, owner: Optional[str]):
+        """
+        Stop keeping the lock held once it's released, and let the tasks waiting for it acquire it via the backend
+        :param name: Name of the lock
+        :param owner: Token the lock was acquired with
+        """
+        hold = self._sticky.get(name)
+        if hold is not None and hold.owner == owner:
+            del self._sticky[name]
+            hold.released.set()
+
+    def _release_idle(self, name: str, hold: StickyHold):
+        if self._sticky.get(name) is not hold or hold.timer is None:
+            return
+        # Acquires in this process wait for the release
+        hold.timer = None
+        hold.released = asyncio.Event()
+        task = asyncio.ensure_future(self._release_held(name, hold.owner))
+        self._idle_releases.add(task)
+        task.add_done_callback(self._idle_releases.discard)
+
+    async def _release_held(self, name: str, owner: Optional[str]):
+        try:
+            await self._release(name, owner)
+        finally:
+            self._drop_sticky(name, owner)
+
+    async def _acquire_loop(
+        self,
+        attempt: Callable[[], Awaitable[bool]],
+        undo: Callable[[], Awaitable[None]],
+        name: Optional[str],
+        block: bool,
+        wait: Optional[WaitStrategy],
+        timeout: Optional[float],
+        kind: str,
+        names: List[str],
+        owner: str,
+    ) -> bool:
+        """
+        Keep attempting until successful, unless not blocking or out of time
+        :param attempt: Makes a single attempt at acquiring
+        :param undo: Releases whatever a cancelled attempt might have acquired
+        :param name: Name of the lock waited for, None if waiting for several
+        :param block: Wait until successful
+        :param wait: Wait strategy to use instead of the backend's default
+        :param timeout: Maximum seconds to wait when blocking, None to wait forever
+        :param kind: What is being acquired, for the metrics
+        :param names: Names of the locks being acquired, for the metrics
+        :param owner: Token the locks are acquired with, for the metrics
+        :return: If the attempt succeeded
+        """
+        start = time.monotonic()
+        deadline = None if timeout is None else start + timeout
+        delays = None
+        attempts = 0
+        acquired = False
+        while True:
+            attempts += 1
+            try:
+                acquired = await attempt()
+            except asyncio.CancelledError:
+                # The attempt might have gone through before we were cancelled
+                await asyncio.shield(undo())
+                raise
+
+            if acquired:
+                break
+
+            if not block:
+                break
+
+            if delays is None:
+                delays = (self._wait if wait is None else wait).delays()
+            delay = next(delays)
+
+            remaining = None
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                delay = min(delay, remaining)
+
+            await self._wait_for_release(name, delay, remaining)
+
+        self._measure_acquired(kind, names, owner, start, attempts, acquired)
+        return acquired
+
+    def _measure_acquired(
+        self,
+        kind: str,
+        names: List[str],
+        owner: str,
+        start: float,
+        attempts: int,
+        acquired: bool,
+    ):
+        now = time.monotonic()
+        tracker = metrics.TRACKER
+        if tracker is not None and (attempts > 1 or not acquired):
+            for name in names:
+                tracker.waited(name, now - start)
+
+        collector = metrics.COLLECTOR
+        if collector is None:
+            return
+
+        for name in names:
+            collector.acquired(name, kind, now - start, attempts, acquired)
+            if acquired:
+                self._acquired_at[(name, owner)] = now
+
+    def _measure_released(self, kind: str, name: str, owner: Optional[str]):
+        acquired_at = self._acquired_at.pop((name, owner), None)
+        collector = metrics.COLLECTOR
+        if acquired_at is not None and collector is not None:
+            collector.released(name, kind, time.monotonic() - acquired_at)
+
+    @staticmethod
+    def _conflicted(name: str):
+        """
+        Report an attempt that found the lock held by someone else, for the contention tracker
+        :param name: Name of the lock
+        """
+        tracker = metrics.TRACKER
+        if tracker is not None:
+            tracker.conflicted(name)
+
+    async def _cached_expiry(self, name: str) -> Optional[float]:
+        try:
+            return await self._holder_expires_in(name)
+        except self._errors:
+            # Cached for the whole window instead, the lock was found held after all
+            return None
+
+    async def _holder_expires_in(self, name: str) -> Optional[float]:
+        """
+        Check when the lock held by someone else expires, for the negative cache
+        :param name: Name of the lock
+        :return: Seconds until it expires, None if not known
+        """
+        return None
+
+    async def _try_acquire(self, name: str, owner: str, ttl: Optional[float]) -> bool:
+        """
+        Make a single attempt at acquiring the lock
+        :param name: Name of the lock
+        :param owner: Token identifying this holder of the lock
+        :param ttl: Seconds until the lock expires, None for the backend's default
+        :return: If lock was successfully acquired
+        """
+        raise NotImplementedError()
+
+    async def _try_acquire_many(
+        self, names: List[str], owner: str, ttl: Optional[float]
+    ) -> bool:
+        """
+        Make a single attempt at acquiring all the locks, without leaving any of them held on failure
+        :param names: Names of the locks, sorted
+        :param owner: Token identifying this holder of the locks
+        :param ttl: Seconds until the locks expire, None for the backend's default
+        :return: If the locks were successfully acquired
+        """
         raise NotImplementedError()
 
-    async def release(self, name: str):
+    async def _release(self, name: str, owner: Optional[str]):
+        """
+        Release the lock
+        :param name: Name of the lock
+        :param owner: Token the lock was acquired with, None if not acquired via this backend instance
+        """
         raise NotImplementedError()
 
+    async def _release_many(self, owners: Dict[str, Optional[str]]):
+        """
+        Release all the locks
+        :param owners: Names of the locks and the tokens they were acquired with, None if not acquired via this backend instance
+        """
+        raise NotImplementedError()
+
+    async def _renew(self, name: str, owner: str, ttl: Optional[float]) -> bool:
+        """
+        Extend the expiration of the lock if it's still held by the owner
+        :param name: Name of the lock
+        :param owner: Token the lock was acquired with
+        :param ttl: Seconds from now until the lock expires, None for the backend's default
+        :return: If the lock was renewed
+        """
+        raise NotImplementedError()
+
+    async def _try_acquire_read(
+        self, name: str, owner: str, ttl: Optional[float]
+    ) -> bool:
+        """
+        Make a single attempt at acquiring the reader-writer lock for reading
+        :param name: Name of the lock
+        :param owner: Token identifying this reader
+        :param ttl: Seconds until the lock expires, None for the backend's default
+        :return: If lock was successfully acquired
+        """
+        raise NotImplementedError()
+
+    async def _try_acquire_write(
+        self, name: str, owner: str, ttl: Optional[float], queue: bool
+    ) -> bool:
+        """
+        Make a single attempt at acquiring the reader-writer lock for writing
+        :param name: Name of the lock
+        :param owner: Token identifying this writer
+        :param ttl: Seconds until the lock expires, None for the backend's default
+        :param queue: If the lock is not available, keep new readers out for WRITE_INTENT_TTL unless another writer is already waiting
+        :return: If lock was successfully acquired
+        """
+        raise NotImplementedError()
+
+    async def _release_read(self, name: str, owner: str):
+        """
+        Release the reader-writer lock acquired for reading
+        :param name: Name of the lock
+        :param owner: Token the lock was acquired with
+        """
+        raise NotImplementedError()
+
+    async def _release_write(self, name: str, owner: str):
+        """
+        Release the reader-writer lock acquired for writing, or stop waiting for it
+        :param name: Name of the lock
+        :param owner: Token the lock was acquired or waited for with
+        """
+        raise NotImplementedError()
+
+    async def _try_acquire_semaphore(
+        self, name: str, owner: str, limit: int, ttl: Optional[float]
+    ) -> bool:
+        """
+        Make a single attempt at acquiring a slot of the semaphore
+        :param name: Name of the semaphore
+        :param owner: Token identifying this holder
+        :param limit: Maximum number of holders at once
+        :param ttl: Seconds until the slot expires, None for the backend's default
+        :return: If a slot was successfully acquired
+        """
+        raise NotImplementedError()
+
+    async def _release_semaphore(self, name: str, owner: str):
+        """
+        Release the slot of the semaphore
+        :param name: Name of the semaphore
+        :param owner: Token the slot was acquired with
+        """
+        raise NotImplementedError()
+
+    async def _try_acquire_fair(
+        self, name: str, owner: str, ttl: Optional[float]
+    ) -> bool:
+        """
+        Make a single attempt at acquiring the lock, if first in the queue of fair waiters
+        :param name: Name of the lock
+        :param owner: Token identifying this holder of the lock
+        :param ttl: Seconds until the lock expires, None for the backend's default
+        :return: If lock was successfully acquired
+        """
+        return await self._take_turn(name, owner) and await self._try_acquire(
+            name, owner, ttl
+        )
+
+    async def _take_turn(self, name: str, owner: str) -> bool:
+        """
+        Join the queue of fair waiters for the lock unless already in it, and keep the place for QUEUE_TICKET_TTL
+        :param name: Name of the lock
+        :param owner: Token identifying this waiter
+        :return: If this waiter is the first one in line
+        """
+        raise NotImplementedError()
+
+    def _ticket(self, name: str, owner: str) -> QueueTicket:
+        """
+        Get the place of a fair waiter in the queue, for the backends that keep the queue in a shared database
+        :param name: Name of the lock
+        :param owner: Token identifying this waiter
+        :return: The ticket, not yet written when new
+        """
+        return self._tickets.setdefault((name, owner), QueueTicket())
+
+    async def _leave_queue(self, name: str, owner: str):
+        """
+        Leave the queue of fair waiters for the lock
+        :param name: Name of the lock
+        :param owner: Token identifying this waiter
+        """
+        raise NotImplementedError()
+
+    async def _mark_wanted(self, name: str):
+        """
+        Let the holder of a sticky lock know another process is waiting for it, only needed if _supports_sticky
+        :param name: Name of the lock
+        """
+        raise NotImplementedError()
+
+    async def _is_wanted(self, name: str, owner: str) -> bool:
+        """
+        Check if another process is waiting for a sticky lock, only needed if _supports_sticky
+        :param name: Name of the lock
+        :param owner: Token the lock was acquired with
+        :return: If the lock is wanted, or no longer held by the owner
+        """
+        raise NotImplementedError()
+
+    async def _wait_for_release(
+        self, name: Optional[str], delay: float, remaining: Optional[float]
+    ):
+        """
+        Wait before the next attempt at acquiring the lock
+        :param name: Name of the lock, None if waiting for several
+        :param delay: Delay suggested by the wait strategy
+        :param remaining: Seconds left until the acquire times out, None if there is no timeout
+        """
+        await asyncio.sleep(delay)
+
 
 class ShylockSyncBackend:
+    _wait: WaitStrategy = FixedWait(POLL_DELAY)
+    _negative_cache: Optional[NegativeCache] = None
+    # If the backend can tell the holder of a sticky lock that it's wanted
+    _supports_sticky: bool = False
+    # Raised when the backend can't be reached or fails a request, quorum locks count them as refusals
+    _errors: Tuple[Type[Exception], ...] = (OSError,)
+
     @staticmethod
     def _check():
         raise NotImplementedError()
 
-    def acquire(self, name: str, block: bool = True):
+    def __init__(self):
+        # Tokens identifying the locks held via this backend instance
+        self._owners: Dict[str, str] = {}
+        # When the locks were acquired, by name and owner, only kept while measuring
+        self._acquired_at: Dict[Tuple[str, str], float] = {}
+        # Locks acquired as sticky, held or kept held after a release
+        self._sticky: Dict[str, StickyHold] = {}
+        # Notified when a sticky lock is released in this process
+        self._sticky_cond = threading.Condition()
+        # Places of the fair waiters in the queues, by name and owner
+        self._tickets: Dict[Tuple[str, str], QueueTicket] = {}
+
+    def acquire(
+        self,
+        name: str,
+        block: bool = True,
+        wait: Optional[WaitStrategy] = None,
+        ttl: Optional[float] = None,
+        timeout: Optional[float] = None,
+        fair: bool = False,
+        sticky: Optional[float] = None,
+    ) -> bool:
+        """
+        Try to acquire a lock, potentially wait until it's available
+        :param name: Name of the lock
+        :param block: Wait for lock
+        :param wait: Wait strategy to use instead of the backend's default
+        :param ttl: Seconds until the lock expires unless renewed, defaults to the backend's DOCUMENT_TTL
+        :param timeout: Maximum seconds to wait for the lock when blocking, None to wait forever
+        :param fair: Queue up with the other fair waiters, and get the lock in the order of arrival
+        :param sticky: Keep the lock held for this many seconds after a sticky release, for the next acquire in this process, and let the sticky holder know when waiting for it
+        :return: If lock was successfully acquired - always True if block is True and there is no timeout
+        """
+        if name in self._sticky:
+            start = time.monotonic()
+            deadline = None if timeout is None else start + timeout
+            reused = self._reuse_sticky(name, block, deadline, start)
+            if reused is not None:
+                return reused
+            if deadline is not None:
+                timeout = max(0.0, deadline - time.monotonic())
+
+        cache = self._negative_cache
+        if cache is not None and not block and not fair and cache.held(name):
+            return False
+
+        owner = uuid4().hex
+        try_acquire = self._try_acquire_fair if fair else self._try_acquire
+        sticky = sticky if self._supports_sticky else None
+        acquired = False
+        try:
+            acquired = self._acquire_loop(
+                lambda: self._try_acquire_sticky(try_acquire, name, owner, ttl, sticky),
+                # Fair waiters poll, which also keeps their place in line
+                None if fair else name,
+                block,
+                wait,
+                timeout,
+                "lock",
+                [name],
+                owner,
+            )
+        finally:
+            if fair:
+                self._tickets.pop((name, owner), None)
+                try:
+                    self._leave_queue(name, owner)
+                except BaseException:
+                    if acquired:
+                        # Nobody else knows it's held
+                        self._release(name, owner)
+                    raise
+
+        if cache is not None:
+            if acquired:
+                cache.discard(name)
+            elif not block and not fair:
+                cache.add(name, self._cached_expiry(name))
+        if acquired:
+            self._owners[name] = owner
+            if sticky is not None:
+                self._sticky[name] = StickyHold(owner, sticky, ttl)
+        return acquired
+
+    def acquire_many(
+        self,
+        names: Iterable[str],
+        block: bool = True,
+        wait: Optional[WaitStrategy] = None,
+        ttl: Optional[float] = None,
+        timeout: Optional[float] = None,
+    ) -> bool:
+        """
+        Try to acquire all the given locks at once, potentially wait until they're all available
+        :param names: Names of the locks
+        :param block: Wait for the locks
+        :param wait: Wait strategy to use instead of the backend's default
+        :param ttl: Seconds until the locks expire unless renewed, defaults to the backend's DOCUMENT_TTL
+        :param timeout: Maximum seconds to wait for the locks when blocking, None to wait forever
+        :return: If the locks were successfully acquired - always True if block is True and there is no timeout
+        """
+        # Always in the same order, so two overlapping sets can't deadlock each other
+        names = sorted(set(names))
+        owner = uuid4().hex
+        acquired = self._acquire_loop(
+            lambda: self._try_acquire_many(names, owner, ttl),
+            None,
+            block,
+            wait,
+            timeout,
+            "lock",
+            names,
+            owner,
+        )
+        if acquired:
+            for name in names:
+                self._owners[name] = owner
+                if self._negative_cache is not None:
+                    self._negative_cache.discard(name)
+        return acquired
+
+    def release(self, name: str, sticky: bool = False):
+        """
+        Release a given lock
+        :param name: Name of the lock
+        :param sticky: Keep the lock held for a while if it was acquired as sticky, for the next acquire in this process
+        """
+        owner = self._owners.pop(name, None)
+        self._measure_released("lock", name, owner)
+        if self._negative_cache is not None:
+            self._negative_cache.discard(name)
+        try:
+            kept = self._keep_sticky(name, owner, sticky)
+        except BaseException:
+            # Checking if it's wanted failed, release it or nothing ever will
+            self._release_held(name, owner)
+            raise
+        if not kept:
+            self._release_held(name, owner)
+
+    def release_many(self, names: Iterable[str]):
+        """
+        Release all the given locks at once
+        :param names: Names of the locks
+        """
+        owners = {name: self._owners.pop(name, None) for name in names}
+        for name, owner in owners.items():
+            self._measure_released("lock", name, owner)
+            if self._negative_cache is not None:
+                self._negative_cache.discard(name)
+        self._release_many(owners)
+
+    def renew(self, name: str, ttl: Optional[float] = None) -> bool:
+        """
+        Extend the expiration of a lock held via this backend
+        :param name: Name of the lock
+        :param ttl: Seconds from now until the lock expires, defaults to the backend's DOCUMENT_TTL
+        :return: If the lock was still ours to renew
+        """
+        owner = self._owners.get(name)
+        if owner is None:
+            return False
+        renewed = self._renew(name, owner, ttl)
+        hold = self._sticky.get(name)
+        if renewed and hold is not None and hold.owner == owner:
+            hold.renewed(ttl)
+        return renewed
+
+    def acquire_read(
+        self,
+        name: str,
+        owner: str,
+        block: bool = True,
+        wait: Optional[WaitStrategy] = None,
+        ttl: Optional[float] = None,
+        timeout: Optional[float] = None,
+    ) -> bool:
+        """
+        Try to acquire a reader-writer lock for reading, potentially wait until there are no writers
+        :param name: Name of the lock
+        :param owner: Token identifying this reader, the lock is released with the same token
+        :param block: Wait for lock
+        :param wait: Wait strategy to use instead of the backend's default
+        :param ttl: Seconds until the lock expires, defaults to the backend's DOCUMENT_TTL
+        :param timeout: Maximum seconds to wait for the lock when blocking, None to wait forever
+        :return: If lock was successfully acquired - always True if block is True and there is no timeout
+        """
+        return self._acquire_loop(
+            lambda: self._try_acquire_read(name, owner, ttl),
+            None,
+            block,
+            wait,
+            timeout,
+            "read",
+            [name],
+            owner,
+        )
+
+    def acquire_write(
+        self,
+        name: str,
+        owner: str,
+        block: bool = True,
+        wait: Optional[WaitStrategy] = None,
+        ttl: Optional[float] = None,
+        timeout: Optional[float] = None,
+    ) -> bool:
+        """
+        Try to acquire a reader-writer lock for writing, potentially wait until there are no readers or writers.
+        While waiting no new readers can acquire the lock, so writers don't starve.
+        :param name: Name of the lock
+        :param owner: Token identifying this writer, the lock is released with the same token
+        :param block: Wait for lock
+        :param wait: Wait strategy to use instead of the backend's default
+        :param ttl: Seconds until the lock expires, defaults to the backend's DOCUMENT_TTL
+        :param timeout: Maximum seconds to wait for the lock when blocking, None to wait forever
+        :return: If lock was successfully acquired - always True if block is True and there is no timeout
+        """
+        acquired = self._acquire_loop(
+            lambda: self._try_acquire_write(name, owner, ttl, block),
+            None,
+            block,
+            wait,
+            timeout,
+            "write",
+            [name],
+            owner,
+        )
+        if not acquired and block:
+            # Let the readers in again
+            self._release_write(name, owner)
+        return acquired
+
+    def release_read(self, name: str, owner: str):
+        """
+        Release a reader-writer lock acquired for reading
+        :param name: Name of the lock
+        :param owner: Token the lock was acquired with
+        """
+        self._measure_released("read", name, owner)
+        self._release_read(name, owner)
+
+    def release_write(self, name: str, owner: str):
+        """
+        Release a reader-writer lock acquired for writing
+        :param name: Name of the lock
+        :param owner: Token the lock was acquired with
+        """
+        self._measure_released("write", name, owner)
+        self._release_write(name, owner)
+
+    def acquire_semaphore(
+        self,
+        name: str,
+        owner: str,
+        limit: int,
+        block: bool = True,
+        wait: Optional[WaitStrategy] = None,
+        ttl: Optional[float] = None,
+        timeout: Optional[float] = None,
+    ) -> bool:
+        """
+        Try to acquire a slot of a counting semaphore, potentially wait until one is available
+        :param name: Name of the semaphore
+        :param owner: Token identifying this holder, the slot is released with the same token
+        :param limit: Maximum number of holders at once
+        :param block: Wait for a slot
+        :param wait: Wait strategy to use instead of the backend's default
+        :param ttl: Seconds until the slot expires, defaults to the backend's DOCUMENT_TTL
+        :param timeout: Maximum seconds to wait for a slot when blocking, None to wait forever
+        :return: If a slot was successfully acquired - always True if block is True and there is no timeout
+        """
+        return self._acquire_loop(
+            lambda: self._try_acquire_semaphore(name, owner, limit, ttl),
+            None,
+            block,
+            wait,
+            timeout,
+            "semaphore",
+            [name],
+            owner,
+        )
+
+    def release_semaphore(self, name: str, owner: str):
+        """
+        Release a slot of a counting semaphore
+        :param name: Name of the semaphore
+        :param owner: Token the slot was acquired with
+        """
+        self._measure_released("semaphore", name, owner)
+        self._release_semaphore(name, owner)
+
+    def _try_acquire_sticky(
+        self,
+        try_acquire: Callable[[str, str, Optional[float]], bool],
+        name: str,
+        owner: str,
+        ttl: Optional[float],
+        sticky: Optional[float],
+    ) -> bool:
+        """
+        Make a single attempt at acquiring the lock, and let the holder know it's wanted if it's sticky
+        :param try_acquire: Makes the attempt
+        :param name: Name of the lock
+        :param owner: Token identifying this holder of the lock
+        :param ttl: Seconds until the lock expires, None for the backend's default
+        :param sticky: Seconds to keep the lock held after a sticky release, None if not sticky
+        :return: If lock was successfully acquired
+        """
+        if try_acquire(name, owner, ttl):
+            return True
+        if sticky is not None:
+            self._mark_wanted(name)
+        return False
+
+    def _reuse_sticky(
+        self, name: str, block: bool, deadline: Optional[float], start: float
+    ) -> Optional[bool]:
+        """
+        Take a lock kept held after a sticky release back into use, unless someone else wants it. While it's in use in
+        this process wait for it to be released, then take it over without reaching the backend.
+        :param name: Name of the lock
+        :param block: Wait while the lock is in use in this process
+        :param deadline: time.monotonic() to stop waiting at, None to wait forever
+        :param start: When the acquire started, for the metrics
+        :return: If the lock was reused, None if it's no longer kept held and has to be acquired via the backend
+        """
+        with self._sticky_cond:
+            while True:
+                hold = self._sticky.get(name)
+                if hold is None:
+                    return None
+                if hold.timer is not None:
+                    break
+
+                # In use, or being released
+                remaining = None
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                if not block or (remaining is not None and remaining <= 0):
+                    return False
+                self._sticky_cond.wait(remaining)
+
+            hold.timer.cancel()
+            hold.timer = None
+
+        now = time.monotonic()
+        if now < hold.reuse_until:
+            if now < hold.check_at:
+                wanted = False
+            else:
+                try:
+                    wanted = self._is_wanted(name, hold.owner)
+                except BaseException:
+                    # Not in use nor timed anymore, release it or nothing ever will
+                    self._release_held(name, hold.owner)
+                    raise
+                hold.check_at = time.monotonic() + hold.idle
+            if not wanted:
+                self._owners[name] = hold.owner
+                self._measure_acquired("lock", [name], hold.owner, start, 0, True)
+                return True
+
+        self._release_held(name, hold.owner)
+        return None
+
+    def _keep_sticky(self, name: str, owner: Optional[str], sticky: bool) -> bool:
+        """
+        Keep the lock held for a while after releasing it, if it was acquired as sticky and nobody else wants it
+        :param name: Name of the lock
+        :param owner: Token the lock was acquired with
+        :param sticky: If the release is sticky
+        :return: If the lock was kept held, otherwise it has to be released and then dropped with _drop_sticky
+        """
+        with self._sticky_cond:
+            hold = self._sticky.get(name)
+            if hold is None or hold.owner != owner:
+                return False
+
+        now = time.monotonic()
+        keep = sticky and now < hold.reuse_until
+        if keep and now >= hold.check_at:
+            # Don't keep another process waiting for the whole idle time
+            keep = not self._is_wanted(name, owner)
+            hold.check_at = time.monotonic() + hold.idle
+        if not keep:
+            return False
+
+        with self._sticky_cond:
+            # Not a daemon, so exiting waits for the lock to be released
+            hold.timer = threading.Timer(hold.idle, self._release_idle, (name, hold))
+            hold.timer.start()
+            self._sticky_cond.notify_all()
+        return True
+
+    def _drop_sticky(self, name: str, owner: Optional[str]):
+        """
+        Stop keeping the lock held once it's released, and let the threads waiting for it acquire it via the backend
+        :param name: Name of the lock
+        :param owner: Token the lock was acquired with
+        """
+        with self._sticky_cond:
+            hold = self._sticky.get(name)
+            if hold is not None and hold.owner == owner:
+                del self._sticky[name]
+                self._sticky_cond.notify_all()
+
+    def _release_idle(self, name: str, hold: StickyHold):
+        with self._sticky_cond:
+            if self._sticky.get(name) is not hold or hold.timer is None:
+                return
+            # Acquires in this process wait for the release
+            hold.timer = None
+
+        self._release_held(name, hold.owner)
+
+    def _release_held(self, name: str, owner: Optional[str]):
+        try:
+            self._release(name, owner)
+        finally:
+            self._drop_sticky(name, owner)
+
+    def _acquire_loop(
+        self,
+        attempt: Callable[[], bool],
+        name: Optional[str],
+        block: bool,
+        wait: Optional[WaitStrategy],
+        timeout: Optional[float],
+        kind: str,
+        names: List[str],
+        owner: str,
+    ) -> bool:
+        """
+        Keep attempting until successful, unless not blocking or out of time
+        :param attempt: Makes a single attempt at acquiring
+        :param name: Name of the lock waited for, None if waiting for several
+        :param block: Wait until successful
+        :param wait: Wait strategy to use instead of the backend's default
+        :param timeout: Maximum seconds to wait when blocking, None to wait forever
+        :param kind: What is being acquired, for the metrics
+        :param names: Names of the locks being acquired, for the metrics
+        :param owner: Token the locks are acquired with, for the metrics
+        :return: If the attempt succeeded
+        """
+        start = time.monotonic()
+        deadline = None if timeout is None else start + timeout
+        delays = None
+        attempts = 0
+        acquired = False
+        while True:
+            attempts += 1
+            if attempt():
+                acquired = True
+                break
+
+            if not block:
+                break
+
+            if delays is None:
+                delays = (self._wait if wait is None else wait).delays()
+            delay = next(delays)
+
+            remaining = None
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                delay = min(delay, remaining)
+
+            self._wait_for_release(name, delay, remaining)
+
+        self._measure_acquired(kind, names, owner, start, attempts, acquired)
+        return acquired
+
+    def _measure_acquired(
+        self,
+        kind: str,
+        names: List[str],
+        owner: str,
+        start: float,
+        attempts: int,
+        acquired: bool,
+    ):
+        now = time.monotonic()
+        tracker = metrics.TRACKER
+        if tracker is not None and (attempts > 1 or not acquired):
+            for name in names:
+                tracker.waited(name, now - start)
+
+        collector = metrics.COLLECTOR
+        if collector is None:
+            return
+
+        for name in names:
+            collector.acquired(name, kind, now - start, attempts, acquired)
+            if acquired:
+                self._acquired_at[(name, owner)] = now
+
+    def _measure_released(self, kind: str, name: str, owner: Optional[str]):
+        acquired_at = self._acquired_at.pop((name, owner), None)
+        collector = metrics.COLLECTOR
+        if acquired_at is not None and collector is not None:
+            collector.released(name, kind, time.monotonic() - acquired_at)
+
+    @staticmethod
+    def _conflicted(name: str):
+        """
+        Report an attempt that found the lock held by someone else, for the contention tracker
+        :param name: Name of the lock
+        """
+        tracker = metrics.TRACKER
+        if tracker is not None:
+            tracker.conflicted(name)
+
+    def _cached_expiry(self, name: str) -> Optional[float]:
+        try:
+            return self._holder_expires_in(name)
+        except self._errors:
+            # Cached for the whole window instead, the lock was found held after all
+            return None
+
+    def _holder_expires_in(self, name: str) -> Optional[float]:
+        """
+        Check when the lock held by someone else expires, for the negative cache
+        :param name: Name of the lock
+        :return: Seconds until it expires, None if not known
+        """
+        return None
+
+    def _try_acquire(self, name: str, owner: str, ttl: Optional[float]) -> bool:
+        """
+        Make a single attempt at acquiring the lock
+        :param name: Name of the lock
+        :param owner: Token identifying this holder of the lock
+        :param ttl: Seconds until the lock expires, None for the backend's default
+        :return: If lock was successfully acquired
+        """
+        raise NotImplementedError()
+
+    def _try_acquire_many(
+        self, names: List[str], owner: str, ttl: Optional[float]
+    ) -> bool:
+        """
+        Make a single attempt at acquiring all the locks, without leaving any of them held on failure
+        :param names: Names of the locks, sorted
+        :param owner: Token identifying this holder of the locks
+        :param ttl: Seconds until the locks expire, None for the backend's default
+        :return: If the locks were successfully acquired
+        """
+        raise NotImplementedError()
+
+    def _release(self, name: str, owner: Optional[str]):
+        """
+        Release the lock
+        :param name: Name of the lock
+        :param owner: Token the lock was acquired with, None if not acquired via this backend instance
+        """
+        raise NotImplementedError()
+
+    def _release_many(self, owners: Dict[str, Optional[str]]):
+        """
+        Release all the locks
+        :param owners: Names of the locks and the tokens they were acquired with, None if not acquired via this backend instance
+        """
+        raise NotImplementedError()
+
+    def _renew(self, name: str, owner: str, ttl: Optional[float]) -> bool:
+        """
+        Extend the expiration of the lock if it's still held by the owner
+        :param name: Name of the lock
+        :param owner: Token the lock was acquired with
+        :param ttl: Seconds from now until the lock expires, None for the backend's default
+        :return: If the lock was renewed
+        """
+        raise NotImplementedError()
+
+    def _try_acquire_read(self, name: str, owner: str, ttl: Optional[float]) -> bool:
+        """
+        Make a single attempt at acquiring the reader-writer lock for reading
+        :param name: Name of the lock
+        :param owner: Token identifying this reader
+        :param ttl: Seconds until the lock expires, None for the backend's default
+        :return: If lock was successfully acquired
+        """
         raise NotImplementedError()
 
-    def release(self, name: str):
+    def _try_acquire_write(
+        self, name: str, owner: str, ttl: Optional[float], queue: bool
+    ) -> bool:
+        """
+        Make a single attempt at acquiring the reader-writer lock for writing
+        :param name: Name of the lock
+        :param owner: Token identifying this writer
+        :param ttl: Seconds until the lock expires, None for the backend's default
+        :param queue: If the lock is not available, keep new readers out for WRITE_INTENT_TTL unless another writer is already waiting
+        :return: If lock was successfully acquired
+        """
         raise NotImplementedError()
+
+    def _release_read(self, name: str, owner: str):
+        """
+        Release the reader-writer lock acquired for reading
+        :param name: Name of the lock
+        :param owner: Token the lock was acquired with
+        """
+        raise NotImplementedError()
+
+    def _release_write(self, name: str, owner: str):
+        """
+        Release the reader-writer lock acquired for writing, or stop waiting for it
+        :param name: Name of the lock
+        :param owner: Token the lock was acquired or waited for with
+        """
+        raise NotImplementedError()
+
+    def _try_acquire_semaphore(
+        self, name: str, owner: str, limit: int, ttl: Optional[float]
+    ) -> bool:
+        """
+        Make a single attempt at acquiring a slot of the semaphore
+        :param name: Name of the semaphore
+        :param owner: Token identifying this holder
+        :param limit: Maximum number of holders at once
+        :param ttl: Seconds until the slot expires, None for the backend's default
+        :return: If a slot was successfully acquired
+        """
+        raise NotImplementedError()
+
+    def _release_semaphore(self, name: str, owner: str):
+        """
+        Release the slot of the semaphore
+        :param name: Name of the semaphore
+        :param owner: Token the slot was acquired with
+        """
+        raise NotImplementedError()
+
+    def _try_acquire_fair(self, name: str, owner: str, ttl: Optional[float]) -> bool:
+        """
+        Make a single attempt at acquiring the lock, if first in the queue of fair waiters
+        :param name: Name of the lock
+        :param owner: Token identifying this holder of the lock
+        :param ttl: Seconds until the lock expires, None for the backend's default
+        :return: If lock was successfully acquired
+        """
+        return self._take_turn(name, owner) and self._try_acquire(name, owner, ttl)
+
+    def _take_turn(self, name: str, owner: str) -> bool:
+        """
+        Join the queue of fair waiters for the lock unless already in it, and keep the place for QUEUE_TICKET_TTL
+        :param name: Name of the lock
+        :param owner: Token identifying this waiter
+        :return: If this waiter is the first one in line
+        """
+        raise NotImplementedError()
+
+    def _ticket(self, name: str, owner: str) -> QueueTicket:
+        """
+        Get the place of a fair waiter in the queue, for the backends that keep the queue in a shared database
+        :param name: Name of the lock
+        :param owner: Token identifying this waiter
+        :return: The ticket, not yet written when new
+        """
+        return self._tickets.setdefault((name, owner), QueueTicket())
+
+    def _leave_queue(self, name: str, owner: str):
+        """
+        Leave the queue of fair waiters for the lock
+        :param name: Name of the lock
+        :param owner: Token identifying this waiter
+        """
+        raise NotImplementedError()
+
+    def _mark_wanted(self, name: str):
+        """
+        Let the holder of a sticky lock know another process is waiting for it, only needed if _supports_sticky
+        :param name: Name of the lock
+        """
+        raise NotImplementedError()
+
+    def _is_wanted(self, name: str, owner: str) -> bool:
+        """
+        Check if another process is waiting for a sticky lock, only needed if _supports_sticky
+        :param name: Name of the lock
+        :param owner: Token the lock was acquired with
+        :return: If the lock is wanted, or no longer held by the owner
+        """
+        raise NotImplementedError()
+
+    def _wait_for_release(
+        self, name: Optional[str], delay: float, remaining: Optional[float]
+    ):
+        """
+        Wait before the next attempt at acquiring the lock
+        :param name: Name of the lock, None if waiting for several
+        :param delay: Delay suggested by the wait strategy
+        :param remaining: Seconds left until the acquire times out, None if there is no timeout
+        """
+        time.sleep(delay)
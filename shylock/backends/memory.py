@@ -0,0 +1,414 @@
+from threading import Condition
+from time import monotonic
+from typing import Dict, List, Optional, Tuple
+
+from shylock.backends import QUEUE_TICKET_TTL, WRITE_INTENT_TTL, ShylockSyncBackend
+from shylock.backends.negativecache import NegativeCache
+from shylock.wait import FixedWait, WaitStrategy
+
+DOCUMENT_TTL = 60 * 5  # 5min seems like a reasonable TTL
+POLL_DELAY = 1 / 16  # Some balance between high polling and high delay
+
+
+class RWLockState:
+    """
+    Holders of a reader-writer lock kept in memory
+    """
+
+    def __init__(self):
+        self.writer: Optional[Tuple[str, float]] = None
+        # Writer waiting for the readers to leave, and until when it keeps new ones out
+        self.intent: Optional[Tuple[str, float]] = None
+        self.readers: Dict[str, float] = {}
+
+    def try_read(self, owner: str, expires_at: float, now: float) -> bool:
+        """
+        Try to add a reader
+        :param owner: Token identifying the reader
+        :param expires_at: When the reader's lock expires
+        :param now: Current monotonic time
+        :return: If the reader was added
+        """
+        self._expire(now)
+        if self.writer is not None or self.intent is not None:
+            return False
+        self.readers[owner] = expires_at
+        return True
+
+    def try_write(self, owner: str, expires_at: float, now: float, queue: bool) -> bool:
+        """
+        Try to set the writer
+        :param owner: Token identifying the writer
+        :param expires_at: When the writer's lock expires
+        :param now: Current monotonic time
+        :param queue: Keep new readers out for WRITE_INTENT_TTL if the lock is not available
+        :return: If the writer was set
+        """
+        self._expire(now)
+        if self.intent is not None and self.intent[0] != owner:
+            return False
+
+        if self.writer is None and not self.readers:
+            self.writer = (owner, expires_at)
+            self.intent = None
+            return True
+
+        if queue:
+            self.intent = (owner, now + WRITE_INTENT_TTL)
+        return False
+
+    def release_read(self, owner: str):
+        self.readers.pop(owner, None)
+
+    def release_write(self, owner: str):
+        if self.writer is not None and self.writer[0] == owner:
+            self.writer = None
+        if self.intent is not None and self.intent[0] == owner:
+            self.intent = None
+
+    def empty(self) -> bool:
+        return self.writer is None and self.intent is None and not self.readers
+
+    def _expire(self, now: float):
+        if self.writer is not None and self.writer[1] <= now:
+            self.writer = None
+        if self.intent is not None and self.intent[1] <= now:
+            self.intent = None
+        for owner, expires_at in list(self.readers.items()):
+            if expires_at <= now:
+                del self.readers[owner]
+
+
+def try_acquire_slot(
+    holders: Dict[str, float],
+    owner: str,
+    limit: int,
+    ttl: Optional[float],
+    now: float,
+) -> bool:
+    """
+    Try to add a holder to a semaphore kept in memory
+    :param holders: Tokens of the semaphore's holders, and when their slots expire
+    :param owner: Token identifying the holder
+    :param limit: Maximum number of holders at once
+    :param ttl: Seconds until the slot expires, None for DOCUMENT_TTL
+    :param now: Current monotonic time
+    :return: If the holder was added
+    """
+    for holder, expires_at in list(holders.items()):
+        if expires_at <= now:
+            del holders[holder]
+
+    if len(holders) >= limit:
+        return False
+
+    holders[owner] = now + (DOCUMENT_TTL if ttl is None else ttl)
+    return True
+
+
+def take_turn(queue: Dict[str, float], owner: str, now: float) -> bool:
+    """
+    Join a queue of fair waiters kept in memory unless already in it, and keep the place for QUEUE_TICKET_TTL
+    :param queue: Tokens of the waiters in the order of arrival, and when their places expire
+    :param owner: Token identifying the waiter
+    :param now: Current monotonic time
+    :return: If the waiter is the first one in line
+    """
+    for waiter, expires_at in list(queue.items()):
+        if expires_at <= now:
+            del queue[waiter]
+
+    # Updating the expiration keeps the place in line
+    queue[owner] = now + QUEUE_TICKET_TTL
+    return next(iter(queue)) == owner
+
+
+class ShylockMemoryBackend(ShylockSyncBackend):
+    """
+    Keeps the locks in the memory of this process, for single process deployments and tests
+    """
+
+    _supports_sticky = True
+
+    @staticmethod
+    def create(
+        wait: Optional[WaitStrategy] = None,
+        negative_cache: Optional[NegativeCache] = None,
+    ) -> "ShylockMemoryBackend":
+        """
+        Create and initialize the backend
+        :param wait: Strategy for waiting between attempts at acquiring several locks at once, defaults to polling every POLL_DELAY
+        :param negative_cache: Answer acquire(block=False) for the locks that were just found to be held without checking them again
+        """
+        return ShylockMemoryBackend(wait, negative_cache)
+
+    def _try_acquire(self, name: str, owner: str, ttl: Optional[float]) -> bool:
+        """
+        Make a single attempt at acquiring the lock
+        :param name: Name of the lock
+        :param owner: Token identifying this holder of the lock
+        :param ttl: Seconds until the lock expires, None for DOCUMENT_TTL
+        :return: If lock was successfully acquired
+        """
+        if self._try_acquire_many([name], owner, ttl):
+            return True
+        self._conflicted(name)
+        return False
+
+    def _holder_expires_in(self, name: str) -> Optional[float]:
+        """
+        Check when the lock held by someone else expires, for the negative cache
+        :param name: Name of the lock
+        :return: Seconds until it expires
+        """
+        with self._cond:
+            lock = self._locks.get(name)
+        return 0.0 if lock is None else max(0.0, lock[1] - monotonic())
+
+    def _try_acquire_many(
+        self, names: List[str], owner: str, ttl: Optional[float]
+    ) -> bool:
+        """
+        Make a single attempt at acquiring all the locks, without leaving any of them held on failure
+        :param names: Names of the locks, sorted
+        :param owner: Token identifying this holder of the locks
+        :param ttl: Seconds until the locks expire, None for DOCUMENT_TTL
+        :return: If the locks were successfully acquired
+        """
+        now = monotonic()
+        with self._cond:
+            if any(self._holder(name, now) for name in names):
+                return False
+
+            expires_at = now + (DOCUMENT_TTL if ttl is None else ttl)
+            for name in names:
+                self._locks[name] = (owner, expires_at)
+            return True
+
+    def _release(self, name: str, owner: Optional[str]):
+        """
+        Release the lock
+        :param name: Name of the lock
+        :param owner: Token the lock was acquired with, None to release regardless of the holder
+        """
+        self._release_many({name: owner})
+
+    def _release_many(self, owners: Dict[str, Optional[str]]):
+        """
+        Release all the locks
+        :param owners: Names of the locks and the tokens they were acquired with, None to release regardless of the holder
+        """
+        now = monotonic()
+        with self._cond:
+            for name, owner in owners.items():
+                holder = self._holder(name, now)
+                if holder is not None and owner in (None, holder):
+                    del self._locks[name]
+                    self._wanted.pop(name, None)
+            self._cond.notify_all()
+
+    def _renew(self, name: str, owner: str, ttl: Optional[float]) -> bool:
+        """
+        Extend the expiration of the lock if it's still held by the owner
+        :param name: Name of the lock
+        :param owner: Token the lock was acquired with
+        :param ttl: Seconds from now until the lock expires, None for DOCUMENT_TTL
+        :return: If the lock was renewed
+        """
+        now = monotonic()
+        with self._cond:
+            if self._holder(name, now) != owner:
+                return False
+            self._locks[name] = (owner, now + (DOCUMENT_TTL if ttl is None else ttl))
+            return True
+
+    def _try_acquire_read(self, name: str, owner: str, ttl: Optional[float]) -> bool:
+        """
+        Make a single attempt at acquiring the reader-writer lock for reading
+        :param name: Name of the lock
+        :param owner: Token identifying this reader
+        :param ttl: Seconds until the lock expires, None for DOCUMENT_TTL
+        :return: If lock was successfully acquired
+        """
+        now = monotonic()
+        expires_at = now + (DOCUMENT_TTL if ttl is None else ttl)
+        with self._cond:
+            state = self._rw_locks.setdefault(name, RWLockState())
+            return state.try_read(owner, expires_at, now)
+
+    def _try_acquire_write(
+        self, name: str, owner: str, ttl: Optional[float], queue: bool
+    ) -> bool:
+        """
+        Make a single attempt at acquiring the reader-writer lock for writing
+        :param name: Name of the lock
+        :param owner: Token identifying this writer
+        :param ttl: Seconds until the lock expires, None for DOCUMENT_TTL
+        :param queue: If the lock is not available, keep new readers out for WRITE_INTENT_TTL unless another writer is already waiting
+        :return: If lock was successfully acquired
+        """
+        now = monotonic()
+        expires_at = now + (DOCUMENT_TTL if ttl is None else ttl)
+        with self._cond:
+            state = self._rw_locks.setdefault(name, RWLockState())
+            return state.try_write(owner, expires_at, now, queue)
+
+    def _release_read(self, name: str, owner: str):
+        """
+        Release the reader-writer lock acquired for reading
+        :param name: Name of the lock
+        :param owner: Token the lock was acquired with
+        """
+        with self._cond:
+            state = self._rw_locks.get(name)
+            if state is not None:
+                state.release_read(owner)
+                if state.empty():
+                    del self._rw_locks[name]
+            self._cond.notify_all()
+
+    def _release_write(self, name: str, owner: str):
+        """
+        Release the reader-writer lock acquired for writing, or stop waiting for it
+        :param name: Name of the lock
+        :param owner: Token the lock was acquired or waited for with
+        """
+        with self._cond:
+            state = self._rw_locks.get(name)
+            if state is not None:
+                state.release_write(owner)
+                if state.empty():
+                    del self._rw_locks[name]
+            self._cond.notify_all()
+
+    def _try_acquire_semaphore(
+        self, name: str, owner: str, limit: int, ttl: Optional[float]
+    ) -> bool:
+        """
+        Make a single attempt at acquiring a slot of the semaphore
+        :param name: Name of the semaphore
+        :param owner: Token identifying this holder
+        :param limit: Maximum number of holders at once
+        :param ttl: Seconds until the slot expires, None for DOCUMENT_TTL
+        :return: If a slot was successfully acquired
+        """
+        now = monotonic()
+        with self._cond:
+            holders = self._semaphores.setdefault(name, {})
+            return try_acquire_slot(holders, owner, limit, ttl, now)
+
+    def _release_semaphore(self, name: str, owner: str):
+        """
+        Release the slot of the semaphore
+        :param name: Name of the semaphore
+        :param owner: Token the slot was acquired with
+        """
+        with self._cond:
+            holders = self._semaphores.get(name, {})
+            holders.pop(owner, None)
+            if not holders:
+                self._semaphores.pop(name, None)
+            self._cond.notify_all()
+
+    def _take_turn(self, name: str, owner: str) -> bool:
+        """
+        Join the queue of fair waiters for the lock unless already in it, and keep the place for QUEUE_TICKET_TTL
+        :param name: Name of the lock
+        :param owner: Token identifying this waiter
+        :return: If this waiter is the first one in line
+        """
+        with self._cond:
+            return take_turn(self._queues.setdefault(name, {}), owner, monotonic())
+
+    def _leave_queue(self, name: str, owner: str):
+        """
+        Leave the queue of fair waiters for the lock
+        :param name: Name of the lock
+        :param owner: Token identifying this waiter
+        """
+        with self._cond:
+            queue = self._queues.get(name, {})
+            queue.pop(owner, None)
+            if not queue:
+                self._queues.pop(name, None)
+            self._cond.notify_all()
+
+    def _mark_wanted(self, name: str):
+        """
+        Let the holder of a sticky lock know someone else is waiting for it
+        :param name: Name of the lock
+        """
+        with self._cond:
+            holder = self._holder(name, monotonic())
+            if holder is not None:
+                self._wanted[name] = holder
+
+    def _is_wanted(self, name: str, owner: str) -> bool:
+        """
+        Check if someone else is waiting for a sticky lock
+        :param name: Name of the lock
+        :param owner: Token the lock was acquired with
+        :return: If the lock is wanted, or no longer held by the owner
+        """
+        with self._cond:
+            holder = self._holder(name, monotonic())
+            return holder != owner or self._wanted.get(name) == owner
+
+    def _wait_for_release(
+        self, name: Optional[str], delay: float, remaining: Optional[float]
+    ):
+        """
+        Wait until the lock is released or expires
+        :param name: Name of the lock, None if waiting for several
+        :param delay: Delay suggested by the wait strategy, used when waiting for several
+        :param remaining: Seconds left until the acquire times out, None if there is no timeout
+        """
+        with self._cond:
+            if name is None:
+                # A release might have happened since the attempt, or a lock might expire, so don't wait for too long
+                self._cond.wait(delay)
+                return
+
+            now = monotonic()
+            if self._holder(name, now) is None:
+                return
+
+            timeout = self._locks[name][1] - now
+            if remaining is not None:
+                timeout = min(timeout, remaining)
+            self._cond.wait(timeout)
+
+    def __init__(
+        self,
+        wait: Optional[WaitStrategy] = None,
+        negative_cache: Optional[NegativeCache] = None,
+    ):
+        super().__init__()
+        self._negative_cache: Optional[NegativeCache] = negative_cache
+        # Lock names to their owner tokens and expiration times
+        self._locks: Dict[str, Tuple[str, float]] = {}
+        self._rw_locks: Dict[str, RWLockState] = {}
+        # Semaphore names to the expiration times of their holders' slots
+        self._semaphores: Dict[str, Dict[str, float]] = {}
+        # Lock names to their fair waiters in the order of arrival, and when their places expire
+        self._queues: Dict[str, Dict[str, float]] = {}
+        # Sticky lock names to the owner tokens of the holders that were asked to release them
+        self._wanted: Dict[str, str] = {}
+        self._cond = Condition()
+        self._wait: WaitStrategy = FixedWait(POLL_DELAY) if wait is None else wait
+
+    def _holder(self, name: str, now: float) -> Optional[str]:
+        """
+        Get the owner token of the lock, forgetting it if it has expired
+        :param name: Name of the lock
+        :param now: Current monotonic time
+        :return: Owner token, None if the lock is free
+        """
+        lock = self._locks.get(name)
+        if lock is None:
+            return None
+        if lock[1] <= now:
+            del self._locks[name]
+            self._wanted.pop(name, None)
+            return None
+        return lock[0]
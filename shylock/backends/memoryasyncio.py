@@ -0,0 +1,312 @@
+import asyncio
+from time import monotonic
+from typing import Dict, List, Optional, Tuple
+
+from shylock.backends import ShylockAsyncBackend
+from shylock.backends.memory import (
+    DOCUMENT_TTL,
+    POLL_DELAY,
+    RWLockState,
+    take_turn,
+    try_acquire_slot,
+)
+from shylock.backends.negativecache import NegativeCache
+from shylock.wait import FixedWait, WaitStrategy
+
+
+class ShylockAsyncMemoryBackend(ShylockAsyncBackend):
+    """
+    Keeps the locks in the memory of this process, for single process deployments and tests
+    """
+
+    _supports_sticky = True
+
+    @staticmethod
+    async def create(
+        wait: Optional[WaitStrategy] = None,
+        negative_cache: Optional[NegativeCache] = None,
+    ) -> "ShylockAsyncMemoryBackend":
+        """
+        Create and initialize the backend
+        :param wait: Strategy for waiting between attempts at acquiring several locks at once, defaults to polling every POLL_DELAY
+        :param negative_cache: Answer acquire(block=False) for the locks that were just found to be held without checking them again
+        """
+        return ShylockAsyncMemoryBackend(wait, negative_cache)
+
+    async def _try_acquire(self, name: str, owner: str, ttl: Optional[float]) -> bool:
+        """
+        Make a single attempt at acquiring the lock
+        :param name: Name of the lock
+        :param owner: Token identifying this holder of the lock
+        :param ttl: Seconds until the lock expires, None for DOCUMENT_TTL
+        :return: If lock was successfully acquired
+        """
+        if await self._try_acquire_many([name], owner, ttl):
+            return True
+        self._conflicted(name)
+        return False
+
+    async def _holder_expires_in(self, name: str) -> Optional[float]:
+        """
+        Check when the lock held by someone else expires, for the negative cache
+        :param name: Name of the lock
+        :return: Seconds until it expires
+        """
+        lock = self._locks.get(name)
+        return 0.0 if lock is None else max(0.0, lock[1] - monotonic())
+
+    async def _try_acquire_many(
+        self, names: List[str], owner: str, ttl: Optional[float]
+    ) -> bool:
+        """
+        Make a single attempt at acquiring all the locks, without leaving any of them held on failure
+        :param names: Names of the locks, sorted
+        :param owner: Token identifying this holder of the locks
+        :param ttl: Seconds until the locks expire, None for DOCUMENT_TTL
+        :return: If the locks were successfully acquired
+        """
+        now = monotonic()
+        if any(self._holder(name, now) for name in names):
+            return False
+
+        expires_at = now + (DOCUMENT_TTL if ttl is None else ttl)
+        for name in names:
+            self._locks[name] = (owner, expires_at)
+        return True
+
+    async def _release(self, name: str, owner: Optional[str]):
+        """
+        Release the lock
+        :param name: Name of the lock
+        :param owner: Token the lock was acquired with, None to release regardless of the holder
+        """
+        await self._release_many({name: owner})
+
+    async def _release_many(self, owners: Dict[str, Optional[str]]):
+        """
+        Release all the locks
+        :param owners: Names of the locks and the tokens they were acquired with, None to release regardless of the holder
+        """
+        now = monotonic()
+        for name, owner in owners.items():
+            holder = self._holder(name, now)
+            if holder is not None and owner in (None, holder):
+                del self._locks[name]
+                self._wanted.pop(name, None)
+
+        for name in owners:
+            self._wake(name)
+        self._wake(None)
+
+    async def _renew(self, name: str, owner: str, ttl: Optional[float]) -> bool:
+        """
+        Extend the expiration of the lock if it's still held by the owner
+        :param name: Name of the lock
+        :param owner: Token the lock was acquired with
+        :param ttl: Seconds from now until the lock expires, None for DOCUMENT_TTL
+        :return: If the lock was renewed
+        """
+        now = monotonic()
+        if self._holder(name, now) != owner:
+            return False
+        self._locks[name] = (owner, now + (DOCUMENT_TTL if ttl is None else ttl))
+        return True
+
+    async def _try_acquire_read(
+        self, name: str, owner: str, ttl: Optional[float]
+    ) -> bool:
+        """
+        Make a single attempt at acquiring the reader-writer lock for reading
+        :param name: Name of the lock
+        :param owner: Token identifying this reader
+        :param ttl: Seconds until the lock expires, None for DOCUMENT_TTL
+        :return: If lock was successfully acquired
+        """
+        now = monotonic()
+        state = self._rw_locks.setdefault(name, RWLockState())
+        return state.try_read(owner, now + (DOCUMENT_TTL if ttl is None else ttl), now)
+
+    async def _try_acquire_write(
+        self, name: str, owner: str, ttl: Optional[float], queue: bool
+    ) -> bool:
+        """
+        Make a single attempt at acquiring the reader-writer lock for writing
+        :param name: Name of the lock
+        :param owner: Token identifying this writer
+        :param ttl: Seconds until the lock expires, None for DOCUMENT_TTL
+        :param queue: If the lock is not available, keep new readers out for WRITE_INTENT_TTL unless another writer is already waiting
+        :return: If lock was successfully acquired
+        """
+        now = monotonic()
+        state = self._rw_locks.setdefault(name, RWLockState())
+        return state.try_write(
+            owner, now + (DOCUMENT_TTL if ttl is None else ttl), now, queue
+        )
+
+    async def _release_read(self, name: str, owner: str):
+        """
+        Release the reader-writer lock acquired for reading
+        :param name: Name of the lock
+        :param owner: Token the lock was acquired with
+        """
+        state = self._rw_locks.get(name)
+        if state is not None:
+            state.release_read(owner)
+            if state.empty():
+                del self._rw_locks[name]
+        self._wake(None)
+
+    async def _release_write(self, name: str, owner: str):
+        """
+        Release the reader-writer lock acquired for writing, or stop waiting for it
+        :param name: Name of the lock
+        :param owner: Token the lock was acquired or waited for with
+        """
+        state = self._rw_locks.get(name)
+        if state is not None:
+            state.release_write(owner)
+            if state.empty():
+                del self._rw_locks[name]
+        self._wake(None)
+
+    async def _try_acquire_semaphore(
+        self, name: str, owner: str, limit: int, ttl: Optional[float]
+    ) -> bool:
+        """
+        Make a single attempt at acquiring a slot of the semaphore
+        :param name: Name of the semaphore
+        :param owner: Token identifying this holder
+        :param limit: Maximum number of holders at once
+        :param ttl: Seconds until the slot expires, None for DOCUMENT_TTL
+        :return: If a slot was successfully acquired
+        """
+        holders = self._semaphores.setdefault(name, {})
+        return try_acquire_slot(holders, owner, limit, ttl, monotonic())
+
+    async def _release_semaphore(self, name: str, owner: str):
+        """
+        Release the slot of the semaphore
+        :param name: Name of the semaphore
+        :param owner: Token the slot was acquired with
+        """
+        holders = self._semaphores.get(name, {})
+        holders.pop(owner, None)
+        if not holders:
+            self._semaphores.pop(name, None)
+        self._wake(None)
+
+    async def _take_turn(self, name: str, owner: str) -> bool:
+        """
+        Join the queue of fair waiters for the lock unless already in it, and keep the place for QUEUE_TICKET_TTL
+        :param name: Name of the lock
+        :param owner: Token identifying this waiter
+        :return: If this waiter is the first one in line
+        """
+        return take_turn(self._queues.setdefault(name, {}), owner, monotonic())
+
+    async def _leave_queue(self, name: str, owner: str):
+        """
+        Leave the queue of fair waiters for the lock
+        :param name: Name of the lock
+        :param owner: Token identifying this waiter
+        """
+        queue = self._queues.get(name, {})
+        queue.pop(owner, None)
+        if not queue:
+            self._queues.pop(name, None)
+        self._wake(None)
+
+    async def _mark_wanted(self, name: str):
+        """
+        Let the holder of a sticky lock know someone else is waiting for it
+        :param name: Name of the lock
+        """
+        holder = self._holder(name, monotonic())
+        if holder is not None:
+            self._wanted[name] = holder
+
+    async def _is_wanted(self, name: str, owner: str) -> bool:
+        """
+        Check if someone else is waiting for a sticky lock
+        :param name: Name of the lock
+        :param owner: Token the lock was acquired with
+        :return: If the lock is wanted, or no longer held by the owner
+        """
+        holder = self._holder(name, monotonic())
+        return holder != owner or self._wanted.get(name) == owner
+
+    async def _wait_for_release(
+        self, name: Optional[str], delay: float, remaining: Optional[float]
+    ):
+        """
+        Wait until the lock is released or expires
+        :param name: Name of the lock, None if waiting for several
+        :param delay: Delay suggested by the wait strategy, used when waiting for several
+        :param remaining: Seconds left until the acquire times out, None if there is no timeout
+        """
+        if name is None:
+            # Any release wakes these up, but some of the locks might also expire before that
+            timeout = delay
+        else:
+            # Nothing can change between the failed attempt and here, as there was no await in between
+            now = monotonic()
+            if self._holder(name, now) is None:
+                return
+
+            timeout = self._locks[name][1] - now
+            if remaining is not None:
+                timeout = min(timeout, remaining)
+
+        event = self._released.get(name)
+        if event is None:
+            event = self._released[name] = asyncio.Event()
+
+        try:
+            await asyncio.wait_for(event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def __init__(
+        self,
+        wait: Optional[WaitStrategy] = None,
+        negative_cache: Optional[NegativeCache] = None,
+    ):
+        super().__init__()
+        self._negative_cache: Optional[NegativeCache] = negative_cache
+        # Lock names to their owner tokens and expiration times
+        self._locks: Dict[str, Tuple[str, float]] = {}
+        self._rw_locks: Dict[str, RWLockState] = {}
+        # Semaphore names to the expiration times of their holders' slots
+        self._semaphores: Dict[str, Dict[str, float]] = {}
+        # Lock names to their fair waiters in the order of arrival, and when their places expire
+        self._queues: Dict[str, Dict[str, float]] = {}
+        # Sticky lock names to the owner tokens of the holders that were asked to release them
+        self._wanted: Dict[str, str] = {}
+        # Set on the next release, None is the key for the waiters of several locks, reader-writer locks, semaphores and fair locks
+        self._released: Dict[Optional[str], asyncio.Event] = {}
+        self._wait: WaitStrategy = FixedWait(POLL_DELAY) if wait is None else wait
+
+    def _holder(self, name: str, now: float) -> Optional[str]:
+        """
+        Get the owner token of the lock, forgetting it if it has expired
+        :param name: Name of the lock
+        :param now: Current monotonic time
+        :return: Owner token, None if the lock is free
+        """
+        lock = self._locks.get(name)
+        if lock is None:
+            return None
+        if lock[1] <= now:
+            del self._locks[name]
+            self._wanted.pop(name, None)
+            return None
+        return lock[0]
+
+    def _wake(self, key: Optional[str]):
+        """
+        Wake up the waiters of a lock
+        :param key: Name of the lock, None for the waiters of several locks
+        """
+        event = self._released.pop(key, None)
+        if event is not None:
+            event.set()
@@ -1,6 +1,6 @@
-from asyncio import sleep
-from datetime import datetime
-from typing import Optional
+from asyncio import gather, sleep
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
 
 try:
     from motor.motor_asyncio import (
@@ -8,73 +8,506 @@ try:
         AsyncIOMotorCollection,
         AsyncIOMotorDatabase,
     )
-    from pymongo.errors import DuplicateKeyError, WriteError
+    from pymongo.errors import (
+        BulkWriteError,
+        DuplicateKeyError,
+        OperationFailure,
+        PyMongoError,
+        WriteError,
+    )
 except ImportError:
     AsyncIOMotorClient = None
     AsyncIOMotorCollection = None
     AsyncIOMotorDatabase = None
+    BulkWriteError = None
     DuplicateKeyError = None
+    OperationFailure = None
+    PyMongoError = None
     WriteError = None
 
-from shylock.backends import ShylockAsyncBackend
+from shylock import metrics
+from shylock.backends import QUEUE_TICKET_TTL, WRITE_INTENT_TTL, ShylockAsyncBackend
+from shylock.backends.negativecache import NegativeCache
+from shylock.backends.ratelimit import AdaptiveRateLimiter
 from shylock.exceptions import ShylockException
+from shylock.wait import FixedWait, WaitStrategy
 
 DOCUMENT_TTL = 60 * 5  # 5min seems like a reasonable TTL
 POLL_DELAY = 1 / 16  # Some balance between high polling and high delay
+DUPLICATE_KEY_ERROR = 11000
+CHANGE_STREAM_MAX_WAIT = 5  # Retry the insert at least this often when watching
 
 
 class ShylockMotorAsyncIOBackend(ShylockAsyncBackend):
+    _supports_sticky = True
+    _errors = (OSError, PyMongoError)
+
     @staticmethod
     async def create(
-        client: AsyncIOMotorClient, db: str, collection_name: str = "shylock"
+        client: AsyncIOMotorClient,
+        db: str,
+        collection_name: str = "shylock",
+        use_change_streams: bool = False,
+        wait: Optional[WaitStrategy] = None,
+        ensure_schema: bool = True,
+        rate_limiter: Optional[AdaptiveRateLimiter] = None,
+        negative_cache: Optional[NegativeCache] = None,
     ) -> "ShylockMotorAsyncIOBackend":
         """
         Create and initialize the backend
         :param client: Connected Motor client instance
         :param db: The name of the DB to use for locks
         :param collection_name: The name of the collection reserved for shylock
+        :param use_change_streams: Wait for releases via change streams instead of polling, falls back to polling if the server does not support them
+        :param wait: Strategy for waiting between attempts, defaults to polling every POLL_DELAY
+        :param ensure_schema: Check for the indexes and create the missing ones, pass False if they're known to exist
+        :param rate_limiter: Limits the requests to the rate the server can sustain, for throttled servers like Azure CosmosDB
+        :param negative_cache: Answer acquire(block=False) for the locks that were just found to be held without asking the database again
         """
-        inst = ShylockMotorAsyncIOBackend(client, db, collection_name)
-        await inst._init_collection()
+        inst = ShylockMotorAsyncIOBackend(
+            client,
+            db,
+            collection_name,
+            use_change_streams,
+            wait,
+            rate_limiter,
+            negative_cache,
+        )
+        await inst._init_collection(ensure_schema)
         return inst
 
-    async def acquire(self, name: str, block: bool = True) -> bool:
+    async def _try_acquire(self, name: str, owner: str, ttl: Optional[float]) -> bool:
         """
-        Try to acquire a lock, potentially wait until it's available
+        Make a single attempt at acquiring the lock
         :param name: Name of the lock
-        :param block: Wait for lock
-        :return: If lock was successfully acquired - always True if block is True
+        :param owner: Token identifying this holder of the lock
+        :param ttl: Seconds until the lock expires, None for DOCUMENT_TTL
+        :return: If lock was successfully acquired
         """
-        doc = {"name": name, "createdAt": datetime.utcnow()}
+        now = datetime.utcnow()
+        doc = {
+            "name": name,
+            "owner": owner,
+            "createdAt": now,
+            "expiresAt": now + timedelta(seconds=DOCUMENT_TTL if ttl is None else ttl),
+        }
+        # Takes over an expired lock right away instead of waiting for the TTL monitor, or inserts a new one
+        query = {"name": name, "expiresAt": {"$lte": now}}
+        update = {"$set": doc, "$unset": {"wanted": ""}}
 
         while True:
+            await self._limit()
             try:
-                await self._coll.insert_one(doc)
+                await self._coll.update_one(query, update, upsert=True)
                 return True
             except DuplicateKeyError:
-                if not block:
-                    return False
-                await sleep(POLL_DELAY)
+                self._conflicted(name)
+                return False
             except WriteError as e:
                 # Maybe this should check for blocking? Kinda not related though.
-                delay = self._check_retry_exception(e)
+                delay = self._retry_delay(e)
                 if delay is not None:
                     await sleep(delay)
                     continue
 
                 raise
 
-    async def release(self, name: str):
+    async def _holder_expires_in(self, name: str) -> Optional[float]:
         """
-        Release a given lock
+        Check when the lock held by someone else expires, for the negative cache
         :param name: Name of the lock
+        :return: Seconds until it expires, None if not known
+        """
+        await self._limit()
+        holder = await self._coll.find_one({"name": name}, {"expiresAt": 1})
+        if holder is None:
+            # Released in the meantime
+            return 0.0
+        # Written by an older version without it
+        expires_at = holder.get("expiresAt")
+        if expires_at is None:
+            return None
+        return (expires_at.replace(tzinfo=None) - datetime.utcnow()).total_seconds()
+
+    async def _try_acquire_many(
+        self, names: List[str], owner: str, ttl: Optional[float]
+    ) -> bool:
+        """
+        Make a single attempt at acquiring all the locks, without leaving any of them held on failure
+        :param names: Names of the locks, sorted
+        :param owner: Token identifying this holder of the locks
+        :param ttl: Seconds until the locks expire, None for DOCUMENT_TTL
+        :return: If the locks were successfully acquired
+        """
+        now = datetime.utcnow()
+        expires = now + timedelta(seconds=DOCUMENT_TTL if ttl is None else ttl)
+        docs = [
+            {"name": name, "owner": owner, "createdAt": now, "expiresAt": expires}
+            for name in names
+        ]
+
+        retry_expired = True
+        while True:
+            await self._limit()
+            try:
+                await self._coll.insert_many(docs, ordered=True)
+                return True
+            except BulkWriteError as e:
+                # Roll back the ones inserted before the failing one
+                await self._release_many({name: owner for name in names})
+
+                error = e.details["writeErrors"][0]
+                if error["code"] == DUPLICATE_KEY_ERROR:
+                    # Retry if the TTL monitor just hasn't removed the expired locks yet
+                    if retry_expired and await self._remove_expired(names, now):
+                        retry_expired = False
+                        for doc in docs:
+                            doc.pop("_id", None)
+                        continue
+                    return False
+
+                delay = self._retry_delay(
+                    WriteError(error["errmsg"], error["code"], error)
+                )
+                if delay is not None:
+                    await sleep(delay)
+                    for doc in docs:
+                        doc.pop("_id", None)
+                    continue
+
+                raise
+
+    async def _remove_expired(self, names: List[str], now: datetime) -> bool:
+        """
+        Remove the expired locks
+        :param names: Names of the locks
+        :param now: Current time
+        :return: If any locks were removed
+        """
+        await self._limit(priority=True)
+        res = await self._coll.delete_many(
+            {"name": {"$in": names}, "expiresAt": {"$lte": now}}
+        )
+        return res.deleted_count > 0
+
+    async def _release(self, name: str, owner: Optional[str]):
+        """
+        Release the lock
+        :param name: Name of the lock
+        :param owner: Token the lock was acquired with, None to release regardless of the holder
+        """
+        query = {"name": name}
+        if owner is not None:
+            query["owner"] = owner
+
+        while True:
+            await self._limit(priority=True)
+            try:
+                await self._coll.delete_one(query)
+                return
+            except WriteError as e:
+                delay = self._retry_delay(e, 0.25)
+                if delay is not None:
+                    await sleep(delay)
+                    continue
+
+                raise
+
+    async def _release_many(self, owners: Dict[str, Optional[str]]):
         """
+        Release all the locks
+        :param owners: Names of the locks and the tokens they were acquired with, None to release regardless of the holder
+        """
+        queries = []
+        for name, owner in owners.items():
+            query = {"name": name}
+            if owner is not None:
+                query["owner"] = owner
+            queries.append(query)
+
         while True:
+            await self._limit(priority=True)
             try:
-                await self._coll.delete_one({"name": name})
+                await self._coll.delete_many({"$or": queries})
                 return
             except WriteError as e:
-                delay = self._check_retry_exception(e, 0.25)
+                delay = self._retry_delay(e, 0.25)
+                if delay is not None:
+                    await sleep(delay)
+                    continue
+
+                raise
+
+    async def _renew(self, name: str, owner: str, ttl: Optional[float]) -> bool:
+        """
+        Extend the expiration of the lock if it's still held by the owner
+        :param name: Name of the lock
+        :param owner: Token the lock was acquired with
+        :param ttl: Seconds from now until the lock expires, None for DOCUMENT_TTL
+        :return: If the lock was renewed
+        """
+        now = datetime.utcnow()
+        # createdAt is refreshed too so the DOCUMENT_TTL index does not expire the lock
+        update = {
+            "$set": {
+                "createdAt": now,
+                "expiresAt": now
+                + timedelta(seconds=DOCUMENT_TTL if ttl is None else ttl),
+            }
+        }
+
+        while True:
+            await self._limit()
+            try:
+                res = await self._coll.update_one(
+                    {"name": name, "owner": owner}, update
+                )
+                return res.matched_count == 1
+            except WriteError as e:
+                delay = self._retry_delay(e, 0.25)
+                if delay is not None:
+                    await sleep(delay)
+                    continue
+
+                raise
+
+    async def _try_acquire_read(
+        self, name: str, owner: str, ttl: Optional[float]
+    ) -> bool:
+        """
+        Make a single attempt at acquiring the reader-writer lock for reading
+        :param name: Name of the lock
+        :param owner: Token identifying this reader
+        :param ttl: Seconds until the lock expires, None for DOCUMENT_TTL
+        :return: If lock was successfully acquired
+        """
+        now = datetime.utcnow()
+        expires = now + timedelta(seconds=DOCUMENT_TTL if ttl is None else ttl)
+        query = {
+            "name": name,
+            "writerExpiresAt": {"$not": {"$gt": now}},
+            "intentExpiresAt": {"$not": {"$gt": now}},
+        }
+        update = {
+            "$push": {"readers": {"owner": owner, "expiresAt": expires}},
+            "$max": {"expiresAt": expires},
+        }
+        return await self._update(self._rw_coll, query, update, upsert=True)
+
+    async def _try_acquire_write(
+        self, name: str, owner: str, ttl: Optional[float], queue: bool
+    ) -> bool:
+        """
+        Make a single attempt at acquiring the reader-writer lock for writing
+        :param name: Name of the lock
+        :param owner: Token identifying this writer
+        :param ttl: Seconds until the lock expires, None for DOCUMENT_TTL
+        :param queue: If the lock is not available, keep new readers out for WRITE_INTENT_TTL unless another writer is already waiting
+        :return: If lock was successfully acquired
+        """
+        now = datetime.utcnow()
+        expires = now + timedelta(seconds=DOCUMENT_TTL if ttl is None else ttl)
+        no_other_intent = {
+            "$or": [
+                {"intentExpiresAt": {"$not": {"$gt": now}}},
+                {"intent": owner},
+            ]
+        }
+        query = {
+            "name": name,
+            "writerExpiresAt": {"$not": {"$gt": now}},
+            "readers": {"$not": {"$elemMatch": {"expiresAt": {"$gt": now}}}},
+            **no_other_intent,
+        }
+        update = {
+            "$set": {
+                "writer": owner,
+                "writerExpiresAt": expires,
+                "readers": [],
+                "intent": None,
+                "intentExpiresAt": None,
+            },
+            "$max": {"expiresAt": expires},
+        }
+        if await self._update(self._rw_coll, query, update, upsert=True):
+            return True
+
+        if queue:
+            intent_expires = now + timedelta(seconds=WRITE_INTENT_TTL)
+            update = {
+                "$set": {"intent": owner, "intentExpiresAt": intent_expires},
+                "$max": {"expiresAt": intent_expires},
+            }
+            await self._update(self._rw_coll, {"name": name, **no_other_intent}, update)
+        return False
+
+    async def _release_read(self, name: str, owner: str):
+        """
+        Release the reader-writer lock acquired for reading
+        :param name: Name of the lock
+        :param owner: Token the lock was acquired with
+        """
+        await self._update(
+            self._rw_coll,
+            {"name": name},
+            {"$pull": {"readers": {"owner": owner}}},
+            priority=True,
+        )
+
+    async def _release_write(self, name: str, owner: str):
+        """
+        Release the reader-writer lock acquired for writing, or stop waiting for it
+        :param name: Name of the lock
+        :param owner: Token the lock was acquired or waited for with
+        """
+        update = {"$set": {"writer": None, "writerExpiresAt": None}}
+        if not await self._update(
+            self._rw_coll, {"name": name, "writer": owner}, update, priority=True
+        ):
+            update = {"$set": {"intent": None, "intentExpiresAt": None}}
+            await self._update(
+                self._rw_coll, {"name": name, "intent": owner}, update, priority=True
+            )
+
+    async def _try_acquire_semaphore(
+        self, name: str, owner: str, limit: int, ttl: Optional[float]
+    ) -> bool:
+        """
+        Make a single attempt at acquiring a slot of the semaphore
+        :param name: Name of the semaphore
+        :param owner: Token identifying this holder
+        :param limit: Maximum number of holders at once
+        :param ttl: Seconds until the slot expires, None for DOCUMENT_TTL
+        :return: If a slot was successfully acquired
+        """
+        now = datetime.utcnow()
+        expires = now + timedelta(seconds=DOCUMENT_TTL if ttl is None else ttl)
+        # Fewer than limit holders, counting the expired ones until they're removed
+        query = {"name": name, f"holders.{limit - 1}": {"$exists": False}}
+        update = {
+            "$push": {"holders": {"owner": owner, "expiresAt": expires}},
+            "$max": {"expiresAt": expires},
+        }
+        if await self._update(self._sem_coll, query, update, upsert=True):
+            return True
+
+        # Make room if some of the holders have crashed
+        expired = {"$pull": {"holders": {"expiresAt": {"$lte": now}}}}
+        if await self._update(
+            self._sem_coll, {"name": name, "holders.expiresAt": {"$lte": now}}, expired
+        ):
+            return await self._update(self._sem_coll, query, update, upsert=True)
+        return False
+
+    async def _release_semaphore(self, name: str, owner: str):
+        """
+        Release the slot of the semaphore
+        :param name: Name of the semaphore
+        :param owner: Token the slot was acquired with
+        """
+        update = {"$pull": {"holders": {"owner": owner}}}
+        await self._update(self._sem_coll, {"name": name}, update, priority=True)
+
+    async def _take_turn(self, name: str, owner: str) -> bool:
+        """
+        Join the queue of fair waiters for the lock unless already in it, and keep the place for QUEUE_TICKET_TTL
+        :param name: Name of the lock
+        :param owner: Token identifying this waiter
+        :return: If this waiter is the first one in line
+        """
+        ticket = self._ticket(name, owner)
+        if not ticket.check_due():
+            # Wasn't first in line when last checked, only the first waiter needs to keep checking
+            return False
+
+        now = datetime.utcnow()
+        if ticket.write_due():
+            expires = now + timedelta(seconds=QUEUE_TICKET_TTL)
+            refresh = {
+                "$set": {"waiters.$.expiresAt": expires},
+                "$max": {"expiresAt": expires},
+            }
+            if not await self._update(
+                self._queue_coll, {"name": name, "waiters.owner": owner}, refresh
+            ):
+                join = {
+                    "$push": {"waiters": {"owner": owner, "expiresAt": expires}},
+                    "$max": {"expiresAt": expires},
+                }
+                query = {"name": name, "waiters.owner": {"$ne": owner}}
+                # Another waiter might create the document at the same time
+                if not await self._update(self._queue_coll, query, join, upsert=True):
+                    await self._update(self._queue_coll, query, join)
+
+        await self._limit()
+        doc = await self._queue_coll.find_one({"name": name}, {"waiters": 1})
+        waiters = [] if doc is None else doc["waiters"]
+        live = [w for w in waiters if w["expiresAt"].replace(tzinfo=None) > now]
+        if not any(w["owner"] == owner for w in live):
+            # Dropped from the queue after missing a refresh
+            ticket.dropped()
+        first = bool(live) and live[0]["owner"] == owner
+        if first and len(live) < len(waiters):
+            # Drop the waiters that have given up without leaving the queue
+            expired = {"$pull": {"waiters": {"expiresAt": {"$lte": now}}}}
+            await self._update(self._queue_coll, {"name": name}, expired)
+        ticket.checked(first)
+        return first
+
+    async def _leave_queue(self, name: str, owner: str):
+        """
+        Leave the queue of fair waiters for the lock
+        :param name: Name of the lock
+        :param owner: Token identifying this waiter
+        """
+        update = {"$pull": {"waiters": {"owner": owner}}}
+        await self._update(self._queue_coll, {"name": name}, update, priority=True)
+
+    async def _mark_wanted(self, name: str):
+        """
+        Let the holder of a sticky lock know someone else is waiting for it
+        :param name: Name of the lock
+        """
+        # Goes away with the holder's document
+        await self._update(self._coll, {"name": name}, {"$set": {"wanted": True}})
+
+    async def _is_wanted(self, name: str, owner: str) -> bool:
+        """
+        Check if someone else is waiting for a sticky lock
+        :param name: Name of the lock
+        :param owner: Token the lock was acquired with
+        :return: If the lock is wanted, or no longer held by the owner
+        """
+        await self._limit()
+        doc = await self._coll.find_one({"name": name, "owner": owner}, {"wanted": 1})
+        return doc is None or doc.get("wanted", False)
+
+    async def _update(
+        self,
+        collection: AsyncIOMotorCollection,
+        query: dict,
+        update: dict,
+        upsert: bool = False,
+        priority: bool = False,
+    ) -> bool:
+        """
+        Update a document, mostly of a reader-writer lock, a semaphore or a queue of fair waiters
+        :param collection: Collection of the document
+        :param query: Filter for the document, including the name
+        :param update: The update to apply
+        :param upsert: Insert the document if it does not exist - if it exists but does not match the query, the unique index fails the insert
+        :param priority: Send ahead of the acquire attempts when rate limited, for releases
+        :return: If a document was updated or inserted
+        """
+        while True:
+            await self._limit(priority)
+            try:
+                res = await collection.update_one(query, update, upsert=upsert)
+                return res.matched_count == 1 or res.upserted_id is not None
+            except DuplicateKeyError:
+                return False
+            except WriteError as e:
+                delay = self._retry_delay(e, 0.25)
                 if delay is not None:
                     await sleep(delay)
                     continue
@@ -89,42 +522,145 @@ class ShylockMotorAsyncIOBackend(ShylockAsyncBackend):
             )
 
     def __init__(
-        self, client: AsyncIOMotorClient, db: str, collection_name: str = "shylock"
+        self,
+        client: AsyncIOMotorClient,
+        db: str,
+        collection_name: str = "shylock",
+        use_change_streams: bool = False,
+        wait: Optional[WaitStrategy] = None,
+        rate_limiter: Optional[AdaptiveRateLimiter] = None,
+        negative_cache: Optional[NegativeCache] = None,
     ):
+        super().__init__()
         self._check()
         self._client: AsyncIOMotorClient = client
         self._db: Optional[AsyncIOMotorDatabase] = None
         self._db_name: str = db
         self._coll: Optional[AsyncIOMotorCollection] = None
+        self._rw_coll: Optional[AsyncIOMotorCollection] = None
+        self._sem_coll: Optional[AsyncIOMotorCollection] = None
+        self._queue_coll: Optional[AsyncIOMotorCollection] = None
         self._collection_name: str = collection_name
+        self._use_change_streams: bool = use_change_streams
+        self._wait: WaitStrategy = FixedWait(POLL_DELAY) if wait is None else wait
+        self._negative_cache: Optional[NegativeCache] = negative_cache
+        self._limiter: Optional[AdaptiveRateLimiter] = rate_limiter
 
-    async def _init_collection(self):
+    async def _init_collection(self, ensure_schema: bool = True):
         """
         Ensure the collection is ready for our use
+        :param ensure_schema: Check for the indexes and create the missing ones
         """
         self._db = self._client[self._db_name]
         self._coll = self._db[self._collection_name]
+        # Reader-writer locks, semaphores and queues don't fit the unique index on name of the locks
+        self._rw_coll = self._db[f"{self._collection_name}_rw"]
+        self._sem_coll = self._db[f"{self._collection_name}_semaphores"]
+        self._queue_coll = self._db[f"{self._collection_name}_queues"]
+        if not ensure_schema:
+            return
 
-        await self._init_index("name", unique=True)
-        await self._init_index("createdAt", expireAfterSeconds=DOCUMENT_TTL)
+        lock_indexes = {
+            "name": {"unique": True},
+            "createdAt": {"expireAfterSeconds": DOCUMENT_TTL},
+            "expiresAt": {"expireAfterSeconds": 0},
+        }
+        indexes = {"name": {"unique": True}, "expiresAt": {"expireAfterSeconds": 0}}
+        await gather(
+            self._init_indexes(self._coll, lock_indexes),
+            *(
+                self._init_indexes(collection, indexes)
+                for collection in (self._rw_coll, self._sem_coll, self._queue_coll)
+            ),
+        )
 
-    async def _init_index(self, index_name: str, **params):
+    async def _wait_for_release(
+        self, name: Optional[str], delay: float, remaining: Optional[float]
+    ):
         """
-        Set up the given index
-        :param index_name:
-        :param params: https://motor.readthedocs.io/en/stable/api-asyncio/asyncio_motor_collection.html#motor.motor_asyncio.AsyncIOMotorCollection.create_index
-        :return:
+        Wait until the current holder of the lock might have released it
+        :param name: Name of the lock, None if waiting for several
+        :param delay: Delay suggested by the wait strategy, used when polling
+        :param remaining: Seconds left until the acquire times out, None if there is no timeout
         """
-        idx_info = await self._coll.index_information()
-        index_found = False
-        for name in idx_info:
-            keys = [i[0] for i in idx_info[name]["key"]]
+        if name is None or not self._use_change_streams:
+            await sleep(delay)
+            return
 
-            if index_name in keys:
-                index_found = True
+        holder = await self._coll.find_one({"name": name}, {"_id": 1, "expiresAt": 1})
+        if holder is None:
+            return
 
-        if not index_found:
-            await self._coll.create_index(index_name, **params)
+        max_wait = CHANGE_STREAM_MAX_WAIT
+        if remaining is not None:
+            max_wait = min(max_wait, remaining)
+        if "expiresAt" in holder:
+            # Can be taken over once expired, there's no delete to wait for
+            expires_in = holder["expiresAt"].replace(tzinfo=None) - datetime.utcnow()
+            max_wait = min(max_wait, expires_in.total_seconds())
+            if max_wait <= 0:
+                return
+
+        pipeline = [
+            {
+                "$match": {
+                    "operationType": "delete",
+                    "documentKey._id": holder["_id"],
+                }
+            }
+        ]
+        try:
+            async with self._coll.watch(
+                pipeline, max_await_time_ms=max(1, int(max_wait * 1000))
+            ) as stream:
+                # Might have been released before the stream was opened
+                doc = await self._coll.find_one({"_id": holder["_id"]}, {"_id": 1})
+                if doc is None:
+                    return
+
+                await stream.try_next()
+        except OperationFailure:
+            # Change streams are not available e.g. on standalone servers or CosmosDB
+            self._use_change_streams = False
+            await sleep(delay)
+
+    async def _limit(self, priority: bool = False):
+        """
+        Wait for the rate limiter, if any, before sending a request
+        :param priority: Send ahead of the acquire attempts, for releases
+        """
+        if self._limiter is not None:
+            delay = self._limiter.reserve(priority)
+            if delay > 0:
+                await sleep(delay)
+
+    async def _init_indexes(
+        self, collection: AsyncIOMotorCollection, indexes: Dict[str, dict]
+    ):
+        """
+        Set up the given indexes, checking for the existing ones only once
+        :param collection: Collection to set up the indexes on
+        :param indexes: Names of the indexed fields, and the params for each index https://motor.readthedocs.io/en/stable/api-asyncio/asyncio_motor_collection.html#motor.motor_asyncio.AsyncIOMotorCollection.create_index
+        """
+        existing = set()
+        for info in (await collection.index_information()).values():
+            existing.update(key for key, _ in info["key"])
+
+        for field, params in indexes.items():
+            if field not in existing:
+                await collection.create_index(field, **params)
+
+    def _retry_delay(self, e: WriteError, default_retry_time=None) -> Optional[float]:
+        """
+        Check if the request should be retried, and slow down all the requests via the rate limiter if it was rate limited
+        :param e: The error
+        :param default_retry_time: Time to wait for if the server does not tell
+        :return: Time to wait for, or None if shouldn't retry
+        """
+        delay = self._check_retry_exception(e, default_retry_time)
+        if delay is not None and self._limiter is not None:
+            self._limiter.throttled(delay)
+        return delay
 
     @staticmethod
     def _check_retry_exception(
@@ -144,4 +680,6 @@ class ShylockMotorAsyncIOBackend(ShylockAsyncBackend):
                 if part.startswith("RetryAfterMs="):
                     delay = float(part[len("RetryAfterMs=") :]) / 1000
 
+        if delay is not None and metrics.COLLECTOR is not None:
+            metrics.COLLECTOR.retried("rate_limited", delay)
         return delay
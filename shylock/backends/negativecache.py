@@ -0,0 +1,65 @@
+import threading
+from collections import OrderedDict
+from time import monotonic
+from typing import Optional
+
+
+class NegativeCache:
+    """
+    Remembers the locks that were just found to be held, so that acquire(block=False) can answer for them without
+    asking the database again for a short while. Useful for schedulers that check many locks to find work nobody
+    else is doing, at the cost of seeing a lock released by another process up to window seconds late. Where the
+    backend tells when the holder's lock expires, it's not remembered past that.
+
+    >>> ShylockPymongoBackend.create(client, "projectdb", negative_cache=NegativeCache(window=0.5))
+    """
+
+    def __init__(self, window: float = 1.0, size: int = 10000):
+        """
+        :param window: Seconds to consider a lock still held after failing to acquire it
+        :param size: Maximum number of locks to remember, the least recently used ones are forgotten first
+        """
+        self._window = window
+        self._size = size
+        self._lock = threading.Lock()
+        self._held_until: "OrderedDict[str, float]" = OrderedDict()
+
+    def held(self, name: str) -> bool:
+        """
+        Check if the lock was recently found to be held
+        :param name: Name of the lock
+        :return: If acquiring the lock can be skipped
+        """
+        with self._lock:
+            until = self._held_until.get(name)
+            if until is None:
+                return False
+            if until <= monotonic():
+                del self._held_until[name]
+                return False
+            self._held_until.move_to_end(name)
+            return True
+
+    def add(self, name: str, expires_in: Optional[float] = None):
+        """
+        The lock was found to be held by someone else
+        :param name: Name of the lock
+        :param expires_in: Seconds until the holder's lock expires, if known, to not remember it past that
+        """
+        window = self._window if expires_in is None else min(self._window, expires_in)
+        with self._lock:
+            if window <= 0:
+                self._held_until.pop(name, None)
+                return
+            self._held_until[name] = monotonic() + window
+            self._held_until.move_to_end(name)
+            if len(self._held_until) > self._size:
+                self._held_until.popitem(last=False)
+
+    def discard(self, name: str):
+        """
+        The lock was acquired or released via this backend, so the remembered state is out of date
+        :param name: Name of the lock
+        """
+        with self._lock:
+            self._held_until.pop(name, None)
@@ -0,0 +1,70 @@
+import threading
+from time import sleep
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+
+class ReleasePoller:
+    """
+    Polls the backend on behalf of all the threads waiting for locks, checking all the awaited locks with a single query,
+    and wakes up the waiters of the locks that have been released
+    """
+
+    def __init__(
+        self, find_held: Callable[[List[str]], Iterable[str]], interval: float
+    ):
+        """
+        :param find_held: Returns which of the given lock names are currently held
+        :param interval: Seconds between the checks
+        """
+        self._find_held = find_held
+        self._interval = interval
+        self._lock = threading.Lock()
+        self._waiters: Dict[str, Set[threading.Event]] = {}
+        self._thread: Optional[threading.Thread] = None
+
+    def wait(self, name: str, timeout: float):
+        """
+        Wait until the lock might have been released
+        :param name: Name of the lock
+        :param timeout: Maximum seconds to wait
+        """
+        event = threading.Event()
+        with self._lock:
+            self._waiters.setdefault(name, set()).add(event)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="shylock-poller", daemon=True
+                )
+                self._thread.start()
+
+        try:
+            event.wait(timeout)
+        finally:
+            with self._lock:
+                waiters = self._waiters[name]
+                waiters.discard(event)
+                if not waiters:
+                    del self._waiters[name]
+
+    def _run(self):
+        while True:
+            with self._lock:
+                names = list(self._waiters)
+                if not names:
+                    # Started again by the next waiter
+                    self._thread = None
+                    return
+
+            try:
+                held = set(self._find_held(names))
+            except Exception:
+                # Let the waiters find out for themselves
+                held = set()
+
+            with self._lock:
+                for name in names:
+                    if name not in held:
+                        for event in self._waiters.get(name, ()):
+                            event.set()
+
+            sleep(self._interval)
@@ -1,87 +1,618 @@
+from hashlib import sha256
 from time import sleep
-from typing import Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 try:
     from arango.collection import StandardCollection
     from arango.database import StandardDatabase
-    from arango.exceptions import ArangoServerError
+    from arango.exceptions import (
+        ArangoError,
+        ArangoServerError,
+        DocumentRevisionError,
+    )
 except ImportError:
     StandardDatabase = None
     StandardCollection = None
+    ArangoError = None
     ArangoServerError = None
+    DocumentRevisionError = None
 
-from shylock.backends import ShylockSyncBackend
+from shylock import metrics
+from shylock.backends import QUEUE_TICKET_TTL, WRITE_INTENT_TTL, ShylockSyncBackend
+from shylock.backends.negativecache import NegativeCache
+from shylock.backends.poller import ReleasePoller
 from shylock.exceptions import ShylockException
+from shylock.wait import DecorrelatedJitterWait, FixedWait, WaitStrategy
 
 DOCUMENT_TTL = 60 * 5  # 5min seems like a reasonable TTL
 POLL_DELAY = 1 / 16  # Some balance between high polling and high delay
+POLLER_MAX_WAIT = (
+    5  # Retry the insert at least this often when waiting for the shared poller
+)
+
+CONFLICT_MAX_RETRIES = 10  # Retries of a conflicting write before giving up
+# Spreads out the retries of writes that conflicted with each other
+CONFLICT_WAIT = DecorrelatedJitterWait(1 / 64, 1.0)
 
 ERROR_ARANGO_CONFLICT = 1200
 ERROR_ARANGO_UNIQUE_CONSTRAINT_VIOLATED = 1210
 
 
+def lock_key(name: str) -> str:
+    """
+    Get the document key for a lock, not every name is a valid key as is
+    :param name: Name of the lock
+    :return: SHA-256 of the name
+    """
+    return sha256(name.encode("utf-8")).hexdigest()
+
+
 class ShylockPythonArangoBackend(ShylockSyncBackend):
+    _errors = (OSError, ArangoError)
+
     @staticmethod
     def create(
-        db: StandardDatabase, collection_name: str = "shylock"
+        db: StandardDatabase,
+        collection_name: str = "shylock",
+        wait: Optional[WaitStrategy] = None,
+        ensure_schema: bool = True,
+        shared_poller: bool = False,
+        negative_cache: Optional[NegativeCache] = None,
     ) -> "ShylockPythonArangoBackend":
         """
         Create and initialize the backend
         :param db: An instance of arango.database.StandardDatabase connected to the desired database
         :param collection_name: The name of the collection reserved for shylock
+        :param wait: Strategy for waiting between attempts, defaults to polling every POLL_DELAY
+        :param ensure_schema: Create the collections and indexes that are missing, pass False if they're known to exist
+        :param shared_poller: Check for the releases of all the locks waited for with a single query every POLL_DELAY, instead of each waiting thread retrying on its own
+        :param negative_cache: Answer acquire(block=False) for the locks that were just found to be held without asking the database again
         """
-        inst = ShylockPythonArangoBackend(db, collection_name)
-        inst._init_collection()
+        inst = ShylockPythonArangoBackend(
+            db, collection_name, wait, shared_poller, negative_cache
+        )
+        inst._init_collection(ensure_schema)
         return inst
 
-    def acquire(self, name: str, block: bool = True) -> bool:
+    def _try_acquire(self, name: str, owner: str, ttl: Optional[float]) -> bool:
         """
-        Try to acquire a lock, potentially wait until it's available
+        Make a single attempt at acquiring the lock
         :param name: Name of the lock
-        :param block: Wait for lock
-        :return: If lock was successfully acquired - always True if block is True
+        :param owner: Token identifying this holder of the lock
+        :param ttl: Seconds until the lock expires, None for DOCUMENT_TTL
+        :return: If lock was successfully acquired
         """
-        while True:
-            try:
-                self._db.aql.execute(
-                    """
+        # Expires by the server's clock, like everything comparing against it
+        revisions = self._execute(
+            self._collection_name,
+            """
+            INSERT {
+              "_key": @key,
+              "name": @name,
+              "owner": @owner,
+              "expiresAt": DATE_NOW() / 1000 + @ttl
+            } IN @@collection
+            RETURN NEW._rev
+            """,
+            {
+                "key": lock_key(name),
+                "name": name,
+                "owner": owner,
+                "ttl": DOCUMENT_TTL if ttl is None else ttl,
+            },
+            retry=False,
+        )
+        if not revisions:
+            self._conflicted(name)
+            return False
+
+        self._revisions[name] = (owner, revisions[0])
+        return True
+
+    def _try_acquire_many(
+        self, names: List[str], owner: str, ttl: Optional[float]
+    ) -> bool:
+        """
+        Make a single attempt at acquiring all the locks, without leaving any of them held on failure
+        :param names: Names of the locks, sorted
+        :param owner: Token identifying this holder of the locks
+        :param ttl: Seconds until the locks expire, None for DOCUMENT_TTL
+        :return: If the locks were successfully acquired
+        """
+        # A single query is all or nothing
+        try:
+            self._db.aql.execute(
+                """
+                FOR lock IN @locks
                     INSERT {
-                      "name": @name,
+                      "_key": lock.key,
+                      "name": lock.name,
+                      "owner": @owner,
                       "expiresAt": DATE_NOW() / 1000 + @ttl
                     } IN @@collection
-                    """,
-                    bind_vars={
-                        "name": name,
-                        "ttl": DOCUMENT_TTL,
-                        "@collection": self._collection_name,
-                    },
-                )
-                return True
-            except ArangoServerError as err:
-                if err.error_code in {
-                    ERROR_ARANGO_UNIQUE_CONSTRAINT_VIOLATED,
-                    ERROR_ARANGO_CONFLICT,
-                }:
-                    if not block:
-                        return False
-                    sleep(POLL_DELAY)
-                else:
-                    raise
+                """,
+                bind_vars={
+                    "locks": [{"key": lock_key(name), "name": name} for name in names],
+                    "owner": owner,
+                    "ttl": DOCUMENT_TTL if ttl is None else ttl,
+                    "@collection": self._collection_name,
+                },
+            )
+            return True
+        except ArangoServerError as err:
+            if err.error_code in {
+                ERROR_ARANGO_UNIQUE_CONSTRAINT_VIOLATED,
+                ERROR_ARANGO_CONFLICT,
+            }:
+                return False
+            raise
 
-    def release(self, name: str):
+    def _release(self, name: str, owner: Optional[str]):
         """
-        Release a given lock
+        Release the lock
         :param name: Name of the lock
+        :param owner: Token the lock was acquired with, None to release regardless of the holder
         """
+        held = self._revisions.get(name)
+        if held is None or held[0] != owner:
+            # Not acquired via _try_acquire, find it by name instead
+            self._release_many({name: owner})
+            return
+
+        del self._revisions[name]
+        try:
+            self._coll.delete(
+                {"_key": lock_key(name), "_rev": held[1]},
+                check_rev=True,
+                ignore_missing=True,
+                silent=True,
+            )
+        except DocumentRevisionError:
+            # Changed since we acquired it, e.g. renewed, or expired and acquired by someone else - only remove it if
+            # it's still ours
+            self._release_many({name: owner})
+
+    def _release_many(self, owners: Dict[str, Optional[str]]):
+        """
+        Release all the locks
+        :param owners: Names of the locks and the tokens they were acquired with, None to release regardless of the holder
+        """
+        for name in owners:
+            self._revisions.pop(name, None)
+
         self._db.aql.execute(
+            """
+            FOR lock IN @locks
+                FOR l IN @@collection
+                    FILTER l.name == lock.name
+                        AND (lock.owner == null OR l.owner == lock.owner)
+                    REMOVE l IN @@collection
+            """,
+            bind_vars={
+                "locks": [
+                    {"name": name, "owner": owner} for name, owner in owners.items()
+                ],
+                "@collection": self._collection_name,
+            },
+        )
+
+    def _renew(self, name: str, owner: str, ttl: Optional[float]) -> bool:
+        """
+        Extend the expiration of the lock if it's still held by the owner
+        :param name: Name of the lock
+        :param owner: Token the lock was acquired with
+        :param ttl: Seconds from now until the lock expires, None for DOCUMENT_TTL
+        :return: If the lock was renewed
+        """
+        held = self._revisions.get(name)
+        if held is None or held[0] != owner:
+            # Not acquired via _try_acquire, find it by name instead
+            cursor = self._db.aql.execute(
+                """
+                FOR l IN @@collection
+                    FILTER l.name == @name AND l.owner == @owner
+                    UPDATE l WITH { "expiresAt": DATE_NOW() / 1000 + @ttl } IN @@collection
+                    RETURN 1
+                """,
+                bind_vars={
+                    "name": name,
+                    "owner": owner,
+                    "ttl": DOCUMENT_TTL if ttl is None else ttl,
+                    "@collection": self._collection_name,
+                },
+            )
+            return not cursor.empty()
+
+        revisions = self._execute(
+            self._collection_name,
+            """
+            LET l = DOCUMENT(@@collection, @key)
+            FILTER l != null AND l._rev == @rev
+            UPDATE l WITH { "expiresAt": DATE_NOW() / 1000 + @ttl } IN @@collection
+            RETURN NEW._rev
+            """,
+            {
+                "key": lock_key(name),
+                "rev": held[1],
+                "ttl": DOCUMENT_TTL if ttl is None else ttl,
+            },
+            retry=False,
+        )
+        if not revisions:
+            # Released, or expired and acquired by someone else
+            return False
+
+        self._revisions[name] = (owner, revisions[0])
+        return True
+
+    def _try_acquire_read(self, name: str, owner: str, ttl: Optional[float]) -> bool:
+        """
+        Make a single attempt at acquiring the reader-writer lock for reading
+        :param name: Name of the lock
+        :param owner: Token identifying this reader
+        :param ttl: Seconds until the lock expires, None for DOCUMENT_TTL
+        :return: If lock was successfully acquired
+        """
+        results = self._execute(
+            self._rw_collection_name,
+            """
+            LET now = DATE_NOW() / 1000
+            LET lock = FIRST(FOR l IN @@collection FILTER l._key == @key RETURN l)
+            FILTER lock == null OR (lock.writerExpiresAt <= now AND lock.intentExpiresAt <= now)
+            LET reader = { "owner": @owner, "expiresAt": now + @ttl }
+            UPSERT { "_key": @key }
+                INSERT {
+                  "_key": @key,
+                  "name": @name,
+                  "readers": [reader],
+                  "expiresAt": reader.expiresAt
+                }
+                UPDATE {
+                  "readers": APPEND((OLD.readers || [])[* FILTER CURRENT.expiresAt > now], [reader]),
+                  "expiresAt": MAX([OLD.expiresAt, reader.expiresAt])
+                }
+                IN @@collection
+            RETURN true
+            """,
+            {
+                "key": lock_key(name),
+                "name": name,
+                "owner": owner,
+                "ttl": DOCUMENT_TTL if ttl is None else ttl,
+            },
+            retry=False,
+        )
+        return True in results
+
+    def _try_acquire_write(
+        self, name: str, owner: str, ttl: Optional[float], queue: bool
+    ) -> bool:
+        """
+        Make a single attempt at acquiring the reader-writer lock for writing
+        :param name: Name of the lock
+        :param owner: Token identifying this writer
+        :param ttl: Seconds until the lock expires, None for DOCUMENT_TTL
+        :param queue: If the lock is not available, keep new readers out for WRITE_INTENT_TTL unless another writer is already waiting
+        :return: If lock was successfully acquired
+        """
+        results = self._execute(
+            self._rw_collection_name,
+            """
+            LET now = DATE_NOW() / 1000
+            LET lock = FIRST(FOR l IN @@collection FILTER l._key == @key RETURN l)
+            LET no_other_intent = lock.intentExpiresAt <= now OR lock.intent == @owner
+            LET free = lock == null OR (
+                lock.writerExpiresAt <= now
+                AND no_other_intent
+                AND LENGTH((lock.readers || [])[* FILTER CURRENT.expiresAt > now]) == 0
+            )
+            FILTER free OR (@queue AND no_other_intent)
+            LET expiresAt = now + (free ? @ttl : @intent_ttl)
+            UPSERT { "_key": @key }
+                INSERT {
+                  "_key": @key,
+                  "name": @name,
+                  "writer": @owner,
+                  "writerExpiresAt": expiresAt,
+                  "readers": [],
+                  "expiresAt": expiresAt
+                }
+                UPDATE MERGE(
+                  free
+                    ? { "writer": @owner, "writerExpiresAt": expiresAt, "readers": [], "intent": null, "intentExpiresAt": null }
+                    : { "intent": @owner, "intentExpiresAt": expiresAt },
+                  { "expiresAt": MAX([OLD.expiresAt, expiresAt]) }
+                )
+                IN @@collection
+            RETURN free
+            """,
+            {
+                "key": lock_key(name),
+                "name": name,
+                "owner": owner,
+                "ttl": DOCUMENT_TTL if ttl is None else ttl,
+                "queue": queue,
+                "intent_ttl": WRITE_INTENT_TTL,
+            },
+            retry=False,
+        )
+        return True in results
+
+    def _release_read(self, name: str, owner: str):
+        """
+        Release the reader-writer lock acquired for reading
+        :param name: Name of the lock
+        :param owner: Token the lock was acquired with
+        """
+        self._execute(
+            self._rw_collection_name,
             """
             FOR l IN @@collection
-                FILTER l.name == @name
-                REMOVE l IN @@collection
+                FILTER l._key == @key
+                UPDATE l WITH {
+                  "readers": (l.readers || [])[* FILTER CURRENT.owner != @owner]
+                } IN @@collection
             """,
-            bind_vars={"name": name, "@collection": self._collection_name},
+            {"key": lock_key(name), "owner": owner},
+            retry=True,
         )
 
+    def _release_write(self, name: str, owner: str):
+        """
+        Release the reader-writer lock acquired for writing, or stop waiting for it
+        :param name: Name of the lock
+        :param owner: Token the lock was acquired or waited for with
+        """
+        self._execute(
+            self._rw_collection_name,
+            """
+            FOR l IN @@collection
+                FILTER l._key == @key AND (l.writer == @owner OR l.intent == @owner)
+                UPDATE l WITH l.writer == @owner
+                    ? { "writer": null, "writerExpiresAt": null }
+                    : { "intent": null, "intentExpiresAt": null }
+                IN @@collection
+            """,
+            {"key": lock_key(name), "owner": owner},
+            retry=True,
+        )
+
+    def _try_acquire_semaphore(
+        self, name: str, owner: str, limit: int, ttl: Optional[float]
+    ) -> bool:
+        """
+        Make a single attempt at acquiring a slot of the semaphore
+        :param name: Name of the semaphore
+        :param owner: Token identifying this holder
+        :param limit: Maximum number of holders at once
+        :param ttl: Seconds until the slot expires, None for DOCUMENT_TTL
+        :return: If a slot was successfully acquired
+        """
+        results = self._execute(
+            self._sem_collection_name,
+            """
+            LET now = DATE_NOW() / 1000
+            LET semaphore = FIRST(FOR s IN @@collection FILTER s._key == @key RETURN s)
+            LET holders = (semaphore.holders || [])[* FILTER CURRENT.expiresAt > now]
+            FILTER LENGTH(holders) < @limit
+            LET holder = { "owner": @owner, "expiresAt": now + @ttl }
+            UPSERT { "_key": @key }
+                INSERT {
+                  "_key": @key,
+                  "name": @name,
+                  "holders": [holder],
+                  "expiresAt": holder.expiresAt
+                }
+                UPDATE {
+                  "holders": APPEND(holders, [holder]),
+                  "expiresAt": MAX([OLD.expiresAt, holder.expiresAt])
+                }
+                IN @@collection
+            RETURN true
+            """,
+            {
+                "key": lock_key(name),
+                "name": name,
+                "owner": owner,
+                "limit": limit,
+                "ttl": DOCUMENT_TTL if ttl is None else ttl,
+            },
+            retry=False,
+        )
+        return True in results
+
+    def _release_semaphore(self, name: str, owner: str):
+        """
+        Release the slot of the semaphore
+        :param name: Name of the semaphore
+        :param owner: Token the slot was acquired with
+        """
+        self._execute(
+            self._sem_collection_name,
+            """
+            FOR s IN @@collection
+                FILTER s._key == @key
+                UPDATE s WITH {
+                  "holders": (s.holders || [])[* FILTER CURRENT.owner != @owner]
+                } IN @@collection
+            """,
+            {"key": lock_key(name), "owner": owner},
+            retry=True,
+        )
+
+    def _take_turn(self, name: str, owner: str) -> bool:
+        """
+        Join the queue of fair waiters for the lock unless already in it, and keep the place for QUEUE_TICKET_TTL
+        :param name: Name of the lock
+        :param owner: Token identifying this waiter
+        :return: If this waiter is the first one in line
+        """
+        ticket = self._ticket(name, owner)
+        if not ticket.check_due():
+            # Wasn't first in line when last checked, only the first waiter needs to keep checking
+            return False
+
+        if ticket.write_due():
+            self._execute(
+                self._queue_collection_name,
+                """
+                LET expiresAt = DATE_NOW() / 1000 + @ttl
+                LET waiter = { "owner": @owner, "expiresAt": expiresAt }
+                UPSERT { "_key": @key }
+                    INSERT { "_key": @key, "name": @name, "waiters": [waiter], "expiresAt": expiresAt }
+                    UPDATE {
+                      "waiters": @owner IN (OLD.waiters || [])[*].owner
+                        ? OLD.waiters[* RETURN CURRENT.owner == @owner ? waiter : CURRENT]
+                        : APPEND(OLD.waiters || [], [waiter]),
+                      "expiresAt": MAX([OLD.expiresAt, expiresAt])
+                    }
+                    IN @@collection
+                """,
+                {
+                    "key": lock_key(name),
+                    "name": name,
+                    "owner": owner,
+                    "ttl": QUEUE_TICKET_TTL,
+                },
+                retry=True,
+            )
+
+        results = self._execute(
+            self._queue_collection_name,
+            """
+            FOR q IN @@collection
+                FILTER q._key == @key
+                LET live = (q.waiters || [])[* FILTER CURRENT.expiresAt > DATE_NOW() / 1000]
+                RETURN {
+                  "first": live[0].owner,
+                  "queued": @owner IN live[*].owner,
+                  "expired": LENGTH(q.waiters || []) > LENGTH(live)
+                }
+            """,
+            {"key": lock_key(name), "owner": owner},
+            retry=False,
+        )
+        queue = (
+            results[0]
+            if results
+            else {"first": None, "queued": False, "expired": False}
+        )
+        if not queue["queued"]:
+            # Dropped from the queue after missing a refresh
+            ticket.dropped()
+        first = queue["first"] == owner
+        if first and queue["expired"]:
+            # Drop the waiters that have given up without leaving the queue
+            self._execute(
+                self._queue_collection_name,
+                """
+                FOR q IN @@collection
+                    FILTER q._key == @key
+                    UPDATE q WITH {
+                      "waiters": (q.waiters || [])[* FILTER CURRENT.expiresAt > DATE_NOW() / 1000]
+                    } IN @@collection
+                """,
+                {"key": lock_key(name)},
+                retry=False,
+            )
+        ticket.checked(first)
+        return first
+
+    def _leave_queue(self, name: str, owner: str):
+        """
+        Leave the queue of fair waiters for the lock
+        :param name: Name of the lock
+        :param owner: Token identifying this waiter
+        """
+        self._execute(
+            self._queue_collection_name,
+            """
+            FOR q IN @@collection
+                FILTER q._key == @key
+                UPDATE q WITH {
+                  "waiters": (q.waiters || [])[* FILTER CURRENT.owner != @owner]
+                } IN @@collection
+            """,
+            {"key": lock_key(name), "owner": owner},
+            retry=True,
+        )
+
+    def _wait_for_release(
+        self, name: Optional[str], delay: float, remaining: Optional[float]
+    ):
+        """
+        Wait until the current holder of the lock might have released it
+        :param name: Name of the lock, None if waiting for several
+        :param delay: Delay suggested by the wait strategy, used when polling
+        :param remaining: Seconds left until the acquire times out, None if there is no timeout
+        """
+        if name is None or self._poller is None:
+            sleep(delay)
+            return
+
+        max_wait = POLLER_MAX_WAIT
+        if remaining is not None:
+            max_wait = min(max_wait, remaining)
+        self._poller.wait(name, max_wait)
+
+    def _find_held(self, names: List[str]) -> List[str]:
+        """
+        Find which of the locks are currently held
+        :param names: Names of the locks
+        :return: Names of the held locks
+        """
+        return self._execute(
+            self._collection_name,
+            """
+            FOR l IN @@collection
+                FILTER l._key IN @keys AND l.expiresAt > DATE_NOW() / 1000
+                RETURN l.name
+            """,
+            {"keys": [lock_key(name) for name in names]},
+            retry=False,
+        )
+
+    def _execute(
+        self,
+        collection_name: str,
+        query: str,
+        bind_vars: Dict[str, Any],
+        retry: bool,
+    ) -> List[Any]:
+        """
+        Run a query on the locks, the reader-writer locks, the semaphores or the queues of fair waiters
+        :param collection_name: Name of the collection to bind as @@collection
+        :param query: The AQL query, using @@collection for the collection
+        :param bind_vars: Values for the other bind parameters
+        :param retry: Retry if the document was modified concurrently, up to CONFLICT_MAX_RETRIES times, instead of returning no results
+        :return: The results of the query
+        """
+        bind_vars = {**bind_vars, "@collection": collection_name}
+        delays = CONFLICT_WAIT.delays()
+        retries = 0
+        while True:
+            try:
+                cursor = self._db.aql.execute(query, bind_vars=bind_vars)
+                # Reads the later batches too, a query can return more than one
+                return list(cursor)
+            except ArangoServerError as err:
+                if err.error_code in {
+                    ERROR_ARANGO_UNIQUE_CONSTRAINT_VIOLATED,
+                    ERROR_ARANGO_CONFLICT,
+                }:
+                    if not retry:
+                        return []
+                    if retries == CONFLICT_MAX_RETRIES:
+                        raise
+
+                    retries += 1
+                    delay = next(delays)
+                    if metrics.COLLECTOR is not None:
+                        metrics.COLLECTOR.retried("conflict", delay)
+                    sleep(delay)
+                    continue
+                raise
+
     @staticmethod
     def _check():
         if StandardDatabase is None:
@@ -89,20 +620,57 @@ class ShylockPythonArangoBackend(ShylockSyncBackend):
                 "No python-arango driver available. Cannot use Shylock with PythonArango backend without it."
             )
 
-    def __init__(self, db: StandardDatabase, collection_name: str = "shylock"):
+    def __init__(
+        self,
+        db: StandardDatabase,
+        collection_name: str = "shylock",
+        wait: Optional[WaitStrategy] = None,
+        shared_poller: bool = False,
+        negative_cache: Optional[NegativeCache] = None,
+    ):
+        super().__init__()
         self._check()
         self._db: StandardDatabase = db
         self._coll: Optional[StandardCollection] = None
         self._collection_name: str = collection_name
+        self._rw_coll: Optional[StandardCollection] = None
+        self._rw_collection_name: str = f"{collection_name}_rw"
+        self._sem_coll: Optional[StandardCollection] = None
+        self._sem_collection_name: str = f"{collection_name}_semaphores"
+        self._queue_coll: Optional[StandardCollection] = None
+        self._queue_collection_name: str = f"{collection_name}_queues"
+        self._wait: WaitStrategy = FixedWait(POLL_DELAY) if wait is None else wait
+        self._negative_cache: Optional[NegativeCache] = negative_cache
+        # Owner and document revision of the locks acquired via _try_acquire
+        self._revisions: Dict[str, Tuple[str, str]] = {}
+        self._poller: Optional[ReleasePoller] = None
+        if shared_poller:
+            self._poller = ReleasePoller(self._find_held, POLL_DELAY)
 
-    def _init_collection(self):
+    def _init_collection(self, ensure_schema: bool = True):
         """
         Ensure the collection is ready for our use
+        :param ensure_schema: Create the collections and indexes that are missing
         """
-        if self._db.has_collection(self._collection_name):
-            self._coll = self._db.collection(self._collection_name)
-        else:
-            self._coll = self._db.create_collection(self._collection_name)
+        # Reader-writer locks, semaphores and queues are kept apart from the unique index on name of the locks
+        names = [
+            self._collection_name,
+            self._rw_collection_name,
+            self._sem_collection_name,
+            self._queue_collection_name,
+        ]
+        if ensure_schema:
+            existing = {c["name"] for c in self._db.collections()}
+            for name in names:
+                if name not in existing:
+                    self._db.create_collection(name)
+
+        self._coll, self._rw_coll, self._sem_coll, self._queue_coll = [
+            self._db.collection(name) for name in names
+        ]
+        if not ensure_schema:
+            return
 
         self._coll.add_persistent_index(fields=["name"], unique=True)
-        self._coll.add_ttl_index(fields=["expiresAt"], expiry_time=0)
+        for collection in (self._coll, self._rw_coll, self._sem_coll, self._queue_coll):
+            collection.add_ttl_index(fields=["expiresAt"], expiry_time=0)
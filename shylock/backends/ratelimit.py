@@ -0,0 +1,105 @@
+import threading
+from time import monotonic
+from typing import Optional
+
+DECREASE_INTERVAL = (
+    1.0  # Throttling within this many seconds of a decrease counts as the same event
+)
+
+
+class AdaptiveRateLimiter:
+    """
+    Learns the request rate the server can sustain from its rate limiting responses, and spaces out the requests of
+    all the locks using the backend to stay under it. Unlimited until first throttled, then the rate is halved on
+    each throttling event and grows back linearly (AIMD).
+
+    Releases skip the line so locks are freed quickly, but still use up capacity, so acquire attempts back off instead.
+
+    >>> ShylockPymongoBackend.create(client, "projectdb", rate_limiter=AdaptiveRateLimiter())
+    """
+
+    def __init__(
+        self,
+        min_rate: float = 1.0,
+        increase: float = 10.0,
+        decrease: float = 0.5,
+        burst: int = 10,
+    ):
+        """
+        :param min_rate: Lowest rate to fall to, in requests per second
+        :param increase: Requests per second to add to the rate for every second without throttling
+        :param decrease: Multiplier for the rate when throttled
+        :param burst: Number of requests that can be sent at once after a pause
+        """
+        self._min_rate = min_rate
+        self._increase = increase
+        self._decrease = decrease
+        self._burst = burst
+        self._lock = threading.Lock()
+        self._rate: Optional[float] = None
+        self._updated = monotonic()
+        self._decreased = float("-inf")
+        self._next = 0.0
+        self._paused_until = 0.0
+        self._window_start = monotonic()
+        self._window_count = 0
+        self._window_rate = 0.0
+
+    @property
+    def rate(self) -> Optional[float]:
+        """
+        :return: Current rate limit in requests per second, None until first throttled
+        """
+        return self._rate
+
+    def reserve(self, priority: bool = False) -> float:
+        """
+        Reserve a slot for sending a request
+        :param priority: Send before the requests that are already waiting, for releases
+        :return: Seconds to wait before sending the request
+        """
+        with self._lock:
+            now = monotonic()
+            self._count(now)
+            start = max(now, self._paused_until)
+            if self._rate is None:
+                return start - now
+
+            self._rate += self._increase * (now - self._updated)
+            self._updated = now
+            interval = 1 / self._rate
+            if not priority:
+                start = max(start, self._next - (self._burst - 1) * interval)
+            self._next = max(self._next, start) + interval
+            return start - now
+
+    def throttled(self, retry_after: float):
+        """
+        The server rejected a request for going over its rate limit
+        :param retry_after: Seconds the server asked to wait before retrying
+        """
+        with self._lock:
+            now = monotonic()
+            # Hold back everyone, not just the rejected request
+            self._paused_until = max(self._paused_until, now + retry_after)
+            if now - self._decreased < DECREASE_INTERVAL:
+                return
+
+            # The rate may have grown well past the actual traffic while nothing was throttled
+            rate = self._window_rate
+            if self._rate is not None:
+                rate = min(rate, self._rate)
+            self._rate = max(self._min_rate, rate * self._decrease)
+            self._updated = now
+            self._decreased = now
+
+    def _count(self, now: float):
+        elapsed = now - self._window_start
+        self._window_count += 1
+        if elapsed >= 1:
+            self._window_rate = self._window_count / elapsed
+            self._window_start = now
+            self._window_count = 0
+        else:
+            # A partial window is a lower bound for the rate
+            self._window_rate = max(self._window_rate, self._window_count)
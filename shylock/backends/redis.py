@@ -0,0 +1,485 @@
+from time import monotonic, sleep
+from typing import Dict, List, Optional
+
+try:
+    from redis import Redis
+    from redis.exceptions import RedisError
+except ImportError:
+    Redis = None
+    RedisError = None
+
+from shylock.backends import QUEUE_TICKET_TTL, WRITE_INTENT_TTL, ShylockSyncBackend
+from shylock.backends.negativecache import NegativeCache
+from shylock.exceptions import ShylockException
+from shylock.wait import FixedWait, WaitStrategy
+
+DOCUMENT_TTL = 60 * 5  # 5min seems like a reasonable TTL
+POLL_DELAY = 1 / 16  # Some balance between high polling and high delay
+PUBSUB_MAX_WAIT = 5  # Retry at least this often when waiting for a lock without a TTL
+
+# KEYS: lock; ARGV: owner, release channel
+RELEASE_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    redis.call("del", KEYS[1])
+    redis.call("publish", ARGV[2], "")
+    return 1
+end
+return 0
+"""
+
+# KEYS: locks; ARGV: owner, TTL in ms
+ACQUIRE_MANY_SCRIPT = """
+for _, key in ipairs(KEYS) do
+    if redis.call("exists", key) == 1 then
+        return 0
+    end
+end
+for _, key in ipairs(KEYS) do
+    redis.call("set", key, ARGV[1], "px", ARGV[2])
+end
+return 1
+"""
+
+# KEYS: locks; ARGV: for each lock the owner or "" to release regardless, then for each lock the release channel
+RELEASE_MANY_SCRIPT = """
+for i, key in ipairs(KEYS) do
+    if ARGV[i] == "" or redis.call("get", key) == ARGV[i] then
+        redis.call("del", key)
+        redis.call("publish", ARGV[#KEYS + i], "")
+    end
+end
+return 1
+"""
+
+# KEYS: lock; ARGV: owner, TTL in ms
+RENEW_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("pexpire", KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+# KEYS: writer, intent, readers; ARGV: owner, TTL in ms
+ACQUIRE_READ_SCRIPT = """
+if redis.call("exists", KEYS[1]) == 1 or redis.call("exists", KEYS[2]) == 1 then
+    return 0
+end
+local time = redis.call("time")
+local now = time[1] * 1000 + math.floor(time[2] / 1000)
+redis.call("zremrangebyscore", KEYS[3], "-inf", now)
+redis.call("zadd", KEYS[3], now + ARGV[2], ARGV[1])
+if redis.call("pttl", KEYS[3]) < tonumber(ARGV[2]) then
+    redis.call("pexpire", KEYS[3], ARGV[2])
+end
+return 1
+"""
+
+# KEYS: writer, intent, readers; ARGV: owner, TTL in ms, "1" to keep new readers out if not available, intent TTL in ms
+ACQUIRE_WRITE_SCRIPT = """
+local intent = redis.call("get", KEYS[2])
+if intent and intent ~= ARGV[1] then
+    return 0
+end
+local time = redis.call("time")
+local now = time[1] * 1000 + math.floor(time[2] / 1000)
+redis.call("zremrangebyscore", KEYS[3], "-inf", now)
+if redis.call("exists", KEYS[1]) == 0 and redis.call("zcard", KEYS[3]) == 0 then
+    redis.call("set", KEYS[1], ARGV[1], "px", ARGV[2])
+    redis.call("del", KEYS[2])
+    return 1
+end
+if ARGV[3] == "1" then
+    redis.call("set", KEYS[2], ARGV[1], "px", ARGV[4])
+end
+return 0
+"""
+
+# KEYS: writer, intent; ARGV: owner
+RELEASE_WRITE_SCRIPT = """
+for _, key in ipairs(KEYS) do
+    if redis.call("get", key) == ARGV[1] then
+        redis.call("del", key)
+    end
+end
+return 1
+"""
+
+# KEYS: holders; ARGV: owner, limit, TTL in ms
+ACQUIRE_SEMAPHORE_SCRIPT = """
+local time = redis.call("time")
+local now = time[1] * 1000 + math.floor(time[2] / 1000)
+redis.call("zremrangebyscore", KEYS[1], "-inf", now)
+if redis.call("zcard", KEYS[1]) >= tonumber(ARGV[2]) then
+    return 0
+end
+redis.call("zadd", KEYS[1], now + ARGV[3], ARGV[1])
+if redis.call("pttl", KEYS[1]) < tonumber(ARGV[3]) then
+    redis.call("pexpire", KEYS[1], ARGV[3])
+end
+return 1
+"""
+
+
+# KEYS: waiters by arrival, waiters by expiration, arrival counter; ARGV: owner, ticket TTL in ms
+TAKE_TURN_SCRIPT = """
+local time = redis.call("time")
+local now = time[1] * 1000 + math.floor(time[2] / 1000)
+local expired = redis.call("zrangebyscore", KEYS[2], "-inf", now)
+if #expired > 0 then
+    redis.call("zrem", KEYS[1], unpack(expired))
+    redis.call("zremrangebyscore", KEYS[2], "-inf", now)
+end
+if not redis.call("zscore", KEYS[1], ARGV[1]) then
+    redis.call("zadd", KEYS[1], redis.call("incr", KEYS[3]), ARGV[1])
+end
+redis.call("zadd", KEYS[2], now + ARGV[2], ARGV[1])
+for _, key in ipairs(KEYS) do
+    redis.call("pexpire", key, ARGV[2])
+end
+if redis.call("zrange", KEYS[1], 0, 0)[1] == ARGV[1] then
+    return 1
+end
+return 0
+"""
+
+# KEYS: waiters by arrival, waiters by expiration; ARGV: owner
+LEAVE_QUEUE_SCRIPT = """
+redis.call("zrem", KEYS[1], ARGV[1])
+redis.call("zrem", KEYS[2], ARGV[1])
+return 1
+"""
+
+
+# KEYS: lock, wanted marker
+MARK_WANTED_SCRIPT = """
+local holder = redis.call("get", KEYS[1])
+if holder then
+    local ttl = redis.call("pttl", KEYS[1])
+    if ttl > 0 then
+        redis.call("set", KEYS[2], holder, "px", ttl)
+    else
+        redis.call("set", KEYS[2], holder)
+    end
+end
+return 1
+"""
+
+# KEYS: lock, wanted marker; ARGV: owner
+IS_WANTED_SCRIPT = """
+if redis.call("get", KEYS[1]) ~= ARGV[1] or redis.call("get", KEYS[2]) == ARGV[1] then
+    return 1
+end
+return 0
+"""
+
+
+def same_slot_key(key: str, suffix: str) -> str:
+    """
+    Get a key that's in the same hash slot as the given one on Redis Cluster, so a script can use both
+    :param key: Key to share the slot with
+    :param suffix: Tells the new key apart from the given one
+    :return: The key with the suffix, hash tagged with the whole given key unless it already has a hash tag - can't share the slot if the given key has a "}" but no hash tag
+    """
+    start = key.find("{")
+    end = key.find("}", start + 1)
+    if start != -1 and end > start + 1:
+        return key + suffix
+    return f"{{{key}}}{suffix}"
+
+
+class ShylockRedisBackend(ShylockSyncBackend):
+    _supports_sticky = True
+    _errors = (OSError, RedisError)
+
+    @staticmethod
+    def create(
+        client: Redis,
+        prefix: str = "shylock:",
+        wait: Optional[WaitStrategy] = None,
+        negative_cache: Optional[NegativeCache] = None,
+    ) -> "ShylockRedisBackend":
+        """
+        Create and initialize the backend
+        :param client: Connected redis.Redis client instance
+        :param prefix: Prefix for the keys and channels reserved for shylock
+        :param wait: Strategy for waiting between attempts at acquiring several locks at once, defaults to polling every POLL_DELAY
+        :param negative_cache: Answer acquire(block=False) for the locks that were just found to be held without asking the database again
+        """
+        inst = ShylockRedisBackend(client, prefix, wait, negative_cache)
+        inst._init_scripts()
+        return inst
+
+    def _try_acquire(self, name: str, owner: str, ttl: Optional[float]) -> bool:
+        """
+        Make a single attempt at acquiring the lock
+        :param name: Name of the lock
+        :param owner: Token identifying this holder of the lock
+        :param ttl: Seconds until the lock expires, None for DOCUMENT_TTL
+        :return: If lock was successfully acquired
+        """
+        if self._client.set(self._key(name), owner, nx=True, px=self._ttl_ms(ttl)):
+            return True
+        self._conflicted(name)
+        return False
+
+    def _holder_expires_in(self, name: str) -> Optional[float]:
+        """
+        Check when the lock held by someone else expires, for the negative cache
+        :param name: Name of the lock
+        :return: Seconds until it expires, None if not known
+        """
+        pttl = self._client.pttl(self._key(name))
+        # -2 when released in the meantime, -1 when it doesn't expire
+        return None if pttl == -1 else max(0, pttl) / 1000
+
+    def _try_acquire_many(
+        self, names: List[str], owner: str, ttl: Optional[float]
+    ) -> bool:
+        """
+        Make a single attempt at acquiring all the locks, without leaving any of them held on failure
+        :param names: Names of the locks, sorted
+        :param owner: Token identifying this holder of the locks
+        :param ttl: Seconds until the locks expire, None for DOCUMENT_TTL
+        :return: If the locks were successfully acquired
+        """
+        keys = [self._key(name) for name in names]
+        return bool(self._acquire_many_script(keys, [owner, self._ttl_ms(ttl)]))
+
+    def _release(self, name: str, owner: Optional[str]):
+        """
+        Release the lock
+        :param name: Name of the lock
+        :param owner: Token the lock was acquired with, None to release regardless of the holder
+        """
+        if owner is None:
+            self._release_many({name: None})
+            return
+
+        self._release_script([self._key(name)], [owner, self._channel(name)])
+
+    def _release_many(self, owners: Dict[str, Optional[str]]):
+        """
+        Release all the locks
+        :param owners: Names of the locks and the tokens they were acquired with, None to release regardless of the holder
+        """
+        keys = [self._key(name) for name in owners]
+        args = [owner or "" for owner in owners.values()]
+        args += [self._channel(name) for name in owners]
+        self._release_many_script(keys, args)
+
+    def _renew(self, name: str, owner: str, ttl: Optional[float]) -> bool:
+        """
+        Extend the expiration of the lock if it's still held by the owner
+        :param name: Name of the lock
+        :param owner: Token the lock was acquired with
+        :param ttl: Seconds from now until the lock expires, None for DOCUMENT_TTL
+        :return: If the lock was renewed
+        """
+        return bool(self._renew_script([self._key(name)], [owner, self._ttl_ms(ttl)]))
+
+    def _try_acquire_read(self, name: str, owner: str, ttl: Optional[float]) -> bool:
+        """
+        Make a single attempt at acquiring the reader-writer lock for reading
+        :param name: Name of the lock
+        :param owner: Token identifying this reader
+        :param ttl: Seconds until the lock expires, None for DOCUMENT_TTL
+        :return: If lock was successfully acquired
+        """
+        return bool(
+            self._acquire_read_script(self._rw_keys(name), [owner, self._ttl_ms(ttl)])
+        )
+
+    def _try_acquire_write(
+        self, name: str, owner: str, ttl: Optional[float], queue: bool
+    ) -> bool:
+        """
+        Make a single attempt at acquiring the reader-writer lock for writing
+        :param name: Name of the lock
+        :param owner: Token identifying this writer
+        :param ttl: Seconds until the lock expires, None for DOCUMENT_TTL
+        :param queue: If the lock is not available, keep new readers out for WRITE_INTENT_TTL unless another writer is already waiting
+        :return: If lock was successfully acquired
+        """
+        args = [owner, self._ttl_ms(ttl), int(queue), self._ttl_ms(WRITE_INTENT_TTL)]
+        return bool(self._acquire_write_script(self._rw_keys(name), args))
+
+    def _release_read(self, name: str, owner: str):
+        """
+        Release the reader-writer lock acquired for reading
+        :param name: Name of the lock
+        :param owner: Token the lock was acquired with
+        """
+        self._client.zrem(self._rw_keys(name)[2], owner)
+
+    def _release_write(self, name: str, owner: str):
+        """
+        Release the reader-writer lock acquired for writing, or stop waiting for it
+        :param name: Name of the lock
+        :param owner: Token the lock was acquired or waited for with
+        """
+        self._release_write_script(self._rw_keys(name)[:2], [owner])
+
+    def _try_acquire_semaphore(
+        self, name: str, owner: str, limit: int, ttl: Optional[float]
+    ) -> bool:
+        """
+        Make a single attempt at acquiring a slot of the semaphore
+        :param name: Name of the semaphore
+        :param owner: Token identifying this holder
+        :param limit: Maximum number of holders at once
+        :param ttl: Seconds until the slot expires, None for DOCUMENT_TTL
+        :return: If a slot was successfully acquired
+        """
+        args = [owner, limit, self._ttl_ms(ttl)]
+        return bool(self._acquire_semaphore_script([self._semaphore_key(name)], args))
+
+    def _release_semaphore(self, name: str, owner: str):
+        """
+        Release the slot of the semaphore
+        :param name: Name of the semaphore
+        :param owner: Token the slot was acquired with
+        """
+        self._client.zrem(self._semaphore_key(name), owner)
+
+    def _take_turn(self, name: str, owner: str) -> bool:
+        """
+        Join the queue of fair waiters for the lock unless already in it, and keep the place for QUEUE_TICKET_TTL
+        :param name: Name of the lock
+        :param owner: Token identifying this waiter
+        :return: If this waiter is the first one in line
+        """
+        args = [owner, QUEUE_TICKET_TTL * 1000]
+        return bool(self._take_turn_script(self._queue_keys(name), args))
+
+    def _leave_queue(self, name: str, owner: str):
+        """
+        Leave the queue of fair waiters for the lock
+        :param name: Name of the lock
+        :param owner: Token identifying this waiter
+        """
+        self._leave_queue_script(self._queue_keys(name)[:2], [owner])
+
+    def _mark_wanted(self, name: str):
+        """
+        Let the holder of a sticky lock know someone else is waiting for it
+        :param name: Name of the lock
+        """
+        self._mark_wanted_script([self._key(name), self._wanted_key(name)])
+
+    def _is_wanted(self, name: str, owner: str) -> bool:
+        """
+        Check if someone else is waiting for a sticky lock
+        :param name: Name of the lock
+        :param owner: Token the lock was acquired with
+        :return: If the lock is wanted, or no longer held by the owner
+        """
+        keys = [self._key(name), self._wanted_key(name)]
+        return bool(self._is_wanted_script(keys, [owner]))
+
+    def _wait_for_release(
+        self, name: Optional[str], delay: float, remaining: Optional[float]
+    ):
+        """
+        Wait until the lock is released via Shylock or expires
+        :param name: Name of the lock, None if waiting for several
+        :param delay: Delay suggested by the wait strategy, used when waiting for several
+        :param remaining: Seconds left until the acquire times out, None if there is no timeout
+        """
+        if name is None:
+            sleep(delay)
+            return
+
+        pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        try:
+            pubsub.subscribe(self._channel(name))
+
+            # Subscribed first, so a release can't slip by unnoticed
+            pttl = self._client.pttl(self._key(name))
+            if pttl == -2:  # Released already
+                return
+
+            max_wait = PUBSUB_MAX_WAIT if pttl < 0 else pttl / 1000
+            if remaining is not None:
+                max_wait = min(max_wait, remaining)
+
+            deadline = monotonic() + max_wait
+            while True:
+                left = deadline - monotonic()
+                if left <= 0:
+                    return
+
+                message = pubsub.get_message(timeout=left)
+                if message is not None and message["type"] == "message":
+                    return
+        finally:
+            pubsub.close()
+
+    @staticmethod
+    def _check():
+        if Redis is None:
+            raise ShylockException(
+                "No redis driver available. Cannot use Shylock with Redis backend without it."
+            )
+
+    def __init__(
+        self,
+        client: Redis,
+        prefix: str = "shylock:",
+        wait: Optional[WaitStrategy] = None,
+        negative_cache: Optional[NegativeCache] = None,
+    ):
+        super().__init__()
+        self._check()
+        self._client: Redis = client
+        self._prefix: str = prefix
+        self._wait: WaitStrategy = FixedWait(POLL_DELAY) if wait is None else wait
+        self._negative_cache: Optional[NegativeCache] = negative_cache
+
+    def _init_scripts(self):
+        """
+        Register the Lua scripts used for atomic operations
+        """
+        self._release_script = self._client.register_script(RELEASE_SCRIPT)
+        self._acquire_many_script = self._client.register_script(ACQUIRE_MANY_SCRIPT)
+        self._release_many_script = self._client.register_script(RELEASE_MANY_SCRIPT)
+        self._renew_script = self._client.register_script(RENEW_SCRIPT)
+        self._acquire_read_script = self._client.register_script(ACQUIRE_READ_SCRIPT)
+        self._acquire_write_script = self._client.register_script(ACQUIRE_WRITE_SCRIPT)
+        self._release_write_script = self._client.register_script(RELEASE_WRITE_SCRIPT)
+        self._acquire_semaphore_script = self._client.register_script(
+            ACQUIRE_SEMAPHORE_SCRIPT
+        )
+        self._take_turn_script = self._client.register_script(TAKE_TURN_SCRIPT)
+        self._leave_queue_script = self._client.register_script(LEAVE_QUEUE_SCRIPT)
+        self._mark_wanted_script = self._client.register_script(MARK_WANTED_SCRIPT)
+        self._is_wanted_script = self._client.register_script(IS_WANTED_SCRIPT)
+
+    def _key(self, name: str) -> str:
+        return f"{self._prefix}lock:{name}"
+
+    def _rw_keys(self, name: str) -> List[str]:
+        # The hash tag keeps the keys in the same slot on Redis Cluster
+        return [
+            f"{self._prefix}rw:{{{name}}}:{part}"
+            for part in ("writer", "intent", "readers")
+        ]
+
+    def _wanted_key(self, name: str) -> str:
+        # Used together with the lock key in the scripts, which can't span hash slots on Redis Cluster
+        return same_slot_key(self._key(name), ":wanted")
+
+    def _semaphore_key(self, name: str) -> str:
+        return f"{self._prefix}semaphore:{name}"
+
+    def _queue_keys(self, name: str) -> List[str]:
+        return [
+            f"{self._prefix}queue:{{{name}}}:{part}"
+            for part in ("order", "expiry", "seq")
+        ]
+
+    def _channel(self, name: str) -> str:
+        return f"{self._prefix}released:{name}"
+
+    @staticmethod
+    def _ttl_ms(ttl: Optional[float]) -> int:
+        return max(1, int((DOCUMENT_TTL if ttl is None else ttl) * 1000))
@@ -0,0 +1,342 @@
+from asyncio import sleep
+from time import monotonic
+from typing import Dict, List, Optional
+
+try:
+    from redis.asyncio import Redis
+    from redis.exceptions import RedisError
+except ImportError:
+    Redis = None
+    RedisError = None
+
+from shylock.backends import QUEUE_TICKET_TTL, WRITE_INTENT_TTL, ShylockAsyncBackend
+from shylock.backends.negativecache import NegativeCache
+from shylock.backends.redis import (
+    ACQUIRE_MANY_SCRIPT,
+    ACQUIRE_READ_SCRIPT,
+    ACQUIRE_SEMAPHORE_SCRIPT,
+    ACQUIRE_WRITE_SCRIPT,
+    IS_WANTED_SCRIPT,
+    LEAVE_QUEUE_SCRIPT,
+    MARK_WANTED_SCRIPT,
+    RELEASE_MANY_SCRIPT,
+    RELEASE_SCRIPT,
+    RELEASE_WRITE_SCRIPT,
+    RENEW_SCRIPT,
+    TAKE_TURN_SCRIPT,
+    same_slot_key,
+)
+from shylock.exceptions import ShylockException
+from shylock.wait import FixedWait, WaitStrategy
+
+DOCUMENT_TTL = 60 * 5  # 5min seems like a reasonable TTL
+POLL_DELAY = 1 / 16  # Some balance between high polling and high delay
+PUBSUB_MAX_WAIT = 5  # Retry at least this often when waiting for a lock without a TTL
+
+
+class ShylockAsyncRedisBackend(ShylockAsyncBackend):
+    _supports_sticky = True
+    _errors = (OSError, RedisError)
+
+    @staticmethod
+    async def create(
+        client: Redis,
+        prefix: str = "shylock:",
+        wait: Optional[WaitStrategy] = None,
+        negative_cache: Optional[NegativeCache] = None,
+    ) -> "ShylockAsyncRedisBackend":
+        """
+        Create and initialize the backend
+        :param client: Connected redis.asyncio.Redis client instance
+        :param prefix: Prefix for the keys and channels reserved for shylock
+        :param wait: Strategy for waiting between attempts at acquiring several locks at once, defaults to polling every POLL_DELAY
+        :param negative_cache: Answer acquire(block=False) for the locks that were just found to be held without asking the database again
+        """
+        inst = ShylockAsyncRedisBackend(client, prefix, wait, negative_cache)
+        inst._init_scripts()
+        return inst
+
+    async def _try_acquire(self, name: str, owner: str, ttl: Optional[float]) -> bool:
+        """
+        Make a single attempt at acquiring the lock
+        :param name: Name of the lock
+        :param owner: Token identifying this holder of the lock
+        :param ttl: Seconds until the lock expires, None for DOCUMENT_TTL
+        :return: If lock was successfully acquired
+        """
+        if await self._client.set(
+            self._key(name), owner, nx=True, px=self._ttl_ms(ttl)
+        ):
+            return True
+        self._conflicted(name)
+        return False
+
+    async def _holder_expires_in(self, name: str) -> Optional[float]:
+        """
+        Check when the lock held by someone else expires, for the negative cache
+        :param name: Name of the lock
+        :return: Seconds until it expires, None if not known
+        """
+        pttl = await self._client.pttl(self._key(name))
+        # -2 when released in the meantime, -1 when it doesn't expire
+        return None if pttl == -1 else max(0, pttl) / 1000
+
+    async def _try_acquire_many(
+        self, names: List[str], owner: str, ttl: Optional[float]
+    ) -> bool:
+        """
+        Make a single attempt at acquiring all the locks, without leaving any of them held on failure
+        :param names: Names of the locks, sorted
+        :param owner: Token identifying this holder of the locks
+        :param ttl: Seconds until the locks expire, None for DOCUMENT_TTL
+        :return: If the locks were successfully acquired
+        """
+        keys = [self._key(name) for name in names]
+        return bool(await self._acquire_many_script(keys, [owner, self._ttl_ms(ttl)]))
+
+    async def _release(self, name: str, owner: Optional[str]):
+        """
+        Release the lock
+        :param name: Name of the lock
+        :param owner: Token the lock was acquired with, None to release regardless of the holder
+        """
+        if owner is None:
+            await self._release_many({name: None})
+            return
+
+        await self._release_script([self._key(name)], [owner, self._channel(name)])
+
+    async def _release_many(self, owners: Dict[str, Optional[str]]):
+        """
+        Release all the locks
+        :param owners: Names of the locks and the tokens they were acquired with, None to release regardless of the holder
+        """
+        keys = [self._key(name) for name in owners]
+        args = [owner or "" for owner in owners.values()]
+        args += [self._channel(name) for name in owners]
+        await self._release_many_script(keys, args)
+
+    async def _renew(self, name: str, owner: str, ttl: Optional[float]) -> bool:
+        """
+        Extend the expiration of the lock if it's still held by the owner
+        :param name: Name of the lock
+        :param owner: Token the lock was acquired with
+        :param ttl: Seconds from now until the lock expires, None for DOCUMENT_TTL
+        :return: If the lock was renewed
+        """
+        return bool(
+            await self._renew_script([self._key(name)], [owner, self._ttl_ms(ttl)])
+        )
+
+    async def _try_acquire_read(
+        self, name: str, owner: str, ttl: Optional[float]
+    ) -> bool:
+        """
+        Make a single attempt at acquiring the reader-writer lock for reading
+        :param name: Name of the lock
+        :param owner: Token identifying this reader
+        :param ttl: Seconds until the lock expires, None for DOCUMENT_TTL
+        :return: If lock was successfully acquired
+        """
+        return bool(
+            await self._acquire_read_script(
+                self._rw_keys(name), [owner, self._ttl_ms(ttl)]
+            )
+        )
+
+    async def _try_acquire_write(
+        self, name: str, owner: str, ttl: Optional[float], queue: bool
+    ) -> bool:
+        """
+        Make a single attempt at acquiring the reader-writer lock for writing
+        :param name: Name of the lock
+        :param owner: Token identifying this writer
+        :param ttl: Seconds until the lock expires, None for DOCUMENT_TTL
+        :param queue: If the lock is not available, keep new readers out for WRITE_INTENT_TTL unless another writer is already waiting
+        :return: If lock was successfully acquired
+        """
+        args = [owner, self._ttl_ms(ttl), int(queue), self._ttl_ms(WRITE_INTENT_TTL)]
+        return bool(await self._acquire_write_script(self._rw_keys(name), args))
+
+    async def _release_read(self, name: str, owner: str):
+        """
+        Release the reader-writer lock acquired for reading
+        :param name: Name of the lock
+        :param owner: Token the lock was acquired with
+        """
+        await self._client.zrem(self._rw_keys(name)[2], owner)
+
+    async def _release_write(self, name: str, owner: str):
+        """
+        Release the reader-writer lock acquired for writing, or stop waiting for it
+        :param name: Name of the lock
+        :param owner: Token the lock was acquired or waited for with
+        """
+        await self._release_write_script(self._rw_keys(name)[:2], [owner])
+
+    async def _try_acquire_semaphore(
+        self, name: str, owner: str, limit: int, ttl: Optional[float]
+    ) -> bool:
+        """
+        Make a single attempt at acquiring a slot of the semaphore
+        :param name: Name of the semaphore
+        :param owner: Token identifying this holder
+        :param limit: Maximum number of holders at once
+        :param ttl: Seconds until the slot expires, None for DOCUMENT_TTL
+        :return: If a slot was successfully acquired
+        """
+        args = [owner, limit, self._ttl_ms(ttl)]
+        return bool(
+            await self._acquire_semaphore_script([self._semaphore_key(name)], args)
+        )
+
+    async def _release_semaphore(self, name: str, owner: str):
+        """
+        Release the slot of the semaphore
+        :param name: Name of the semaphore
+        :param owner: Token the slot was acquired with
+        """
+        await self._client.zrem(self._semaphore_key(name), owner)
+
+    async def _take_turn(self, name: str, owner: str) -> bool:
+        """
+        Join the queue of fair waiters for the lock unless already in it, and keep the place for QUEUE_TICKET_TTL
+        :param name: Name of the lock
+        :param owner: Token identifying this waiter
+        :return: If this waiter is the first one in line
+        """
+        args = [owner, QUEUE_TICKET_TTL * 1000]
+        return bool(await self._take_turn_script(self._queue_keys(name), args))
+
+    async def _leave_queue(self, name: str, owner: str):
+        """
+        Leave the queue of fair waiters for the lock
+        :param name: Name of the lock
+        :param owner: Token identifying this waiter
+        """
+        await self._leave_queue_script(self._queue_keys(name)[:2], [owner])
+
+    async def _mark_wanted(self, name: str):
+        """
+        Let the holder of a sticky lock know someone else is waiting for it
+        :param name: Name of the lock
+        """
+        await self._mark_wanted_script([self._key(name), self._wanted_key(name)])
+
+    async def _is_wanted(self, name: str, owner: str) -> bool:
+        """
+        Check if someone else is waiting for a sticky lock
+        :param name: Name of the lock
+        :param owner: Token the lock was acquired with
+        :return: If the lock is wanted, or no longer held by the owner
+        """
+        keys = [self._key(name), self._wanted_key(name)]
+        return bool(await self._is_wanted_script(keys, [owner]))
+
+    async def _wait_for_release(
+        self, name: Optional[str], delay: float, remaining: Optional[float]
+    ):
+        """
+        Wait until the lock is released via Shylock or expires
+        :param name: Name of the lock, None if waiting for several
+        :param delay: Delay suggested by the wait strategy, used when waiting for several
+        :param remaining: Seconds left until the acquire times out, None if there is no timeout
+        """
+        if name is None:
+            await sleep(delay)
+            return
+
+        pubsub = self._client.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.subscribe(self._channel(name))
+
+            # Subscribed first, so a release can't slip by unnoticed
+            pttl = await self._client.pttl(self._key(name))
+            if pttl == -2:  # Released already
+                return
+
+            max_wait = PUBSUB_MAX_WAIT if pttl < 0 else pttl / 1000
+            if remaining is not None:
+                max_wait = min(max_wait, remaining)
+
+            deadline = monotonic() + max_wait
+            while True:
+                left = deadline - monotonic()
+                if left <= 0:
+                    return
+
+                message = await pubsub.get_message(timeout=left)
+                if message is not None and message["type"] == "message":
+                    return
+        finally:
+            await pubsub.aclose()
+
+    @staticmethod
+    def _check():
+        if Redis is None:
+            raise ShylockException(
+                "No redis driver available. Cannot use Shylock with AsyncRedis backend without it."
+            )
+
+    def __init__(
+        self,
+        client: Redis,
+        prefix: str = "shylock:",
+        wait: Optional[WaitStrategy] = None,
+        negative_cache: Optional[NegativeCache] = None,
+    ):
+        super().__init__()
+        self._check()
+        self._client: Redis = client
+        self._prefix: str = prefix
+        self._wait: WaitStrategy = FixedWait(POLL_DELAY) if wait is None else wait
+        self._negative_cache: Optional[NegativeCache] = negative_cache
+
+    def _init_scripts(self):
+        """
+        Register the Lua scripts used for atomic operations
+        """
+        self._release_script = self._client.register_script(RELEASE_SCRIPT)
+        self._acquire_many_script = self._client.register_script(ACQUIRE_MANY_SCRIPT)
+        self._release_many_script = self._client.register_script(RELEASE_MANY_SCRIPT)
+        self._renew_script = self._client.register_script(RENEW_SCRIPT)
+        self._acquire_read_script = self._client.register_script(ACQUIRE_READ_SCRIPT)
+        self._acquire_write_script = self._client.register_script(ACQUIRE_WRITE_SCRIPT)
+        self._release_write_script = self._client.register_script(RELEASE_WRITE_SCRIPT)
+        self._acquire_semaphore_script = self._client.register_script(
+            ACQUIRE_SEMAPHORE_SCRIPT
+        )
+        self._take_turn_script = self._client.register_script(TAKE_TURN_SCRIPT)
+        self._leave_queue_script = self._client.register_script(LEAVE_QUEUE_SCRIPT)
+        self._mark_wanted_script = self._client.register_script(MARK_WANTED_SCRIPT)
+        self._is_wanted_script = self._client.register_script(IS_WANTED_SCRIPT)
+
+    def _key(self, name: str) -> str:
+        return f"{self._prefix}lock:{name}"
+
+    def _rw_keys(self, name: str) -> List[str]:
+        # The hash tag keeps the keys in the same slot on Redis Cluster
+        return [
+            f"{self._prefix}rw:{{{name}}}:{part}"
+            for part in ("writer", "intent", "readers")
+        ]
+
+    def _wanted_key(self, name: str) -> str:
+        # Used together with the lock key in the scripts, which can't span hash slots on Redis Cluster
+        return same_slot_key(self._key(name), ":wanted")
+
+    def _semaphore_key(self, name: str) -> str:
+        return f"{self._prefix}semaphore:{name}"
+
+    def _queue_keys(self, name: str) -> List[str]:
+        return [
+            f"{self._prefix}queue:{{{name}}}:{part}"
+            for part in ("order", "expiry", "seq")
+        ]
+
+    def _channel(self, name: str) -> str:
+        return f"{self._prefix}released:{name}"
+
+    @staticmethod
+    def _ttl_ms(ttl: Optional[float]) -> int:
+        return max(1, int((DOCUMENT_TTL if ttl is None else ttl) * 1000))
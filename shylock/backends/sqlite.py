@@ -0,0 +1,395 @@
+from contextlib import contextmanager
+from threading import Lock
+from time import time
+from typing import Dict, Iterator, List, Optional
+
+try:
+    import sqlite3
+except ImportError:
+    sqlite3 = None
+
+from shylock.backends import QUEUE_TICKET_TTL, WRITE_INTENT_TTL, ShylockSyncBackend
+from shylock.exceptions import ShylockException
+from shylock.wait import FixedWait, WaitStrategy
+
+DOCUMENT_TTL = 60 * 5  # 5min seems like a reasonable TTL
+POLL_DELAY = 1 / 16  # Some balance between high polling and high delay
+BUSY_TIMEOUT = 5  # Seconds to wait for another process to finish writing
+
+
+class ShylockSQLiteBackend(ShylockSyncBackend):
+    _errors = (OSError,) if sqlite3 is None else (OSError, sqlite3.Error)
+
+    @staticmethod
+    def create(
+        path: str, table_name: str = "shylock", wait: Optional[WaitStrategy] = None
+    ) -> "ShylockSQLiteBackend":
+        """
+        Create and initialize the backend
+        :param path: Path to the SQLite database file, shared by all the processes using the locks
+        :param table_name: The name of the table reserved for shylock
+        :param wait: Strategy for waiting between attempts, defaults to polling every POLL_DELAY
+        """
+        inst = ShylockSQLiteBackend(path, table_name, wait)
+        inst._init_table()
+        return inst
+
+    def _try_acquire(self, name: str, owner: str, ttl: Optional[float]) -> bool:
+        """
+        Make a single attempt at acquiring the lock
+        :param name: Name of the lock
+        :param owner: Token identifying this holder of the lock
+        :param ttl: Seconds until the lock expires, None for DOCUMENT_TTL
+        :return: If lock was successfully acquired
+        """
+        now = time()
+        with self._lock:
+            cursor = self._conn.execute(
+                self._acquire_query,
+                (name, owner, self._expires_at(now, ttl), now),
+            )
+        if cursor.rowcount == 1:
+            return True
+        self._conflicted(name)
+        return False
+
+    def _try_acquire_many(
+        self, names: List[str], owner: str, ttl: Optional[float]
+    ) -> bool:
+        """
+        Make a single attempt at acquiring all the locks, without leaving any of them held on failure
+        :param names: Names of the locks, sorted
+        :param owner: Token identifying this holder of the locks
+        :param ttl: Seconds until the locks expire, None for DOCUMENT_TTL
+        :return: If the locks were successfully acquired
+        """
+        now = time()
+        expires_at = self._expires_at(now, ttl)
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for name in names:
+                    cursor = self._conn.execute(
+                        self._acquire_query,
+                        (name, owner, expires_at, now),
+                    )
+                    if cursor.rowcount != 1:
+                        self._conn.execute("ROLLBACK")
+                        return False
+                self._conn.execute("COMMIT")
+                return True
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _release(self, name: str, owner: Optional[str]):
+        """
+        Release the lock
+        :param name: Name of the lock
+        :param owner: Token the lock was acquired with, None to release regardless of the holder
+        """
+        self._release_many({name: owner})
+
+    def _release_many(self, owners: Dict[str, Optional[str]]):
+        """
+        Release all the locks
+        :param owners: Names of the locks and the tokens they were acquired with, None to release regardless of the holder
+        """
+        with self._transaction():
+            self._conn.executemany(
+                f"DELETE FROM {self._table} WHERE name = ? AND (? IS NULL OR owner = ?)",  # nosec
+                [(name, owner, owner) for name, owner in owners.items()],
+            )
+
+    def _renew(self, name: str, owner: str, ttl: Optional[float]) -> bool:
+        """
+        Extend the expiration of the lock if it's still held by the owner
+        :param name: Name of the lock
+        :param owner: Token the lock was acquired with
+        :param ttl: Seconds from now until the lock expires, None for DOCUMENT_TTL
+        :return: If the lock was renewed
+        """
+        now = time()
+        with self._lock:
+            cursor = self._conn.execute(
+                f"UPDATE {self._table} SET expires_at = ? "
+                f"WHERE name = ? AND owner = ? AND expires_at > ?",  # nosec
+                (self._expires_at(now, ttl), name, owner, now),
+            )
+            return cursor.rowcount == 1
+
+    def _try_acquire_read(self, name: str, owner: str, ttl: Optional[float]) -> bool:
+        """
+        Make a single attempt at acquiring the reader-writer lock for reading
+        :param name: Name of the lock
+        :param owner: Token identifying this reader
+        :param ttl: Seconds until the lock expires, None for DOCUMENT_TTL
+        :return: If lock was successfully acquired
+        """
+        now = time()
+        with self._transaction():
+            cursor = self._conn.execute(
+                f"SELECT 1 FROM {self._table}_rw WHERE name = ? "  # nosec
+                f"AND (writer_expires_at > ? OR intent_expires_at > ?)",
+                (name, now, now),
+            )
+            if cursor.fetchone() is not None:
+                return False
+
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self._table}_readers (name, owner, expires_at) VALUES (?, ?, ?)",  # nosec
+                (name, owner, self._expires_at(now, ttl)),
+            )
+            return True
+
+    def _try_acquire_write(
+        self, name: str, owner: str, ttl: Optional[float], queue: bool
+    ) -> bool:
+        """
+        Make a single attempt at acquiring the reader-writer lock for writing
+        :param name: Name of the lock
+        :param owner: Token identifying this writer
+        :param ttl: Seconds until the lock expires, None for DOCUMENT_TTL
+        :param queue: If the lock is not available, keep new readers out for WRITE_INTENT_TTL unless another writer is already waiting
+        :return: If lock was successfully acquired
+        """
+        now = time()
+        with self._transaction():
+            cursor = self._conn.execute(
+                f"SELECT intent FROM {self._table}_rw WHERE name = ? AND intent_expires_at > ?",  # nosec
+                (name, now),
+            )
+            intent = cursor.fetchone()
+            if intent is not None and intent[0] != owner:
+                return False
+
+            cursor = self._conn.execute(
+                f"SELECT 1 FROM {self._table}_rw WHERE name = ? AND writer_expires_at > ? "  # nosec
+                f"UNION ALL SELECT 1 FROM {self._table}_readers WHERE name = ? AND expires_at > ?",
+                (name, now, name, now),
+            )
+            if cursor.fetchone() is None:
+                self._conn.execute(
+                    f"INSERT INTO {self._table}_rw (name, writer, writer_expires_at) VALUES (?, ?, ?) "  # nosec
+                    f"ON CONFLICT (name) DO UPDATE SET writer = excluded.writer, "
+                    f"writer_expires_at = excluded.writer_expires_at, intent = NULL, intent_expires_at = NULL",
+                    (name, owner, self._expires_at(now, ttl)),
+                )
+                # Only expired readers are left
+                self._conn.execute(
+                    f"DELETE FROM {self._table}_readers WHERE name = ?",
+                    (name,),  # nosec
+                )
+                return True
+
+            if queue:
+                self._conn.execute(
+                    f"INSERT INTO {self._table}_rw (name, intent, intent_expires_at) VALUES (?, ?, ?) "  # nosec
+                    f"ON CONFLICT (name) DO UPDATE SET intent = excluded.intent, "
+                    f"intent_expires_at = excluded.intent_expires_at",
+                    (name, owner, now + WRITE_INTENT_TTL),
+                )
+            return False
+
+    def _release_read(self, name: str, owner: str):
+        """
+        Release the reader-writer lock acquired for reading
+        :param name: Name of the lock
+        :param owner: Token the lock was acquired with
+        """
+        with self._lock:
+            self._conn.execute(
+                f"DELETE FROM {self._table}_readers WHERE name = ? AND owner = ?",  # nosec
+                (name, owner),
+            )
+
+    def _release_write(self, name: str, owner: str):
+        """
+        Release the reader-writer lock acquired for writing, or stop waiting for it
+        :param name: Name of the lock
+        :param owner: Token the lock was acquired or waited for with
+        """
+        with self._transaction():
+            self._conn.execute(
+                f"UPDATE {self._table}_rw SET writer = NULL, writer_expires_at = NULL "  # nosec
+                f"WHERE name = ? AND writer = ?",
+                (name, owner),
+            )
+            self._conn.execute(
+                f"UPDATE {self._table}_rw SET intent = NULL, intent_expires_at = NULL "  # nosec
+                f"WHERE name = ? AND intent = ?",
+                (name, owner),
+            )
+
+    def _try_acquire_semaphore(
+        self, name: str, owner: str, limit: int, ttl: Optional[float]
+    ) -> bool:
+        """
+        Make a single attempt at acquiring a slot of the semaphore
+        :param name: Name of the semaphore
+        :param owner: Token identifying this holder
+        :param limit: Maximum number of holders at once
+        :param ttl: Seconds until the slot expires, None for DOCUMENT_TTL
+        :return: If a slot was successfully acquired
+        """
+        now = time()
+        with self._transaction():
+            cursor = self._conn.execute(
+                f"INSERT INTO {self._table}_semaphores (name, owner, expires_at) "  # nosec
+                f"SELECT ?, ?, ? WHERE (SELECT COUNT(*) FROM {self._table}_semaphores "
+                f"WHERE name = ? AND expires_at > ?) < ?",
+                (name, owner, self._expires_at(now, ttl), name, now, limit),
+            )
+            if cursor.rowcount != 1:
+                return False
+
+            # Clean up after the crashed holders
+            self._conn.execute(
+                f"DELETE FROM {self._table}_semaphores WHERE name = ? AND expires_at <= ?",  # nosec
+                (name, now),
+            )
+            return True
+
+    def _release_semaphore(self, name: str, owner: str):
+        """
+        Release the slot of the semaphore
+        :param name: Name of the semaphore
+        :param owner: Token the slot was acquired with
+        """
+        with self._lock:
+            self._conn.execute(
+                f"DELETE FROM {self._table}_semaphores WHERE name = ? AND owner = ?",  # nosec
+                (name, owner),
+            )
+
+    def _take_turn(self, name: str, owner: str) -> bool:
+        """
+        Join the queue of fair waiters for the lock unless already in it, and keep the place for QUEUE_TICKET_TTL
+        :param name: Name of the lock
+        :param owner: Token identifying this waiter
+        :return: If this waiter is the first one in line
+        """
+        now = time()
+        with self._transaction():
+            # Drop the waiters that have given up without leaving the queue
+            self._conn.execute(
+                f"DELETE FROM {self._table}_queue WHERE name = ? AND expires_at <= ?",  # nosec
+                (name, now),
+            )
+            self._conn.execute(
+                f"INSERT INTO {self._table}_queue (name, owner, expires_at) VALUES (?, ?, ?) "  # nosec
+                f"ON CONFLICT (name, owner) DO UPDATE SET expires_at = excluded.expires_at",
+                (name, owner, now + QUEUE_TICKET_TTL),
+            )
+            first = self._conn.execute(
+                f"SELECT owner FROM {self._table}_queue WHERE name = ? ORDER BY seq LIMIT 1",  # nosec
+                (name,),
+            ).fetchone()
+            return first[0] == owner
+
+    def _leave_queue(self, name: str, owner: str):
+        """
+        Leave the queue of fair waiters for the lock
+        :param name: Name of the lock
+        :param owner: Token identifying this waiter
+        """
+        with self._lock:
+            self._conn.execute(
+                f"DELETE FROM {self._table}_queue WHERE name = ? AND owner = ?",  # nosec
+                (name, owner),
+            )
+
+    @staticmethod
+    def _check():
+        if sqlite3 is None:
+            raise ShylockException(
+                "No sqlite3 module available. Cannot use Shylock with SQLite backend without it."
+            )
+
+    def __init__(
+        self,
+        path: str,
+        table_name: str = "shylock",
+        wait: Optional[WaitStrategy] = None,
+    ):
+        super().__init__()
+        self._check()
+        # Autocommit, transactions are started explicitly where needed
+        self._conn: sqlite3.Connection = sqlite3.connect(
+            path, timeout=BUSY_TIMEOUT, isolation_level=None, check_same_thread=False
+        )
+        # The connection is shared by the threads using this backend
+        self._lock = Lock()
+        self._table: str = table_name
+        # Inserts the lock, or takes it over if it has expired
+        self._acquire_query: str = (
+            f"INSERT INTO {table_name} (name, owner, expires_at) VALUES (?, ?, ?) "  # nosec
+            f"ON CONFLICT (name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+            f"WHERE {table_name}.expires_at <= ?"
+        )
+        self._wait: WaitStrategy = FixedWait(POLL_DELAY) if wait is None else wait
+
+    def _init_table(self):
+        """
+        Ensure the table is set up, and the database uses WAL so readers don't block the writers
+        """
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self._table} ("  # nosec
+                f"name TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self._table}_rw ("  # nosec
+                f"name TEXT PRIMARY KEY, writer TEXT, writer_expires_at REAL, intent TEXT, intent_expires_at REAL)"
+            )
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self._table}_readers ("  # nosec
+                f"name TEXT NOT NULL, owner TEXT NOT NULL, expires_at REAL NOT NULL, PRIMARY KEY (name, owner))"
+            )
+
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self._table}_semaphores ("  # nosec
+                f"name TEXT NOT NULL, owner TEXT NOT NULL, expires_at REAL NOT NULL, PRIMARY KEY (name, owner))"
+            )
+
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self._table}_queue ("  # nosec
+                f"seq INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL, owner TEXT NOT NULL, "
+                f"expires_at REAL NOT NULL, UNIQUE (name, owner))"
+            )
+
+            # Expired locks are taken over when acquired, this cleans up the ones nobody uses anymore
+            now = time()
+            for table in (
+                self._table,
+                f"{self._table}_readers",
+                f"{self._table}_semaphores",
+                f"{self._table}_queue",
+            ):
+                self._conn.execute(
+                    f"DELETE FROM {table} WHERE expires_at <= ?", (now,)  # nosec
+                )
+            self._conn.execute(
+                f"DELETE FROM {self._table}_rw WHERE IFNULL(writer_expires_at, 0) <= ? "  # nosec
+                f"AND IFNULL(intent_expires_at, 0) <= ?",
+                (now, now),
+            )
+
+    @contextmanager
+    def _transaction(self) -> Iterator[None]:
+        """
+        Run the queries in the context in a single write transaction
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    @staticmethod
+    def _expires_at(now: float, ttl: Optional[float]) -> float:
+        return now + (DOCUMENT_TTL if ttl is None else ttl)
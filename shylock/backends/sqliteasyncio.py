@@ -0,0 +1,175 @@
+import asyncio
+from typing import Dict, List, Optional
+
+from shylock.backends import ShylockAsyncBackend
+from shylock.backends.sqlite import POLL_DELAY, ShylockSQLiteBackend
+from shylock.wait import FixedWait, WaitStrategy
+
+
+class ShylockAsyncSQLiteBackend(ShylockAsyncBackend):
+    """
+    Runs the queries of a ShylockSQLiteBackend in the event loop's default executor, so they don't block the loop
+    """
+
+    _errors = ShylockSQLiteBackend._errors
+
+    @staticmethod
+    async def create(
+        path: str, table_name: str = "shylock", wait: Optional[WaitStrategy] = None
+    ) -> "ShylockAsyncSQLiteBackend":
+        """
+        Create and initialize the backend
+        :param path: Path to the SQLite database file, shared by all the processes using the locks
+        :param table_name: The name of the table reserved for shylock
+        :param wait: Strategy for waiting between attempts, defaults to polling every POLL_DELAY
+        """
+        sync = await asyncio.get_running_loop().run_in_executor(
+            None, ShylockSQLiteBackend.create, path, table_name
+        )
+        return ShylockAsyncSQLiteBackend(sync, wait)
+
+    async def _try_acquire(self, name: str, owner: str, ttl: Optional[float]) -> bool:
+        """
+        Make a single attempt at acquiring the lock
+        :param name: Name of the lock
+        :param owner: Token identifying this holder of the lock
+        :param ttl: Seconds until the lock expires, None for DOCUMENT_TTL
+        :return: If lock was successfully acquired
+        """
+        return await self._run(self._sync._try_acquire, name, owner, ttl)
+
+    async def _try_acquire_many(
+        self, names: List[str], owner: str, ttl: Optional[float]
+    ) -> bool:
+        """
+        Make a single attempt at acquiring all the locks, without leaving any of them held on failure
+        :param names: Names of the locks, sorted
+        :param owner: Token identifying this holder of the locks
+        :param ttl: Seconds until the locks expire, None for DOCUMENT_TTL
+        :return: If the locks were successfully acquired
+        """
+        return await self._run(self._sync._try_acquire_many, names, owner, ttl)
+
+    async def _release(self, name: str, owner: Optional[str]):
+        """
+        Release the lock
+        :param name: Name of the lock
+        :param owner: Token the lock was acquired with, None to release regardless of the holder
+        """
+        await self._run(self._sync._release, name, owner)
+
+    async def _release_many(self, owners: Dict[str, Optional[str]]):
+        """
+        Release all the locks
+        :param owners: Names of the locks and the tokens they were acquired with, None to release regardless of the holder
+        """
+        await self._run(self._sync._release_many, owners)
+
+    async def _renew(self, name: str, owner: str, ttl: Optional[float]) -> bool:
+        """
+        Extend the expiration of the lock if it's still held by the owner
+        :param name: Name of the lock
+        :param owner: Token the lock was acquired with
+        :param ttl: Seconds from now until the lock expires, None for DOCUMENT_TTL
+        :return: If the lock was renewed
+        """
+        return await self._run(self._sync._renew, name, owner, ttl)
+
+    async def _try_acquire_read(
+        self, name: str, owner: str, ttl: Optional[float]
+    ) -> bool:
+        """
+        Make a single attempt at acquiring the reader-writer lock for reading
+        :param name: Name of the lock
+        :param owner: Token identifying this reader
+        :param ttl: Seconds until the lock expires, None for DOCUMENT_TTL
+        :return: If lock was successfully acquired
+        """
+        return await self._run(self._sync._try_acquire_read, name, owner, ttl)
+
+    async def _try_acquire_write(
+        self, name: str, owner: str, ttl: Optional[float], queue: bool
+    ) -> bool:
+        """
+        Make a single attempt at acquiring the reader-writer lock for writing
+        :param name: Name of the lock
+        :param owner: Token identifying this writer
+        :param ttl: Seconds until the lock expires, None for DOCUMENT_TTL
+        :param queue: If the lock is not available, keep new readers out for WRITE_INTENT_TTL unless another writer is already waiting
+        :return: If lock was successfully acquired
+        """
+        return await self._run(self._sync._try_acquire_write, name, owner, ttl, queue)
+
+    async def _release_read(self, name: str, owner: str):
+        """
+        Release the reader-writer lock acquired for reading
+        :param name: Name of the lock
+        :param owner: Token the lock was acquired with
+        """
+        await self._run(self._sync._release_read, name, owner)
+
+    async def _release_write(self, name: str, owner: str):
+        """
+        Release the reader-writer lock acquired for writing, or stop waiting for it
+        :param name: Name of the lock
+        :param owner: Token the lock was acquired or waited for with
+        """
+        await self._run(self._sync._release_write, name, owner)
+
+    async def _try_acquire_semaphore(
+        self, name: str, owner: str, limit: int, ttl: Optional[float]
+    ) -> bool:
+        """
+        Make a single attempt at acquiring a slot of the semaphore
+        :param name: Name of the semaphore
+        :param owner: Token identifying this holder
+        :param limit: Maximum number of holders at once
+        :param ttl: Seconds until the slot expires, None for DOCUMENT_TTL
+        :return: If a slot was successfully acquired
+        """
+        return await self._run(
+            self._sync._try_acquire_semaphore, name, owner, limit, ttl
+        )
+
+    async def _release_semaphore(self, name: str, owner: str):
+        """
+        Release the slot of the semaphore
+        :param name: Name of the semaphore
+        :param owner: Token the slot was acquired with
+        """
+        await self._run(self._sync._release_semaphore, name, owner)
+
+    async def _take_turn(self, name: str, owner: str) -> bool:
+        """
+        Join the queue of fair waiters for the lock unless already in it, and keep the place for QUEUE_TICKET_TTL
+        :param name: Name of the lock
+        :param owner: Token identifying this waiter
+        :return: If this waiter is the first one in line
+        """
+        return await self._run(self._sync._take_turn, name, owner)
+
+    async def _leave_queue(self, name: str, owner: str):
+        """
+        Leave the queue of fair waiters for the lock
+        :param name: Name of the lock
+        :param owner: Token identifying this waiter
+        """
+        await self._run(self._sync._leave_queue, name, owner)
+
+    @staticmethod
+    def _check():
+        ShylockSQLiteBackend._check()
+
+    def __init__(
+        self,
+        sync: ShylockSQLiteBackend,
+        wait: Optional[WaitStrategy] = None,
+    ):
+        super().__init__()
+        self._check()
+        self._sync: ShylockSQLiteBackend = sync
+        self._wait: WaitStrategy = FixedWait(POLL_DELAY) if wait is None else wait
+
+    @staticmethod
+    async def _run(func, *args):
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
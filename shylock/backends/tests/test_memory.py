@@ -0,0 +1,144 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from shylock import (
+    AsyncLock,
+    AsyncMultiLock,
+    AsyncRWLock,
+    Lock,
+    MultiLock,
+    RWLock,
+    Semaphore,
+)
+from shylock.backends.memory import ShylockMemoryBackend
+from shylock.backends.memoryasyncio import ShylockAsyncMemoryBackend
+
+
+def test_release_wakes_waiter():
+    backend = ShylockMemoryBackend.create()
+    lock = Lock("lock", backend)
+    lock.acquire()
+    assert not Lock("lock", backend).acquire(block=False)
+
+    threading.Timer(0.1, lock.release).start()
+    start = time.monotonic()
+    assert Lock("lock", backend).acquire(timeout=1)
+    assert time.monotonic() - start < 0.5
+
+
+def test_multi_lock():
+    backend = ShylockMemoryBackend.create()
+    with Lock("b", backend):
+        assert not MultiLock(["a", "b"], backend).acquire(block=False)
+        assert Lock("a", backend).acquire(block=False)
+
+
+def test_expired_lock_is_taken_over():
+    backend = ShylockMemoryBackend.create()
+    assert backend.acquire("lock", ttl=0.1)
+    assert not backend.acquire("lock", block=False)
+    assert ShylockMemoryBackend.create().renew("lock") is False
+
+    start = time.monotonic()
+    assert backend.acquire("lock", timeout=1)
+    assert time.monotonic() - start < 0.5
+
+
+async def test_async_release_wakes_waiter():
+    backend = await ShylockAsyncMemoryBackend.create()
+    lock = AsyncLock("lock", backend)
+    await lock.acquire()
+
+    async def release():
+        await asyncio.sleep(0.1)
+        await lock.release()
+
+    asyncio.ensure_future(release())
+    start = time.monotonic()
+    async with AsyncMultiLock(["lock", "other"], backend):
+        assert time.monotonic() - start < 0.5
+        assert not await AsyncLock("other", backend).acquire(timeout=0.1)
+
+
+def test_rw_lock_prefers_writers():
+    backend = ShylockMemoryBackend.create()
+    first, second = RWLock("lock", backend), RWLock("lock", backend)
+    assert first.acquire_read(block=False)
+    assert second.acquire_read(block=False)
+
+    writer = RWLock("lock", backend)
+    assert not writer.acquire_write(block=False)
+    # A waiting writer keeps new readers out
+    thread = threading.Thread(target=writer.acquire_write)
+    thread.start()
+    time.sleep(0.1)
+    assert not RWLock("lock", backend).acquire_read(block=False)
+
+    first.release()
+    second.release()
+    thread.join(1)
+    assert writer.locked()
+    writer.release()
+    assert RWLock("lock", backend).acquire_read(block=False)
+
+
+async def test_async_rw_lock_timeout_lets_readers_in():
+    backend = await ShylockAsyncMemoryBackend.create()
+    reader = AsyncRWLock("lock", backend)
+    async with reader.read():
+        assert not await AsyncRWLock("lock", backend).acquire_write(timeout=0.1)
+        assert await AsyncRWLock("lock", backend).acquire_read(block=False)
+
+
+def test_semaphore_slots_expire():
+    backend = ShylockMemoryBackend.create()
+    assert Semaphore("api", 2, backend).acquire(block=False)
+    assert backend.acquire_semaphore("api", "crashed", 2, ttl=0.1)
+    assert not Semaphore("api", 2, backend).acquire(block=False)
+
+    # The crashed holder's slot frees up
+    assert Semaphore("api", 2, backend).acquire(timeout=1)
+
+
+async def test_async_fair_lock_serves_waiters_in_order():
+    backend = await ShylockAsyncMemoryBackend.create()
+    holder = AsyncLock("lock", backend)
+    await holder.acquire()
+    order = []
+
+    async def wait(i: int):
+        async with AsyncLock("lock", backend, fair=True):
+            order.append(i)
+            await asyncio.sleep(0.01)
+
+    waiters = []
+    for i in range(5):
+        waiters.append(asyncio.ensure_future(wait(i)))
+        await asyncio.sleep(0.01)
+
+    # The queue is respected even when the lock is free
+    await holder.release()
+    assert not await AsyncLock("lock", backend, fair=True).acquire(block=False)
+
+    await asyncio.wait_for(asyncio.gather(*waiters), 2)
+    assert order == list(range(5))
+
+
+async def test_async_fair_lock_is_released_when_cancelled_leaving_queue():
+    backend = await ShylockAsyncMemoryBackend.create()
+    leave_queue = backend._leave_queue
+
+    async def slow_leave_queue(name: str, owner: str):
+        await asyncio.sleep(0.1)
+        await leave_queue(name, owner)
+
+    backend._leave_queue = slow_leave_queue
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(AsyncLock("lock", backend, fair=True).acquire(), 0.05)
+
+    await asyncio.sleep(0.1)
+    backend._leave_queue = leave_queue
+    assert await AsyncLock("lock", backend).acquire(block=False)
@@ -0,0 +1,64 @@
+from time import sleep
+
+from shylock import Lock, NegativeCache, ShylockMemoryBackend
+
+
+class CountingBackend(ShylockMemoryBackend):
+    attempts = 0
+
+    def _try_acquire(self, *args) -> bool:
+        self.attempts += 1
+        return super()._try_acquire(*args)
+
+    def acquire_elsewhere(self, name: str, ttl=None):
+        # As another process would, without this backend knowing or counting it
+        ShylockMemoryBackend._try_acquire(self, name, "other", ttl)
+
+    def release_elsewhere(self, name: str):
+        ShylockMemoryBackend._release(self, name, "other")
+
+
+def test_negative_cache_skips_recently_held_locks():
+    backend = CountingBackend(negative_cache=NegativeCache(window=0.1, size=1))
+
+    backend.acquire_elsewhere("job-1")
+    assert not Lock("job-1", backend).acquire(block=False)
+    backend.release_elsewhere("job-1")
+    # Still remembered as held, without another attempt
+    assert not Lock("job-1", backend).acquire(block=False)
+    assert backend.attempts == 1
+
+    sleep(0.1)
+    with Lock("job-1", backend):
+        assert backend.attempts == 2
+
+    # Only size locks are remembered
+    backend.acquire_elsewhere("job-2")
+    backend.acquire_elsewhere("job-3")
+    backend.attempts = 0
+    assert not backend.acquire("job-2", block=False)
+    assert not backend.acquire("job-3", block=False)
+    assert not backend.acquire("job-2", block=False)
+    assert backend.attempts == 3
+
+
+def test_negative_cache_stops_at_holder_expiry():
+    backend = CountingBackend(negative_cache=NegativeCache(window=10))
+
+    backend.acquire_elsewhere("job-1", ttl=0.05)
+    assert not backend.acquire("job-1", block=False)
+    assert not backend.acquire("job-1", block=False)
+    assert backend.attempts == 1
+
+    sleep(0.05)
+    assert backend.acquire("job-1", block=False)
+    assert backend.attempts == 2
+
+
+def test_negative_cache_is_not_filled_by_blocking_acquires():
+    backend = CountingBackend(negative_cache=NegativeCache(window=10))
+
+    backend.acquire_elsewhere("job-1")
+    assert not backend.acquire("job-1", timeout=0.01)
+    backend.release_elsewhere("job-1")
+    assert backend.acquire("job-1", block=False)
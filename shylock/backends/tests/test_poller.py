@@ -0,0 +1,43 @@
+import threading
+from time import monotonic, sleep
+
+from shylock.backends.poller import ReleasePoller
+
+
+def test_poller_batches_waiters():
+    held = {"a", "b"}
+    queries = []
+
+    def find_held(names):
+        queries.append(sorted(names))
+        return [name for name in names if name in held]
+
+    poller = ReleasePoller(find_held, 0.01)
+    woken = []
+
+    def waiter(name):
+        start = monotonic()
+        poller.wait(name, 5)
+        woken.append((name, monotonic() - start))
+
+    threads = [threading.Thread(target=waiter, args=(n,)) for n in ("a", "a", "b")]
+    for thread in threads:
+        thread.start()
+    deadline = monotonic() + 1
+    while ["a", "b"] not in queries and monotonic() < deadline:
+        sleep(0.001)
+    assert ["a", "b"] in queries
+
+    held.discard("a")
+    threads[0].join(1)
+    threads[1].join(1)
+    assert sorted(name for name, _ in woken) == ["a", "a"]
+
+    held.discard("b")
+    threads[2].join(1)
+    assert all(elapsed < 1 for _, elapsed in woken)
+    # The thread stops once nobody is waiting
+    deadline = monotonic() + 1
+    while poller._thread is not None and monotonic() < deadline:
+        sleep(0.001)
+    assert poller._thread is None
@@ -0,0 +1,24 @@
+from shylock.backends.ratelimit import AdaptiveRateLimiter
+
+
+def test_rate_limiter_backs_off_and_prioritizes_releases():
+    limiter = AdaptiveRateLimiter(increase=0, burst=1)
+    for _ in range(100):
+        assert limiter.reserve() == 0
+    assert limiter.rate is None
+
+    limiter.throttled(0.2)
+    assert limiter.rate == 50
+
+    # Everyone waits out the throttling, then the requests are spaced out
+    first = limiter.reserve()
+    assert 0.15 < first <= 0.2
+    second = limiter.reserve()
+    assert abs(second - first - 1 / 50) < 0.005
+
+    # Releases skip the line
+    assert limiter.reserve(priority=True) <= first
+
+    # Throttling right after a decrease is the same event
+    limiter.throttled(0.2)
+    assert limiter.rate == 50
@@ -0,0 +1,71 @@
+import shutil
+import socket
+import subprocess
+import threading
+import time
+
+import pytest
+
+redis = pytest.importorskip("redis")
+
+from shylock import Lock, MultiLock
+from shylock.backends.redis import ShylockRedisBackend
+
+pytestmark = pytest.mark.skipif(
+    shutil.which("redis-server") is None, reason="redis-server not available"
+)
+
+
+@pytest.fixture(scope="module")
+def client():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+
+    proc = subprocess.Popen(
+        ["redis-server", "--port", str(port), "--save", "", "--appendonly", "no"],
+        stdout=subprocess.DEVNULL,
+    )
+    client = redis.Redis(port=port)
+    try:
+        for _ in range(50):
+            try:
+                client.ping()
+                break
+            except redis.ConnectionError:
+                time.sleep(0.1)
+        yield client
+    finally:
+        client.close()
+        proc.terminate()
+        proc.wait()
+
+
+def test_release_wakes_waiter(client):
+    backend = ShylockRedisBackend.create(client, prefix="test-wake:")
+    lock = Lock("lock", backend)
+    assert lock.acquire()
+    assert not Lock("lock", backend).acquire(block=False)
+
+    threading.Timer(0.2, lock.release).start()
+    start = time.monotonic()
+    assert Lock("lock", backend).acquire(timeout=2)
+    assert time.monotonic() - start < 1
+
+
+def test_release_checks_owner(client):
+    backend = ShylockRedisBackend.create(client, prefix="test-owner:")
+    assert backend.acquire("lock", ttl=0.1)
+    time.sleep(0.2)
+    assert backend.acquire("lock", block=False)
+
+    # The first holder's lock expired, its release must not free the new holder's
+    backend._release("lock", "not-the-owner")
+    assert client.exists("test-owner:lock:lock")
+
+
+def test_multi_lock(client):
+    backend = ShylockRedisBackend.create(client, prefix="test-multi:")
+    assert Lock("b", backend).acquire()
+    assert not MultiLock(["a", "b"], backend).acquire(block=False)
+    assert not client.exists("test-multi:lock:a")
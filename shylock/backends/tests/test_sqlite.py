@@ -0,0 +1,42 @@
+import time
+
+from shylock import AsyncLock, Lock, MultiLock
+from shylock.backends.sqlite import ShylockSQLiteBackend
+from shylock.backends.sqliteasyncio import ShylockAsyncSQLiteBackend
+
+
+def test_lock_is_shared_between_connections(tmp_path):
+    path = str(tmp_path / "locks.db")
+    first = ShylockSQLiteBackend.create(path)
+    second = ShylockSQLiteBackend.create(path)
+
+    with Lock("lock", first):
+        assert not Lock("lock", second).acquire(block=False)
+        assert not MultiLock(["lock", "other"], second).acquire(block=False)
+        assert Lock("other", second).acquire(block=False)
+
+
+def test_expired_lock_is_taken_over(tmp_path):
+    path = str(tmp_path / "locks.db")
+    first = ShylockSQLiteBackend.create(path)
+    second = ShylockSQLiteBackend.create(path)
+
+    assert first.acquire("lock", ttl=0.1)
+    assert not first.renew("other")
+    time.sleep(0.2)
+    assert not first.renew("lock")
+    assert second.acquire("lock", block=False)
+
+    # The expired holder's release must not free the new holder's lock
+    first.release("lock")
+    assert not first.acquire("lock", block=False)
+
+
+async def test_async_backend(tmp_path):
+    path = str(tmp_path / "locks.db")
+    backend = await ShylockAsyncSQLiteBackend.create(path)
+
+    lock = AsyncLock("lock", backend)
+    async with lock:
+        assert not await AsyncLock("lock", backend).acquire(timeout=0.1)
+    assert await AsyncLock("lock", backend).acquire(block=False)
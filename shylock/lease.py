@@ -0,0 +1,54 @@
+import threading
+from typing import Callable, Optional
+
+from shylock.backends import ShylockSyncBackend
+
+
+class LeaseKeeper(threading.Thread):
+    """
+    Background thread renewing the lease of a held lock until stopped
+    """
+
+    def __init__(
+        self,
+        backend: ShylockSyncBackend,
+        name: str,
+        lease: float,
+        on_lost: Callable[[Optional[Exception]], None],
+    ):
+        """
+        :param backend: The backend the lock was acquired with
+        :param name: Name of the lock
+        :param lease: Seconds the lock is held for after each renewal
+        :param on_lost: Called with the error, if any, when the lease could not be renewed
+        """
+        super().__init__(name=f"shylock-lease-{name}", daemon=True)
+        self._backend = backend
+        self._lock_name = name
+        self._lease = lease
+        self._on_lost = on_lost
+        self._stopped = threading.Event()
+
+    def run(self):
+        # Renew often enough to survive a couple of slow or failed renewals
+        interval = self._lease / 3
+        while not self._stopped.wait(interval):
+            error = None
+            try:
+                renewed = self._backend.renew(self._lock_name, self._lease)
+            except Exception as e:
+                renewed = False
+                error = e
+
+            if not renewed:
+                if not self._stopped.is_set():
+                    self._on_lost(error)
+                return
+
+    def stop(self):
+        """
+        Stop renewing the lease, waits for any renewal in progress to finish
+        """
+        self._stopped.set()
+        if threading.current_thread() is not self:
+            self.join()
@@ -1,6 +1,72 @@
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor
+from concurrent.futures import wait as wait_futures
+from contextlib import contextmanager
+from functools import partial
+from typing import (
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Union,
+)
+from uuid import uuid4
+from weakref import WeakKeyDictionary
+
 import shylock.manager
 from shylock.backends import ShylockSyncBackend
 from shylock.exceptions import ShylockException
+from shylock.lease import LeaseKeeper
+from shylock.quorum import DEFAULT_QUORUM_TTL, majority, valid_until
+from shylock.stripes import DEFAULT_STRIPES, stripe_names
+from shylock.wait import DecorrelatedJitterWait, WaitStrategy
+
+logger = logging.getLogger(__name__)
+
+# Reentrant locks held via each backend, by name: the holding thread and how many times it has acquired the lock
+_HOLDS: "WeakKeyDictionary[ShylockSyncBackend, Dict[str, List[int]]]" = (
+    WeakKeyDictionary()
+)
+_HOLDS_LOCK = threading.Lock()
+# Ask the backends of the quorum locks in parallel, with threads of their own so a hung backend doesn't hold up the rest
+_QUORUM_EXECUTORS: "WeakKeyDictionary[ShylockSyncBackend, ThreadPoolExecutor]" = (
+    WeakKeyDictionary()
+)
+# Attempts of any quorum lock still running on each backend after they were given up on
+_QUORUM_STRAGGLERS: "WeakKeyDictionary[ShylockSyncBackend, int]" = WeakKeyDictionary()
+_QUORUM_LOCK = threading.Lock()
+
+
+def _quorum_executor(backend: ShylockSyncBackend) -> ThreadPoolExecutor:
+    with _QUORUM_LOCK:
+        executor = _QUORUM_EXECUTORS.get(backend)
+        if executor is None:
+            # Only starts threads once needed
+            executor = _QUORUM_EXECUTORS[backend] = ThreadPoolExecutor(
+                thread_name_prefix="shylock-quorum"
+            )
+        return executor
+
+
+def _get_backend(backend: Optional[ShylockSyncBackend]) -> ShylockSyncBackend:
+    backend = shylock.manager.BACKEND if backend is None else backend
+    if backend is None:
+        raise ShylockException(
+            f"No Shylock backend set, configure one with shylock.configure, "
+            f"or pass instace of shylock.ShylockBackend as argument to Lock()"
+        )
+
+    if not issubclass(backend.__class__, ShylockSyncBackend):
+        raise ShylockException(
+            "shylock.Lock requires a ShylockSyncBackend, did you mean to use shylock.aio.Lock?"
+        )
+
+    return backend
 
 
 class Lock:
@@ -17,20 +83,40 @@ class Lock:
     >>> print("Released")
     """
 
-    def __init__(self, name: str, backend: ShylockSyncBackend = None):
+    def __init__(
+        self,
+        name: str,
+        backend: ShylockSyncBackend = None,
+        wait: Optional[WaitStrategy] = None,
+        lease: Optional[float] = None,
+        on_lease_lost: Optional[Callable[["Lock", Optional[Exception]], None]] = None,
+        fair: bool = False,
+        reentrant: bool = False,
+        sticky: Optional[float] = None,
+    ):
+        """
+        :param name: Name of the lock
+        :param backend: Backend to use instead of the configured default
+        :param wait: Strategy for waiting between attempts instead of the backend's default
+        :param lease: Hold the lock for this many seconds at a time and keep renewing it in a background thread until released
+        :param on_lease_lost: Called with the lock and the error, if any, when renewing the lease fails
+        :param fair: Queue up with the other fair waiters in the backend, and get the lock in the order of arrival
+        :param reentrant: Let the thread holding the lock acquire it again via any reentrant Lock, only the outermost acquire and release reach the backend
+        :param sticky: Keep the lock held in the backend for this many seconds after releasing it, so acquiring it again in this process doesn't reach the backend unless another process is waiting for it
+        """
         self.name = name
-        self._backend = shylock.manager.BACKEND if backend is None else backend
-        if not issubclass(self._backend.__class__, ShylockSyncBackend):
-            raise ShylockException(
-                "shylock.Lock requires a ShylockSyncBackend, did you mean to use shylock.aio.Lock?"
-            )
-
+        self.lease_lost = False
+        self._wait = wait
+        self._lease = lease
+        self._on_lease_lost = on_lease_lost
+        self._fair = fair
+        self._reentrant = reentrant
+        self._sticky = sticky
+        self._lease_keeper: Optional[LeaseKeeper] = None
+        self._backend = _get_backend(backend)
         self._locked = False
-        if self._backend is None:
-            raise ShylockException(
-                f"No Shylock backend set, configure one with shylock.configure, "
-                f"or pass instace of shylock.ShylockBackend as argument to Lock()"
-            )
+        # Times the lock is currently acquired via this instance, when reentrant
+        self._depth = 0
 
     def __enter__(self):
         self.acquire()
@@ -38,16 +124,45 @@ class Lock:
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.release()
 
-    def acquire(self, block: bool = True) -> bool:
+    def acquire(self, block: bool = True, timeout: Optional[float] = None) -> bool:
         """
         Try to acquire the lock - optionally block until available
         :param block: Wait until lock is available
-        :return: If lock was successfully acquired - always True if blocking
+        :param timeout: Maximum seconds to wait when blocking, None to wait forever
+        :return: If lock was successfully acquired - always True if blocking without a timeout
         """
-        res = self._backend.acquire(self.name, block)
+        if self._reentrant:
+            with _HOLDS_LOCK:
+                hold = _HOLDS.get(self._backend, {}).get(self.name)
+                if hold is not None and hold[0] == threading.get_ident():
+                    hold[1] += 1
+                    self._depth += 1
+                    self._locked = True
+                    return True
+
+        res = self._backend.acquire(
+            self.name,
+            block,
+            wait=self._wait,
+            ttl=self._lease,
+            timeout=timeout,
+            fair=self._fair,
+            sticky=self._sticky,
+        )
 
         if res:
             self._locked = True
+            self.lease_lost = False
+            if self._reentrant:
+                self._depth += 1
+                with _HOLDS_LOCK:
+                    holds = _HOLDS.setdefault(self._backend, {})
+                    holds[self.name] = [threading.get_ident(), 1]
+            if self._lease is not None:
+                self._lease_keeper = LeaseKeeper(
+                    self._backend, self.name, self._lease, self._lease_lost
+                )
+                self._lease_keeper.start()
 
         return res
 
@@ -66,5 +181,530 @@ class Lock:
             raise ShylockException(
                 f"Trying to unlock {self.name} without locking it first."
             )
-        self._backend.release(self.name)
+        if self._reentrant:
+            self._depth -= 1
+            self._locked = self._depth > 0
+            with _HOLDS_LOCK:
+                holds = _HOLDS[self._backend]
+                holds[self.name][1] -= 1
+                if holds[self.name][1] > 0:
+                    # Still held by an outer acquire
+                    return
+                del holds[self.name]
+
+        if self._lease_keeper is not None:
+            self._lease_keeper.stop()
+            self._lease_keeper = None
+        self._backend.release(self.name, sticky=self._sticky is not None)
+        self._locked = False
+
+    def _lease_lost(self, error: Optional[Exception]):
+        self.lease_lost = True
+        if self._on_lease_lost is not None:
+            self._on_lease_lost(self, error)
+
+
+class MultiLock:
+    """
+    Acquires several locks at once. They're always taken in the same order, so overlapping sets of locks can't deadlock.
+
+    >>> with MultiLock(["account-1", "account-2"]):
+    >>>     print("Locked both")
+    """
+
+    def __init__(
+        self,
+        names: Iterable[str],
+        backend: ShylockSyncBackend = None,
+        wait: Optional[WaitStrategy] = None,
+    ):
+        """
+        :param names: Names of the locks
+        :param backend: Backend to use instead of the configured default
+        :param wait: Strategy for waiting between attempts instead of the backend's default
+        """
+        self.names = sorted(set(names))
+        self._wait = wait
+        self._backend = _get_backend(backend)
+        self._locked = False
+
+    def __enter__(self):
+        self.acquire()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+    def acquire(self, block: bool = True, timeout: Optional[float] = None) -> bool:
+        """
+        Try to acquire all the locks - optionally block until all are available
+        :param block: Wait until the locks are available
+        :param timeout: Maximum seconds to wait when blocking, None to wait forever
+        :return: If the locks were successfully acquired - always True if blocking without a timeout
+        """
+        res = self._backend.acquire_many(
+            self.names, block, wait=self._wait, timeout=timeout
+        )
+
+        if res:
+            self._locked = True
+
+        return res
+
+    def locked(self) -> bool:
+        """
+        Does the lock believe it's currently locked - does not check actual backend
+        :return: Locked state
+        """
+        return self._locked
+
+    def release(self):
+        """
+        Release all the locks
+        """
+        if not self._locked:
+            raise ShylockException(
+                f"Trying to unlock {', '.join(self.names)} without locking them first."
+            )
+        self._backend.release_many(self.names)
         self._locked = False
+
+
+class StripedLock(MultiLock):
+    """
+    Maps any number of keys onto a fixed set of locks, so there are at most stripes lock documents for the name.
+    Keys sharing a stripe block each other. Several keys are locked at once, like with MultiLock.
+
+    >>> with StripedLock("user", f"user-{user_id}"):
+    >>>     print("Locked the stripe of the user")
+    """
+
+    def __init__(
+        self,
+        name: str,
+        keys: Union[str, Iterable[str]],
+        stripes: int = DEFAULT_STRIPES,
+        backend: ShylockSyncBackend = None,
+        wait: Optional[WaitStrategy] = None,
+    ):
+        """
+        :param name: Name of the striped lock, should be used with the same number of stripes everywhere
+        :param keys: Key or keys of the entities to lock
+        :param stripes: Number of stripes, more means less false contention but more lock documents
+        :param backend: Backend to use instead of the configured default
+        :param wait: Strategy for waiting between attempts instead of the backend's default
+        """
+        if stripes < 1:
+            raise ShylockException(f"Striped lock {name} needs at least 1 stripe.")
+
+        keys = [keys] if isinstance(keys, str) else keys
+        super().__init__(stripe_names(name, keys, stripes), backend, wait)
+        if not self.names:
+            raise ShylockException(f"Striped lock {name} needs at least 1 key.")
+
+        self.name = name
+        self.stripes = stripes
+
+    def acquire(self, block: bool = True, timeout: Optional[float] = None) -> bool:
+        """
+        Try to acquire the stripes of the keys - optionally block until all are available
+        :param block: Wait until the locks are available
+        :param timeout: Maximum seconds to wait when blocking, None to wait forever
+        :return: If the locks were successfully acquired - always True if blocking without a timeout
+        """
+        if len(self.names) > 1:
+            return super().acquire(block, timeout)
+
+        # A single lock can be waited for more efficiently than several
+        res = self._backend.acquire(
+            self.names[0], block, wait=self._wait, timeout=timeout
+        )
+
+        if res:
+            self._locked = True
+
+        return res
+
+
+class RWLock:
+    """
+    Reader-writer lock, held either by any number of readers or by a single writer.
+    A writer waiting for the lock keeps new readers out, so writers don't starve.
+
+    >>> lock = RWLock("my-lock")
+    >>> with lock.read():
+    >>>     print("Reading")
+    >>> with lock.write():
+    >>>     print("Writing")
+    """
+
+    def __init__(
+        self,
+        name: str,
+        backend: ShylockSyncBackend = None,
+        wait: Optional[WaitStrategy] = None,
+    ):
+        """
+        :param name: Name of the lock
+        :param backend: Backend to use instead of the configured default
+        :param wait: Strategy for waiting between attempts instead of the backend's default
+        """
+        self.name = name
+        self._wait = wait
+        self._backend = _get_backend(backend)
+        self._owner: Optional[str] = None
+        self._writing = False
+
+    @contextmanager
+    def read(self) -> Iterator[None]:
+        """
+        Hold the lock for reading for the duration of the context
+        """
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release()
+
+    @contextmanager
+    def write(self) -> Iterator[None]:
+        """
+        Hold the lock for writing for the duration of the context
+        """
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def acquire_read(self, block: bool = True, timeout: Optional[float] = None) -> bool:
+        """
+        Try to acquire the lock for reading - optionally block until there are no writers
+        :param block: Wait until lock is available
+        :param timeout: Maximum seconds to wait when blocking, None to wait forever
+        :return: If lock was successfully acquired - always True if blocking without a timeout
+        """
+        owner = uuid4().hex
+        res = self._backend.acquire_read(
+            self.name, owner, block, wait=self._wait, timeout=timeout
+        )
+
+        if res:
+            self._owner = owner
+            self._writing = False
+
+        return res
+
+    def acquire_write(
+        self, block: bool = True, timeout: Optional[float] = None
+    ) -> bool:
+        """
+        Try to acquire the lock for writing - optionally block until there are no readers or writers
+        :param block: Wait until lock is available
+        :param timeout: Maximum seconds to wait when blocking, None to wait forever
+        :return: If lock was successfully acquired - always True if blocking without a timeout
+        """
+        owner = uuid4().hex
+        res = self._backend.acquire_write(
+            self.name, owner, block, wait=self._wait, timeout=timeout
+        )
+
+        if res:
+            self._owner = owner
+            self._writing = True
+
+        return res
+
+    def locked(self) -> bool:
+        """
+        Does the lock believe it's currently locked, for reading or writing - does not check actual backend
+        :return: Locked state
+        """
+        return self._owner is not None
+
+    def release(self):
+        """
+        Release the lock
+        """
+        if self._owner is None:
+            raise ShylockException(
+                f"Trying to unlock {self.name} without locking it first."
+            )
+        if self._writing:
+            self._backend.release_write(self.name, self._owner)
+        else:
+            self._backend.release_read(self.name, self._owner)
+        self._owner = None
+
+
+class Semaphore:
+    """
+    Counting semaphore, held by at most limit holders at once. Each holder has its own slot, which expires if it crashes.
+
+    >>> with Semaphore("downstream-api", 10):
+    >>>     print("One of at most 10")
+    """
+
+    def __init__(
+        self,
+        name: str,
+        limit: int,
+        backend: ShylockSyncBackend = None,
+        wait: Optional[WaitStrategy] = None,
+    ):
+        """
+        :param name: Name of the semaphore
+        :param limit: Maximum number of holders at once, should be the same everywhere the semaphore is used
+        :param backend: Backend to use instead of the configured default
+        :param wait: Strategy for waiting between attempts instead of the backend's default
+        """
+        if limit < 1:
+            raise ShylockException(f"Semaphore {name} needs a limit of at least 1.")
+
+        self.name = name
+        self.limit = limit
+        self._wait = wait
+        self._backend = _get_backend(backend)
+        self._owner: Optional[str] = None
+
+    def __enter__(self):
+        self.acquire()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+    def acquire(self, block: bool = True, timeout: Optional[float] = None) -> bool:
+        """
+        Try to acquire a slot - optionally block until one is available
+        :param block: Wait until a slot is available
+        :param timeout: Maximum seconds to wait when blocking, None to wait forever
+        :return: If a slot was successfully acquired - always True if blocking without a timeout
+        """
+        owner = uuid4().hex
+        res = self._backend.acquire_semaphore(
+            self.name, owner, self.limit, block, wait=self._wait, timeout=timeout
+        )
+
+        if res:
+            self._owner = owner
+
+        return res
+
+    def locked(self) -> bool:
+        """
+        Does the semaphore believe it's currently holding a slot - does not check actual backend
+        :return: Locked state
+        """
+        return self._owner is not None
+
+    def release(self):
+        """
+        Release the slot
+        """
+        if self._owner is None:
+            raise ShylockException(
+                f"Trying to release {self.name} without acquiring it first."
+            )
+        self._backend.release_semaphore(self.name, self._owner)
+        self._owner = None
+
+
+class QuorumLock:
+    """
+    Holds the lock on a majority of independent backends, so it survives losing a minority of them, like Redlock.
+    The backends are asked in parallel, and an attempt is over once the majority is decided either way or the validity
+    window has passed. Backends that answer later count as refusals, and get their locks rolled back. The lock is not
+    renewed, so the critical section should finish before valid_until.
+
+    >>> backends = [ShylockRedisBackend.create(Redis(host)) for host in ("redis-1", "redis-2", "redis-3")]
+    >>> with QuorumLock("my-lock", backends, ttl=30):
+    >>>     print("Locked on a majority of the backends")
+    """
+
+    def __init__(
+        self,
+        name: str,
+        backends: Sequence[ShylockSyncBackend],
+        ttl: float = DEFAULT_QUORUM_TTL,
+        wait: Optional[WaitStrategy] = None,
+    ):
+        """
+        :param name: Name of the lock
+        :param backends: Independent backends, an odd number of them tolerates the most failures
+        :param ttl: Seconds until the lock expires on the backends
+        :param wait: Strategy for waiting between attempts, defaults to randomized backoff so waiters that failed at the same time don't keep splitting the backends between them
+        """
+        if not backends:
+            raise ShylockException(f"Quorum lock {name} needs at least 1 backend.")
+
+        self.name = name
+        self.ttl = ttl
+        # Monotonic time until which the lock is safe to use
+        self.valid_until: Optional[float] = None
+        self._backends = [_get_backend(backend) for backend in backends]
+        self._wait = DecorrelatedJitterWait() if wait is None else wait
+        self._granted: List[ShylockSyncBackend] = []
+
+    def __enter__(self):
+        self.acquire()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+    def acquire(self, block: bool = True, timeout: Optional[float] = None) -> bool:
+        """
+        Try to acquire the lock on a majority of the backends - optionally block until available
+        :param block: Wait until lock is available
+        :param timeout: Maximum seconds to wait when blocking, None to wait forever
+        :return: If lock was successfully acquired - always True if blocking without a timeout
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        delays = self._wait.delays()
+        while True:
+            if self._try_acquire():
+                return True
+            if not block:
+                return False
+
+            delay = next(delays)
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                delay = min(delay, remaining)
+            time.sleep(delay)
+
+    def locked(self) -> bool:
+        """
+        Does the lock believe it's currently locked - does not check actual backends
+        :return: Locked state
+        """
+        return bool(self._granted)
+
+    def release(self):
+        """
+        Release the lock on the backends that granted it
+        """
+        if not self._granted:
+            raise ShylockException(
+                f"Trying to unlock {self.name} without locking it first."
+            )
+        self._release(self._granted)
+        self._granted = []
+        self.valid_until = None
+
+    def _try_acquire(self) -> bool:
+        start = time.monotonic()
+        until = valid_until(start, self.ttl)
+        needed = majority(len(self._backends))
+        futures: Dict[Future, ShylockSyncBackend] = {}
+        for backend in self._backends:
+            with _QUORUM_LOCK:
+                # Still stuck on an earlier attempt of any quorum lock, counts as a refusal
+                if _QUORUM_STRAGGLERS.get(backend):
+                    continue
+            future = _quorum_executor(backend).submit(
+                backend.acquire, self.name, False, ttl=self.ttl
+            )
+            futures[future] = backend
+
+        granted: List[ShylockSyncBackend] = []
+        # Backends that might still grant the lock
+        possible = len(futures)
+        pending = set(futures)
+        try:
+            # Until decided either way, or out of time
+            while pending and len(granted) < needed <= possible:
+                remaining = until - time.monotonic()
+                if remaining <= 0:
+                    break
+                done, pending = wait_futures(
+                    pending, timeout=remaining, return_when=FIRST_COMPLETED
+                )
+                error = None
+                for future in done:
+                    backend = futures[future]
+                    e = future.exception()
+                    if e is None and future.result():
+                        granted.append(backend)
+                        continue
+                    possible -= 1
+                    if e is not None and not self._unavailable(backend, e):
+                        error = e
+                # Only once the grants of the same batch are known, to roll them back
+                if error is not None:
+                    raise error
+        except BaseException:
+            self._release(granted)
+            raise
+        finally:
+            for future in pending:
+                # Too late to count, rolled back once it finishes
+                backend = futures[future]
+                with _QUORUM_LOCK:
+                    _QUORUM_STRAGGLERS[backend] = _QUORUM_STRAGGLERS.get(backend, 0) + 1
+                future.add_done_callback(partial(self._roll_back, backend))
+
+        if len(granted) >= needed and time.monotonic() < until:
+            self._granted = granted
+            self.valid_until = until
+            return True
+
+        self._release(granted)
+        return False
+
+    def _unavailable(self, backend: ShylockSyncBackend, e: BaseException) -> bool:
+        """
+        Check if an attempt at acquiring the lock failed because of the backend, which counts as a refusal
+        :param backend: The backend
+        :param e: The error from the attempt
+        :return: If the error came from the backend, it's then logged
+        """
+        if not isinstance(e, backend._errors):
+            return False
+        # Its lock expires if it was granted after all
+        logger.warning(
+            "Failed to acquire quorum lock %s on %r", self.name, backend, exc_info=e
+        )
+        return True
+
+    def _roll_back(self, backend: ShylockSyncBackend, future: Future):
+        """
+        Release the lock on a backend that granted it too late to count
+        :param backend: The backend
+        :param future: The attempt at acquiring the lock on the backend
+        """
+        try:
+            if future.cancelled():
+                return
+            e = future.exception()
+            if e is None:
+                if future.result():
+                    self._release_on(backend)
+            elif not self._unavailable(backend, e):
+                # Nobody to raise it to
+                logger.error(
+                    "Failed to acquire quorum lock %s on %r",
+                    self.name,
+                    backend,
+                    exc_info=e,
+                )
+        finally:
+            with _QUORUM_LOCK:
+                _QUORUM_STRAGGLERS[backend] -= 1
+
+    def _release(self, backends: List[ShylockSyncBackend]):
+        futures = [
+            _quorum_executor(backend).submit(self._release_on, backend)
+            for backend in backends
+        ]
+        for future in futures:
+            future.result()
+
+    def _release_on(self, backend: ShylockSyncBackend):
+        try:
+            backend.release(self.name)
+        except backend._errors as e:
+            # Expires after the TTL
+            logger.warning(
+                "Failed to release quorum lock %s on %r", self.name, backend, exc_info=e
+            )
@@ -0,0 +1,320 @@
+import threading
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+# Seconds, roughly from a fast local backend to a badly contended lock
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+OVERFLOW_LABEL = "_other"
+
+COLLECTOR: Optional["MetricsCollector"] = None
+TRACKER: Optional["ContentionTracker"] = None
+
+
+def configure_metrics(collector: Optional["MetricsCollector"]):
+    """
+    Configure the collector all the backends report to, nothing is measured by default
+    :param collector: The collector, None to stop measuring
+    """
+    global COLLECTOR
+    COLLECTOR = collector
+
+
+def configure_contention_tracker(tracker: Optional["ContentionTracker"]):
+    """
+    Configure the tracker all the backends report lock conflicts to, in addition to the metrics collector
+    :param tracker: The tracker, None to stop tracking
+    """
+    global TRACKER
+    TRACKER = tracker
+
+
+class MetricsCollector:
+    """
+    Receives measurements from the backends. Subclass and override what you're interested in, the defaults do nothing.
+    Called from the threads and tasks acquiring the locks, so keep it quick.
+
+    >>> configure_metrics(PrometheusCollector())
+    """
+
+    def acquired(
+        self, name: str, kind: str, waited: float, attempts: int, acquired: bool
+    ):
+        """
+        An acquire call finished
+        :param name: Name of the lock
+        :param kind: "lock", "read", "write" or "semaphore"
+        :param waited: Seconds spent in the acquire call
+        :param attempts: Number of attempts made on the backend
+        :param acquired: If the lock was acquired, False when not blocking or out of time
+        """
+
+    def released(self, name: str, kind: str, held: float):
+        """
+        A lock acquired via the same backend instance was released
+        :param name: Name of the lock
+        :param kind: "lock", "read", "write" or "semaphore"
+        :param held: Seconds the lock was held for
+        """
+
+    def retried(self, reason: str, delay: float):
+        """
+        The backend retried a request, e.g. when rate limited by CosmosDB or on a write conflict in ArangoDB
+        :param reason: "rate_limited" or "conflict"
+        :param delay: Seconds slept before retrying
+        """
+
+
+class _Histogram:
+    def __init__(self, buckets: Sequence[float]):
+        self.counts: List[int] = [0] * (len(buckets) + 1)
+        self.sum: float = 0.0
+
+    def observe(self, buckets: Sequence[float], value: float):
+        self.counts[bisect_left(buckets, value)] += 1
+        self.sum += value
+
+
+class PrometheusCollector(MetricsCollector):
+    """
+    Keeps counters and histograms per lock name, and renders them in the Prometheus text format.
+
+    >>> collector = PrometheusCollector(label=lambda name: name.split(":")[0])
+    >>> configure_metrics(collector)
+    >>> # In your /metrics handler
+    >>> return collector.render()
+    """
+
+    def __init__(
+        self,
+        prefix: str = "shylock",
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+        label: Optional[Callable[[str], str]] = None,
+        max_labels: int = 1000,
+    ):
+        """
+        :param prefix: Prefix of the metric names
+        :param buckets: Upper bounds of the histogram buckets, in seconds
+        :param label: Maps lock names to the name label, e.g. to drop ids from them - defaults to the name itself
+        :param max_labels: Maximum number of different name labels, any further ones are counted as OVERFLOW_LABEL
+        """
+        self._prefix = prefix
+        self._buckets = sorted(buckets)
+        self._label = label
+        self._max_labels = max_labels
+        self._lock = threading.Lock()
+        self._seen: Set[str] = set()
+        self._waits: Dict[Tuple[str, str], _Histogram] = {}
+        self._holds: Dict[Tuple[str, str], _Histogram] = {}
+        self._attempts: Dict[Tuple[str, str], int] = {}
+        self._contended: Dict[Tuple[str, str], int] = {}
+        self._failed: Dict[Tuple[str, str], int] = {}
+        self._retries: Dict[str, int] = {}
+        self._retry_delays: Dict[str, float] = {}
+
+    def acquired(
+        self, name: str, kind: str, waited: float, attempts: int, acquired: bool
+    ):
+        with self._lock:
+            key = (self._name_label(name), kind)
+            self._observe(self._waits, key, waited)
+            self._attempts[key] = self._attempts.get(key, 0) + attempts
+            if attempts > 1:
+                self._contended[key] = self._contended.get(key, 0) + 1
+            if not acquired:
+                self._failed[key] = self._failed.get(key, 0) + 1
+
+    def released(self, name: str, kind: str, held: float):
+        with self._lock:
+            self._observe(self._holds, (self._name_label(name), kind), held)
+
+    def retried(self, reason: str, delay: float):
+        with self._lock:
+            self._retries[reason] = self._retries.get(reason, 0) + 1
+            self._retry_delays[reason] = self._retry_delays.get(reason, 0.0) + delay
+
+    def render(self) -> str:
+        """
+        Render the metrics for a Prometheus scrape
+        :return: The metrics in the Prometheus text exposition format
+        """
+        p = self._prefix
+        lines: List[str] = []
+        with self._lock:
+            self._render_histogram(
+                lines, f"{p}_wait_seconds", "Time spent acquiring locks", self._waits
+            )
+            self._render_histogram(
+                lines, f"{p}_hold_seconds", "Time locks were held for", self._holds
+            )
+            for metric, help_text, values in (
+                (f"{p}_attempts_total", "Attempts made on the backend", self._attempts),
+                (
+                    f"{p}_contended_total",
+                    "Acquire calls that needed more than one attempt",
+                    self._contended,
+                ),
+                (
+                    f"{p}_failed_total",
+                    "Acquire calls that did not get the lock",
+                    self._failed,
+                ),
+            ):
+                lines.append(f"# HELP {metric} {help_text}")
+                lines.append(f"# TYPE {metric} counter")
+                for (name, kind), value in sorted(values.items()):
+                    lines.append(f"{metric}{self._labels_text(name, kind)} {value}")
+
+            for metric, help_text, values in (
+                (
+                    f"{p}_retries_total",
+                    "Requests retried by the backend",
+                    self._retries,
+                ),
+                (
+                    f"{p}_retry_sleep_seconds_total",
+                    "Time slept before retrying requests",
+                    self._retry_delays,
+                ),
+            ):
+                lines.append(f"# HELP {metric} {help_text}")
+                lines.append(f"# TYPE {metric} counter")
+                for reason, value in sorted(values.items()):
+                    lines.append(f'{metric}{{reason="{reason}"}} {value}')
+
+        return "\n".join(lines) + "\n"
+
+    def _name_label(self, name: str) -> str:
+        label = name if self._label is None else self._label(name)
+        if label not in self._seen:
+            if len(self._seen) >= self._max_labels:
+                return OVERFLOW_LABEL
+            self._seen.add(label)
+        return label
+
+    def _observe(
+        self, histograms: Dict[Tuple[str, str], _Histogram], key, value: float
+    ):
+        histogram = histograms.get(key)
+        if histogram is None:
+            histogram = histograms[key] = _Histogram(self._buckets)
+        histogram.observe(self._buckets, value)
+
+    def _render_histogram(
+        self,
+        lines: List[str],
+        metric: str,
+        help_text: str,
+        histograms: Dict[Tuple[str, str], _Histogram],
+    ):
+        lines.append(f"# HELP {metric} {help_text}")
+        lines.append(f"# TYPE {metric} histogram")
+        for (name, kind), histogram in sorted(histograms.items()):
+            total = 0
+            for bound, count in zip(
+                [*(repr(float(b)) for b in self._buckets), "+Inf"], histogram.counts
+            ):
+                total += count
+                labels = self._labels_text(name, kind, f',le="{bound}"')
+                lines.append(f"{metric}_bucket{labels} {total}")
+            labels = self._labels_text(name, kind)
+            lines.append(f"{metric}_sum{labels} {histogram.sum}")
+            lines.append(f"{metric}_count{labels} {total}")
+
+    @staticmethod
+    def _labels_text(name: str, kind: str, extra: str = "") -> str:
+        name = name.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        return f'{{name="{name}",kind="{kind}"{extra}}}'
+
+
+class ContentionTracker:
+    """
+    Finds the most contended locks in fixed memory, however many lock names there are. Counts the attempts that found
+    the lock held by someone else, for at most capacity names, replacing the least contended name when a new one comes
+    in (the space-saving algorithm, with the names grouped by count so that takes constant time). The most contended
+    names are always kept, their counts are at most "error" too high. Works alongside the configured metrics collector.
+
+    >>> tracker = ContentionTracker()
+    >>> configure_contention_tracker(tracker)
+    >>> # Periodically
+    >>> log.info("Hot locks: %s", tracker.top(10, reset=True))
+    """
+
+    def __init__(self, capacity: int = 100):
+        """
+        :param capacity: Maximum number of lock names to keep track of, larger gives more accurate results
+        """
+        self._capacity = capacity
+        self._lock = threading.Lock()
+        # Name -> [conflicts, error, wait]
+        self._counters: Dict[str, List[float]] = {}
+        # Conflicts -> names with that many, the lowest one with any names is at least _min
+        self._buckets: Dict[float, Dict[str, None]] = {}
+        self._min = 1
+
+    def conflicted(self, name: str):
+        """
+        An attempt to acquire the lock found it held by someone else
+        :param name: Name of the lock
+        """
+        with self._lock:
+            counter = self._counters.get(name)
+            if counter is None:
+                error = 0
+                if len(self._counters) >= self._capacity:
+                    error = self._counters.pop(self._evict())[0]
+                counter = self._counters[name] = [error, error, 0.0]
+            else:
+                self._unbucket(name, counter[0])
+            counter[0] += 1
+            self._buckets.setdefault(counter[0], {})[name] = None
+            self._min = min(self._min, counter[0])
+
+    def waited(self, name: str, waited: float):
+        """
+        An acquire call that ran into someone else holding the lock finished
+        :param name: Name of the lock
+        :param waited: Seconds spent in the acquire call
+        """
+        with self._lock:
+            counter = self._counters.get(name)
+            if counter is not None:
+                counter[2] += waited
+
+    def top(self, n: Optional[int] = None, reset: bool = False) -> List[Dict[str, Any]]:
+        """
+        Get the most contended locks
+        :param n: Number of locks to return, None for all the tracked ones
+        :param reset: Start over after reading, to get the results per interval
+        :return: The most contended locks first, with the number of attempts that found them held, the maximum
+            overestimate of that number, and the seconds waited for them since they were last added
+        """
+        with self._lock:
+            counters = self._counters
+            if reset:
+                self._counters = {}
+                self._buckets = {}
+                self._min = 1
+
+        ranked = sorted(counters.items(), key=lambda item: item[1][0], reverse=True)
+        return [
+            {
+                "name": name,
+                "conflicts": int(conflicts),
+                "error": int(error),
+                "wait": wait,
+            }
+            for name, (conflicts, error, wait) in ranked[:n]
+        ]
+
+    def _evict(self) -> str:
+        while self._min not in self._buckets:
+            self._min += 1
+        name = next(iter(self._buckets[self._min]))
+        self._unbucket(name, self._min)
+        return name
+
+    def _unbucket(self, name: str, conflicts: float):
+        bucket = self._buckets[conflicts]
+        del bucket[name]
+        if not bucket:
+            del self._buckets[conflicts]
@@ -0,0 +1,21 @@
+DEFAULT_QUORUM_TTL = 30  # Seconds, quorum locks aren't renewed so they need a known TTL
+CLOCK_DRIFT = 0.01  # Share of the TTL set aside for the clocks of the backends running at different rates
+
+
+def majority(backends: int) -> int:
+    """
+    Get the number of backends that have to grant a quorum lock
+    :param backends: Number of backends
+    :return: More than half of them
+    """
+    return backends // 2 + 1
+
+
+def valid_until(start: float, ttl: float) -> float:
+    """
+    Get until when a quorum lock is safe to use
+    :param start: Monotonic time when acquiring the lock from the backends started
+    :param ttl: Seconds until the lock expires on the backends
+    :return: Monotonic time when the first of the backends might expire the lock
+    """
+    return start + ttl * (1 - CLOCK_DRIFT)
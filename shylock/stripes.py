@@ -0,0 +1,25 @@
+from hashlib import sha256
+from typing import Iterable, List
+
+DEFAULT_STRIPES = 256
+
+
+def stripe_index(key: str, stripes: int) -> int:
+    """
+    Map the key onto a stripe, the same way in every process and Python version unlike hash()
+    :param key: Key of the locked entity
+    :param stripes: Number of stripes
+    :return: Index of the stripe, from 0 to stripes - 1
+    """
+    return int.from_bytes(sha256(key.encode("utf-8")).digest()[:8], "big") % stripes
+
+
+def stripe_names(name: str, keys: Iterable[str], stripes: int) -> List[str]:
+    """
+    Get the names of the locks for the stripes of the keys
+    :param name: Name of the striped lock, prefixes the names of the stripes
+    :param keys: Keys of the locked entities
+    :param stripes: Number of stripes
+    :return: Names of the stripes, without duplicates
+    """
+    return sorted({f"{name}:{stripe_index(key, stripes)}" for key in keys})
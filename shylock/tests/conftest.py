@@ -0,0 +1,75 @@
+from time import monotonic
+
+import pytest
+
+from shylock import ShylockAsyncMemoryBackend, ShylockMemoryBackend
+
+
+class CountingBackend(ShylockMemoryBackend):
+    """
+    Memory backend counting the attempts at acquiring locks and the releases that reach it
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.attempts = 0
+        self.releases = 0
+
+    def _try_acquire(self, *args) -> bool:
+        self.attempts += 1
+        return super()._try_acquire(*args)
+
+    def _release(self, *args):
+        self.releases += 1
+        super()._release(*args)
+
+    def held(self, name: str) -> bool:
+        """
+        Check if the lock is held in the backend, by anyone
+        :param name: Name of the lock
+        """
+        with self._cond:
+            return self._holder(name, monotonic()) is not None
+
+    def want(self, name: str):
+        """
+        Fail to acquire a sticky lock from another process, which lets the holder know it's wanted
+        :param name: Name of the lock
+        """
+        self._mark_wanted(name)
+
+
+class AsyncCountingBackend(ShylockAsyncMemoryBackend):
+    """
+    Async memory backend counting the attempts at acquiring locks and the releases that reach it
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.attempts = 0
+        self.releases = 0
+
+    async def _try_acquire(self, *args) -> bool:
+        self.attempts += 1
+        return await super()._try_acquire(*args)
+
+    async def _release(self, *args):
+        self.releases += 1
+        await super()._release(*args)
+
+    def held(self, name: str) -> bool:
+        """
+        Check if the lock is held in the backend, by anyone
+        :param name: Name of the lock
+        """
+        return self._holder(name, monotonic()) is not None
+
+
+@pytest.fixture
+def counting_backend() -> CountingBackend:
+    return CountingBackend()
+
+
+@pytest.fixture
+def async_counting_backend() -> AsyncCountingBackend:
+    return AsyncCountingBackend()
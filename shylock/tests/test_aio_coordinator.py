@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+
+from shylock.aio.lock import Lock
+from shylock.backends import ShylockAsyncBackend
+from shylock.wait import FixedWait
+
+
+class CountingBackend(ShylockAsyncBackend):
+    def __init__(self):
+        super().__init__()
+        self.held = set()
+        self.attempts = 0
+        self.releases = 0
+        self.renew_delay = 0.0
+
+    async def _try_acquire(self, name: str, owner: str, ttl) -> bool:
+        self.attempts += 1
+        if name in self.held:
+            return False
+        self.held.add(name)
+        return True
+
+    async def _release(self, name: str, owner):
+        self.releases += 1
+        self.held.remove(name)
+
+    async def _renew(self, name: str, owner: str, ttl) -> bool:
+        await asyncio.sleep(self.renew_delay)
+        return name in self.held
+
+
+async def test_coalesced_waiters_poll_once():
+    backend = CountingBackend()
+    order = []
+
+    async def worker(i: int):
+        async with Lock("test", backend, wait=FixedWait(0.01), coalesce=True):
+            order.append(i)
+            await asyncio.sleep(0.05)
+
+    await asyncio.gather(*[worker(i) for i in range(10)])
+
+    assert order == list(range(10))
+    # The lock is handed over down the line, and only released after the last one
+    assert backend.attempts == 1
+    assert backend.releases == 1
+    assert not backend.held
+
+
+async def test_coalesced_handover_survives_cancelled_renew():
+    backend = CountingBackend()
+    lock = Lock("test", backend, coalesce=True)
+    assert await lock.acquire()
+    cancelled = asyncio.ensure_future(Lock("test", backend, coalesce=True).acquire())
+    last = Lock("test", backend, coalesce=True)
+    waiter = asyncio.ensure_future(last.acquire(timeout=1))
+    await asyncio.sleep(0.01)
+
+    backend.renew_delay = 0.05
+    await lock.release()
+    await asyncio.sleep(0.01)
+    # Taken over, but cancelled while renewing
+    cancelled.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await cancelled
+
+    assert await waiter
+    assert backend.attempts == 1
+    await last.release()
+    assert not backend.held
+
+
+async def test_coalesced_non_blocking():
+    backend = CountingBackend()
+    lock = Lock("test", backend, coalesce=True)
+    assert await lock.acquire()
+    assert not await Lock("test", backend, coalesce=True).acquire(block=False)
+    await lock.release()
+    assert not backend.held
+
+
+async def test_coalesced_timeout():
+    backend = CountingBackend()
+    lock = Lock("test", backend, coalesce=True)
+    assert await lock.acquire()
+    assert not await Lock("test", backend, coalesce=True).acquire(timeout=0.05)
+    await lock.release()
+    assert await lock.acquire(timeout=0.05)
+    await lock.release()
@@ -0,0 +1,20 @@
+import json
+
+from shylock.bench import main, percentile, run
+
+
+def test_percentile():
+    values = [float(i) for i in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+    assert percentile([], 99) == 0.0
+
+
+def test_run_memory(tmp_path):
+    result = run(workers=4, duration=0.2, use_asyncio=True)
+    assert result["acquisitions"] > 0
+    assert result["wait"]["p50"] <= result["wait"]["p99"] <= result["wait"]["max"]
+
+    output = tmp_path / "bench.json"
+    main(["--names", "2", "--duration", "0.2", "--output", str(output)])
+    assert json.loads(output.read_text())["config"]["names"] == 2
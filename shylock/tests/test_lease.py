@@ -0,0 +1,46 @@
+import time
+
+from shylock.backends import ShylockSyncBackend
+from shylock.lock import Lock
+
+
+class LeaseBackend(ShylockSyncBackend):
+    def __init__(self, renewals: int):
+        super().__init__()
+        self.renewals = renewals
+        self.ttls = []
+
+    def _try_acquire(self, name: str, owner: str, ttl) -> bool:
+        self.ttls.append(ttl)
+        return True
+
+    def _release(self, name: str, owner):
+        pass
+
+    def _renew(self, name: str, owner: str, ttl) -> bool:
+        self.ttls.append(ttl)
+        self.renewals -= 1
+        return self.renewals >= 0
+
+
+def test_lease_renewed_until_released():
+    backend = LeaseBackend(renewals=100)
+    with Lock("test", backend, lease=0.03):
+        time.sleep(0.1)
+    count = len(backend.ttls)
+    time.sleep(0.05)
+
+    assert count >= 3
+    assert len(backend.ttls) == count
+    assert set(backend.ttls) == {0.03}
+
+
+def test_lease_lost():
+    lost = []
+    backend = LeaseBackend(renewals=1)
+    lock = Lock("test", backend, lease=0.03, on_lease_lost=lambda l, e: lost.append(l))
+    lock.acquire()
+    time.sleep(0.1)
+    assert lock.lease_lost
+    assert lost == [lock]
+    lock.release()
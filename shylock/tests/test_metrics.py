@@ -0,0 +1,65 @@
+from shylock import (
+    ContentionTracker,
+    Lock,
+    PrometheusCollector,
+    ShylockMemoryBackend,
+    configure_contention_tracker,
+    configure_metrics,
+)
+
+
+def test_prometheus_collector():
+    collector = PrometheusCollector(max_labels=1)
+    configure_metrics(collector)
+    try:
+        backend = ShylockMemoryBackend.create()
+        with Lock("account-1", backend):
+            assert not Lock("account-1", backend).acquire(timeout=0.05)
+        assert Lock("account-2", backend).acquire(block=False)
+    finally:
+        configure_metrics(None)
+
+    text = collector.render()
+    assert 'shylock_wait_seconds_count{name="account-1",kind="lock"} 2' in text
+    assert 'shylock_hold_seconds_count{name="account-1",kind="lock"} 1' in text
+    assert (
+        'shylock_hold_seconds_bucket{name="account-1",kind="lock",le="+Inf"} 1' in text
+    )
+    assert 'shylock_contended_total{name="account-1",kind="lock"} 1' in text
+    assert 'shylock_failed_total{name="account-1",kind="lock"} 1' in text
+    # Past max_labels the names share a label
+    assert 'shylock_attempts_total{name="_other",kind="lock"} 1' in text
+
+
+def test_contention_tracker_keeps_the_hottest_locks():
+    tracker = ContentionTracker(capacity=2)
+    for name in ["a", "b", "a", "c", "a", "d"]:
+        tracker.conflicted(name)
+
+    top = tracker.top()
+    assert [lock["name"] for lock in top] == ["a", "d"]
+    assert top[0] == {"name": "a", "conflicts": 3, "error": 0, "wait": 0.0}
+    # d took the place of c, which took the place of b
+    assert top[1] == {"name": "d", "conflicts": 3, "error": 2, "wait": 0.0}
+
+    assert tracker.top(1, reset=True) == top[:1]
+    assert tracker.top() == []
+
+
+def test_contention_tracker_alongside_collector():
+    collector = PrometheusCollector()
+    tracker = ContentionTracker()
+    configure_metrics(collector)
+    configure_contention_tracker(tracker)
+    try:
+        backend = ShylockMemoryBackend.create()
+        with Lock("account-1", backend):
+            assert not Lock("account-1", backend).acquire(block=False)
+        assert Lock("account-2", backend).acquire(block=False)
+    finally:
+        configure_metrics(None)
+        configure_contention_tracker(None)
+
+    assert [lock["name"] for lock in tracker.top()] == ["account-1"]
+    assert tracker.top()[0]["conflicts"] == 1
+    assert 'shylock_failed_total{name="account-1",kind="lock"} 1' in collector.render()
@@ -0,0 +1,117 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from shylock import (
+    AsyncQuorumLock,
+    QuorumLock,
+    ShylockAsyncMemoryBackend,
+    ShylockException,
+    ShylockMemoryBackend,
+)
+
+
+class BrokenBackend(ShylockMemoryBackend):
+    def _try_acquire(self, *args) -> bool:
+        raise ConnectionError("Cluster down")
+
+
+def test_quorum_lock_needs_a_majority():
+    backends = [ShylockMemoryBackend.create() for _ in range(2)]
+    backends.append(BrokenBackend(None))
+
+    lock = QuorumLock("my-lock", backends, ttl=10)
+    with lock:
+        assert lock.valid_until is not None
+        fresh = ShylockMemoryBackend.create()
+        other = QuorumLock("my-lock", [fresh, *backends[:2]])
+        assert not other.acquire(timeout=0.05)
+        # The refused attempts rolled back what they got
+        assert fresh._owners == {}
+        assert fresh.acquire("my-lock", block=False)
+
+    # Released everywhere
+    assert backends[0].acquire("my-lock", block=False)
+    assert not lock.acquire(block=False)
+    assert backends[1]._owners == {}
+
+    with pytest.raises(ShylockException):
+        QuorumLock("my-lock", [])
+
+
+class SlowBackend(ShylockMemoryBackend):
+    def _try_acquire(self, *args) -> bool:
+        time.sleep(0.3)
+        return super()._try_acquire(*args)
+
+
+def test_quorum_lock_does_not_wait_past_validity():
+    slow = SlowBackend(None)
+    backends = [ShylockMemoryBackend.create(), ShylockMemoryBackend.create(), slow]
+    lock = QuorumLock("my-lock", backends, ttl=0.2)
+
+    start = time.monotonic()
+    assert lock.acquire(block=False)
+    assert time.monotonic() - start < 0.25
+    lock.release()
+
+    # Released once the late grant comes in
+    time.sleep(0.2)
+    assert slow.acquire("my-lock", block=False)
+
+
+class HungBackend(ShylockMemoryBackend):
+    def __init__(self):
+        super().__init__()
+        self.resume = threading.Event()
+
+    def _try_acquire(self, *args) -> bool:
+        self.resume.wait()
+        return super()._try_acquire(*args)
+
+
+def test_quorum_locks_survive_a_hung_backend():
+    hung = HungBackend()
+    backends = [ShylockMemoryBackend.create(), ShylockMemoryBackend.create(), hung]
+    results = []
+
+    def use(i: int):
+        lock = QuorumLock(f"lock-{i}", backends, ttl=0.5)
+        acquired = lock.acquire(timeout=2)
+        start = time.monotonic()
+        lock.release()
+        results.append((acquired, time.monotonic() - start))
+
+    # Unstuck eventually, so it fails instead of hanging if the other backends wait for it
+    resume = threading.Timer(5, hung.resume.set)
+    resume.start()
+    threads = [threading.Thread(target=use, args=(i,)) for i in range(40)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    hung.resume.set()
+    resume.cancel()
+
+    assert all(acquired for acquired, _ in results)
+    assert max(released for _, released in results) < 0.1
+
+
+def test_async_quorum_lock_needs_a_majority():
+    async def run():
+        backends = [await ShylockAsyncMemoryBackend.create() for _ in range(3)]
+        lock = AsyncQuorumLock("my-lock", backends)
+        await backends[0].acquire("my-lock")
+        async with lock:
+            assert await lock.locked()
+            await backends[0].release("my-lock")
+            assert not await backends[1].acquire("my-lock", block=False)
+
+        await backends[1].acquire("my-lock")
+        await backends[2].acquire("my-lock")
+        assert not await lock.acquire(block=False)
+        assert backends[0]._owners == {}
+
+    asyncio.run(run())
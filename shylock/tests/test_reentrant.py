@@ -0,0 +1,42 @@
+import asyncio
+import threading
+
+from shylock import AsyncLock, Lock, ShylockAsyncMemoryBackend, ShylockMemoryBackend
+
+
+def test_reentrant_lock():
+    backend = ShylockMemoryBackend.create()
+    outer = Lock("lock", backend, reentrant=True)
+    with outer:
+        with Lock("lock", backend, reentrant=True):
+            with outer:
+                assert outer.locked()
+        assert outer.locked()
+
+        # Other threads still have to wait
+        others = []
+        thread = threading.Thread(
+            target=lambda: others.append(
+                Lock("lock", backend, reentrant=True).acquire(block=False)
+            )
+        )
+        thread.start()
+        thread.join()
+        assert others == [False]
+        assert not Lock("lock", backend).acquire(block=False)
+
+    assert not outer.locked()
+    assert Lock("lock", backend).acquire(block=False)
+
+
+async def test_async_reentrant_lock():
+    backend = await ShylockAsyncMemoryBackend.create()
+    async with AsyncLock("lock", backend, reentrant=True):
+        async with AsyncLock("lock", backend, reentrant=True):
+            pass
+
+        # Other tasks still have to wait
+        other = AsyncLock("lock", backend, reentrant=True)
+        assert not await asyncio.ensure_future(other.acquire(block=False))
+
+    assert await AsyncLock("lock", backend).acquire(block=False)
@@ -0,0 +1,125 @@
+import asyncio
+import threading
+from time import sleep
+
+import pytest
+
+from shylock import AsyncLock, Lock
+
+
+def test_sticky_lock_is_reused_until_idle(counting_backend):
+    lock = Lock("hot", counting_backend, sticky=0.1)
+    for _ in range(10):
+        with lock:
+            pass
+    assert counting_backend.attempts == 1
+    assert counting_backend.releases == 0
+    assert counting_backend.held("hot")
+
+    sleep(0.2)
+    assert not counting_backend.held("hot")
+    assert counting_backend.releases == 1
+
+
+def test_sticky_lock_is_released_when_wanted(counting_backend):
+    lock = Lock("hot", counting_backend, sticky=0.05)
+    with lock:
+        sleep(0.1)
+    # Checked for being wanted once idle long enough, still ours
+    with lock:
+        pass
+    assert counting_backend.attempts == 1
+
+    with lock:
+        sleep(0.1)
+        counting_backend.want("hot")
+    # Released right away, and acquired again via the backend
+    assert counting_backend.releases == 1
+    with lock:
+        assert counting_backend.attempts == 2
+
+
+def test_sticky_lock_waits_locally_while_in_use(counting_backend):
+    lock = Lock("hot", counting_backend, sticky=1)
+    other = Lock("hot", counting_backend, sticky=1)
+    acquired = []
+
+    def use():
+        acquired.append(other.acquire(timeout=1))
+        other.release()
+
+    with lock:
+        assert not other.acquire(block=False)
+        thread = threading.Thread(target=use)
+        thread.start()
+        sleep(0.05)
+        assert acquired == []
+    thread.join()
+
+    # Handed over to the other thread without reaching the backend
+    assert acquired == [True]
+    assert counting_backend.attempts == 1
+    assert counting_backend.releases == 0
+
+
+async def test_async_sticky_lock_is_reused(async_counting_backend):
+    lock = AsyncLock("hot", async_counting_backend, sticky=0.05)
+    async with lock:
+        pass
+    async with lock:
+        assert async_counting_backend.attempts == 1
+
+    await asyncio.sleep(0.1)
+    assert not async_counting_backend.held("hot")
+
+
+async def test_async_sticky_lock_waits_locally_while_in_use(async_counting_backend):
+    lock = AsyncLock("hot", async_counting_backend, sticky=1)
+    other = AsyncLock("hot", async_counting_backend, sticky=1)
+
+    async with lock:
+        assert not await other.acquire(block=False)
+        waiter = asyncio.ensure_future(other.acquire(timeout=1))
+        await asyncio.sleep(0.05)
+        assert not waiter.done()
+
+    assert await waiter
+    await other.release()
+    assert async_counting_backend.attempts == 1
+    assert async_counting_backend.releases == 0
+
+
+def test_sticky_lock_is_released_when_wanted_check_fails(counting_backend, monkeypatch):
+    def unreachable(name: str, owner: str) -> bool:
+        raise ConnectionError()
+
+    lock = Lock("hot", counting_backend, sticky=0.05)
+    lock.acquire()
+    sleep(0.1)
+    monkeypatch.setattr(counting_backend, "_is_wanted", unreachable)
+    with pytest.raises(ConnectionError):
+        lock.release()
+
+    assert not counting_backend.held("hot")
+    monkeypatch.undo()
+    assert Lock("hot", counting_backend, sticky=0.05).acquire(timeout=0.1)
+
+
+async def test_async_sticky_lock_is_released_when_reuse_is_cancelled(
+    async_counting_backend, monkeypatch
+):
+    async def unreachable(name: str, owner: str) -> bool:
+        await asyncio.sleep(10)
+
+    lock = AsyncLock("hot", async_counting_backend, sticky=0.5)
+    async with lock:
+        await asyncio.sleep(0.25)
+    # Due for checking if it's wanted when reused, but not released for being idle yet
+    await asyncio.sleep(0.35)
+    monkeypatch.setattr(async_counting_backend, "_is_wanted", unreachable)
+    with pytest.raises(asyncio.TimeoutError):
+        await asyncio.wait_for(lock.acquire(), 0.1)
+
+    assert not async_counting_backend.held("hot")
+    monkeypatch.undo()
+    assert await AsyncLock("hot", async_counting_backend, sticky=1).acquire(timeout=0.1)
@@ -0,0 +1,45 @@
+import pytest
+
+from shylock import (
+    AsyncStripedLock,
+    ShylockAsyncMemoryBackend,
+    ShylockException,
+    ShylockMemoryBackend,
+    StripedLock,
+)
+from shylock.stripes import stripe_index, stripe_names
+
+
+def test_stripes_are_stable():
+    # Must never change, or processes running different versions would disagree
+    assert stripe_index("user-1", 256) == 178
+    assert stripe_names("user", ["user-1", "user-1", "user-2"], 256) == stripe_names(
+        "user", ["user-2", "user-1"], 256
+    )
+    assert len(stripe_names("user", map(str, range(1000)), 8)) == 8
+
+
+def test_striped_lock():
+    backend = ShylockMemoryBackend.create()
+    with StripedLock("user", "user-1", backend=backend):
+        assert not StripedLock("user", "user-1", backend=backend).acquire(block=False)
+        assert not StripedLock("user", ["user-2", "user-1"], backend=backend).acquire(
+            block=False
+        )
+        # With a single stripe all keys share it
+        lock = StripedLock("user", ["user-1", "user-2"], stripes=1, backend=backend)
+        assert lock.names == ["user:0"]
+
+    with pytest.raises(ShylockException):
+        StripedLock("user", [], backend=backend)
+
+
+async def test_async_striped_lock():
+    backend = await ShylockAsyncMemoryBackend.create()
+    async with AsyncStripedLock("user", ["user-1", "user-2"], backend=backend):
+        assert not await AsyncStripedLock("user", "user-2", backend=backend).acquire(
+            block=False
+        )
+    assert await AsyncStripedLock("user", "user-2", backend=backend).acquire(
+        block=False
+    )
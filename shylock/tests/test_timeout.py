@@ -0,0 +1,44 @@
+import asyncio
+import time
+
+from shylock.aio.lock import Lock as AsyncLock
+from shylock.backends import ShylockAsyncBackend, ShylockSyncBackend
+from shylock.lock import Lock
+from shylock.wait import FixedWait
+
+
+class HeldBackend(ShylockSyncBackend):
+    def _try_acquire(self, name: str, owner: str, ttl) -> bool:
+        return False
+
+
+class SlowInsertBackend(ShylockAsyncBackend):
+    def __init__(self):
+        super().__init__()
+        self.held = {}
+
+    async def _try_acquire(self, name: str, owner: str, ttl) -> bool:
+        self.held[name] = owner
+        await asyncio.sleep(1)
+        return True
+
+    async def _release(self, name: str, owner):
+        if self.held.get(name) == owner:
+            del self.held[name]
+
+
+def test_acquire_timeout():
+    lock = Lock("test", HeldBackend(), wait=FixedWait(1))
+    start = time.monotonic()
+    assert not lock.acquire(timeout=0.1)
+    assert 0.1 <= time.monotonic() - start < 0.5
+    assert not lock.locked()
+
+
+async def test_cancelled_acquire_cleans_up():
+    backend = SlowInsertBackend()
+    task = asyncio.ensure_future(AsyncLock("test", backend).acquire())
+    await asyncio.sleep(0.05)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+    assert backend.held == {}
@@ -0,0 +1,18 @@
+from itertools import islice
+
+from shylock.wait import DecorrelatedJitterWait, ExponentialWait, FixedWait
+
+
+def test_fixed_wait():
+    assert list(islice(FixedWait(0.5).delays(), 3)) == [0.5, 0.5, 0.5]
+
+
+def test_exponential_wait():
+    delays = ExponentialWait(initial=0.25, maximum=1.5).delays()
+    assert list(islice(delays, 5)) == [0.25, 0.5, 1.0, 1.5, 1.5]
+
+
+def test_decorrelated_jitter_wait():
+    delays = list(islice(DecorrelatedJitterWait(base=0.1, maximum=1.0).delays(), 100))
+    assert all(0.1 <= d <= 1.0 for d in delays)
+    assert len(set(delays)) > 1
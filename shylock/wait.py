@@ -0,0 +1,80 @@
+import random
+from typing import Iterator
+
+
+class WaitStrategy:
+    """
+    Decides how long to wait between attempts to acquire a lock
+
+    >>> backend = ShylockPymongoBackend.create(client, "projectdb", wait=ExponentialWait())
+    >>> lock = Lock("my-lock", wait=FixedWait(1 / 64))
+    """
+
+    def delays(self) -> Iterator[float]:
+        """
+        Generate the delays for a single acquire call
+        :return: Infinite iterator of delays in seconds
+        """
+        raise NotImplementedError()
+
+
+class FixedWait(WaitStrategy):
+    """
+    Always wait the same amount of time between attempts
+    """
+
+    def __init__(self, delay: float = 1 / 16):
+        """
+        :param delay: Seconds to wait between attempts
+        """
+        self.delay = delay
+
+    def delays(self) -> Iterator[float]:
+        while True:
+            yield self.delay
+
+
+class ExponentialWait(WaitStrategy):
+    """
+    Multiply the delay after every attempt, up to a maximum
+    """
+
+    def __init__(
+        self, initial: float = 1 / 64, maximum: float = 2.0, multiplier: float = 2.0
+    ):
+        """
+        :param initial: Seconds to wait after the first attempt
+        :param maximum: Maximum seconds to wait between attempts
+        :param multiplier: How much to grow the delay after each attempt
+        """
+        self.initial = initial
+        self.maximum = maximum
+        self.multiplier = multiplier
+
+    def delays(self) -> Iterator[float]:
+        delay = self.initial
+        while True:
+            yield delay
+            delay = min(delay * self.multiplier, self.maximum)
+
+
+class DecorrelatedJitterWait(WaitStrategy):
+    """
+    Randomized exponential backoff, spreads out waiters that started at the same time
+    https://aws.amazon.com/blogs/architecture/exponential-backoff-and-jitter/
+    """
+
+    def __init__(self, base: float = 1 / 64, maximum: float = 2.0):
+        """
+        :param base: Minimum seconds to wait between attempts
+        :param maximum: Maximum seconds to wait between attempts
+        """
+        self.base = base
+        self.maximum = maximum
+
+    def delays(self) -> Iterator[float]:
+        delay = self.base
+        while True:
+            # Not used for anything security related
+            delay = min(self.maximum, random.uniform(self.base, delay * 3))  # nosec
+            yield delay